@@ -30,6 +30,7 @@ import time
 import traceback
 
 
+from wobblui.drawbatch cimport begin_draw_batch, end_draw_batch
 from wobblui.dragselection cimport (
     reposition_hover_menu,
     touch_handles_take_touch_start,
@@ -37,6 +38,8 @@ from wobblui.dragselection cimport (
     touch_handles_take_touch_end,
 )
 cimport wobblui.font.sdlfont as sdlfont
+from wobblui.idle cimport internal_idle_work_pending,\
+    internal_run_idle_callbacks
 from wobblui.keyboard import internal_update_text_events,\
     get_active_text_widget, get_modifiers, \
     internal_update_keystate_keydown, \
@@ -50,15 +53,20 @@ from wobblui.perf cimport CPerf as Perf
 from wobblui.render_lock cimport can_renderer_safely_be_used,\
     can_window_safely_use_its_renderer,\
     _internal_set_global_renderer_lock
-from wobblui.sdlinit cimport initialize_sdl, sdl_version
-from wobblui.texture cimport do_actual_texture_unload
-from wobblui.timer cimport internal_trigger_check,\
+from wobblui.sdlinit cimport initialize_sdl, is_wakeup_event,\
+    sdl_version
+from wobblui.texture cimport begin_texture_restore_frame, \
+    do_actual_texture_unload
+from wobblui.timer cimport internal_process_ui_thread_queue,\
+    internal_trigger_check, internal_ui_thread_work_pending,\
     maximum_sleep_time
 from wobblui.uiconf import config
+from wobblui.widget_base cimport DIRTY_REDRAW, DIRTY_RELAYOUT
 from wobblui.widgetman cimport get_all_widgets, get_all_windows
 from wobblui.window cimport get_focused_window,\
     get_window_by_sdl_id
-from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
+from wobblui.woblog cimport is_enabled, LOG_DEBUG, \
+    logdebug, logerror, loginfo, logwarning
 
 
 cdef long long sdl_touch_mouseid = 4294967295
@@ -95,8 +103,17 @@ cdef redraw_windows(int layout_only=False):
                         widget.parent_window) == w or widget == w)]))
             Perf.stop(relayout_perf, expected_max_duration=0.010)
             if not layout_only and can_window_safely_use_its_renderer(w):
-                w.redraw_if_necessary()
+                renderer = w.renderer
+                begin_texture_restore_frame()
+                if renderer is not None:
+                    begin_draw_batch(renderer)
+                try:
+                    w.redraw_if_necessary()
+                finally:
+                    if renderer is not None:
+                        end_draw_batch(renderer)
             do_actual_texture_unload(w.internal_get_renderer_address())
+            w.internal_update_subtree_dirty()
         except Exception as e:
             logerror("*** ERROR HANDLING WINDOW ***")
             logerror(str(traceback.format_exc()))
@@ -200,60 +217,151 @@ def stuck_check():
 
 cdef int announced_sleepy_state = False
 
+# Upper bound for how long the event loop blocks waiting for SDL events.
+# Timers and other threads wake it up earlier, this is only a safety net:
+cdef double max_event_wait = 1.0
+
+
+cdef int windows_need_update(int layout_only=False):
+    # Widgets flag their windows when they get dirty, see
+    # WidgetBase._mark_dirty(), so this doesn't need to walk any trees:
+    cdef int bits
+    for w_ref in get_all_windows():
+        w = w_ref()
+        if w is None or w.hidden or w.is_closed:
+            continue
+        bits = DIRTY_RELAYOUT
+        if not layout_only and can_window_safely_use_its_renderer(w):
+            bits |= DIRTY_REDRAW
+        if (w._subtree_dirty & bits) != 0:
+            return True
+    return False
+
+
+# Frame pacing. Redraws only happen when something is dirty, and then at
+# most once per frame interval, which follows the display refresh rate
+# unless overridden with the "frame_rate" and "max_fps" config options:
+cdef double last_frame_time = -1.0
+cdef double cached_refresh_rate = 60.0
+cdef double cached_refresh_rate_time = -1.0
+
+
+cdef double display_refresh_rate():
+    global cached_refresh_rate, cached_refresh_rate_time
+    cdef double now = time.monotonic()
+    if cached_refresh_rate_time >= 0 and \
+            now < cached_refresh_rate_time + 2.0:
+        return cached_refresh_rate
+    import sdl2 as sdl
+    cdef double rate = 0
+    mode = sdl.SDL_DisplayMode()
+    for w_ref in get_all_windows():
+        w = w_ref()
+        if w is None or w.hidden or w.is_closed or \
+                w._sdl_window is None:
+            continue
+        if sdl.SDL_GetWindowDisplayMode(w._sdl_window,
+                ctypes.byref(mode)) == 0 and mode.refresh_rate > rate:
+            rate = mode.refresh_rate
+    if rate <= 0:
+        rate = 60.0  # unknown, go with the most common value
+    cached_refresh_rate = rate
+    cached_refresh_rate_time = now
+    return rate
+
+
+cdef double frame_interval():
+    rate = config.get("frame_rate")
+    if rate is None or rate <= 0:
+        rate = display_refresh_rate()
+    max_fps = config.get("max_fps")
+    if max_fps is not None and max_fps > 0:
+        rate = min(rate, max_fps)
+    return 1.0 / rate
+
+
+cdef double time_until_next_frame():
+    if last_frame_time < 0:
+        return 0.0
+    return max(0.0, last_frame_time + frame_interval() -
+        time.monotonic())
+
+
+cdef redraw_windows_if_frame_due():
+    """ Do the layout, redraw and present pass for all windows, unless
+        something is dirty and the last frame was less than a frame
+        interval ago. In that case, all changes until the next frame
+        are collected into one pass instead. (Windows that aren't dirty
+        won't present anything.)
+    """
+    global last_frame_time
+    dirty = windows_need_update()
+    if dirty and time_until_next_frame() > 0.001:
+        return
+    if dirty:
+        last_frame_time = time.monotonic()
+    redraw_windows()
+
+
+cdef double wait_for_events(double timeout):
+    """ Block until an SDL event arrives (which includes wakeups via
+        wake_up_event_loop()) or the timeout expires, without removing
+        the event from the queue. Returns the time actually waited.
+    """
+    import sdl2 as sdl
+    if timeout <= 0.0005:
+        return 0.0
+    cdef double start_time = time.monotonic()
+    sdl.SDL_WaitEventTimeout(None, max(1, round(timeout * 1000.0)))
+    cdef double waited = time.monotonic() - start_time
+    Perf.count("event_loop_sleep", waited)
+    return waited
+
 
 cpdef event_loop(app_cleanup_callback=None):
     global stuck_thread, last_alive_time, announced_sleepy_state
 
-    cdef int had_jobs, event_loop_ms, font_no_sleep_counter
-    cdef double sleep_amount
+    cdef int had_jobs
+    cdef double wait_amount
 
     if stuck_thread is None:
         stuck_thread = threading.Thread(target=stuck_check, daemon=True)
         stuck_thread.start()
     last_alive_time = time.monotonic()
-    event_loop_ms = 10
+    initialize_sdl()
     try:
-        font_no_sleep_counter = 0
         while True:
-            # Sleeping an appropriate amount of time:
+            # Wait until there is something to do:
             last_alive_time = time.monotonic()
+            had_jobs = sdlfont.process_jobs()
             max_sleep = maximum_sleep_time()
-            sleep_amount = event_loop_ms * 0.001
-            had_jobs = False
+            wait_amount = max_event_wait
             if max_sleep != None:
-                had_jobs = sdlfont.process_jobs()
-                sleep_amount = max(0, min(sleep_amount, max_sleep))
-                if had_jobs:
-                    font_no_sleep_counter = 10
-                    sleep_amount = 0
-                    event_loop_ms = min(10, event_loop_ms)
-            if font_no_sleep_counter > 0:
-                font_no_sleep_counter -= 1
-                sleep_amount = 0
-            if sleep_amount > 0.0005:
-                if sleep_amount > 1:
-                    logwarning("Bogus sleep value: " + str(sleep_amount) +
-                        " - too large??")
-                time.sleep(sleep_amount)
+                wait_amount = max(0, min(wait_amount, max_sleep))
+            if had_jobs or internal_ui_thread_work_pending() or \
+                    internal_idle_work_pending():
+                wait_amount = 0
+            elif windows_need_update():
+                wait_amount = min(wait_amount, time_until_next_frame())
+            if config.get("debug_core_event_loop") is True:
+                logdebug("event_loop(): state: " +
+                    str((
+                        "wait_amount", wait_amount,
+                        "had_jobs", had_jobs,
+                        "max_sleep", max_sleep,
+                    ))
+                )
+            wait_for_events(wait_amount)
 
             # Announce sleepy state so it can be debugged:
-            if sleep_amount > 0.45 and not announced_sleepy_state:
+            if wait_amount > 0.45 and not announced_sleepy_state:
                 announced_sleepy_state = True
                 logdebug("core loop: SLEEPY -> " +
                          "entered >450ms wait sleepy state.")
-            elif sleep_amount < 0.2 and announced_sleepy_state:
+            elif wait_amount < 0.2 and announced_sleepy_state:
                 announced_sleepy_state = False
                 logdebug("core loop: NOT SLEEPY -> " +
                          "entered <200ms responsive state.")
-            if config.get("debug_core_event_loop") is True:
-                logdebug("event_loop(): state: " +
-                    str((
-                        "sleep_amount", sleep_amount,
-                        "had_jobs", had_jobs,
-                        "max_sleep", max_sleep,
-                        "font_no_sleep_counter", font_no_sleep_counter
-                    ))
-                )
 
             # Process events:
             result = do_event_processing(ui_active=True)
@@ -274,47 +382,99 @@ cpdef event_loop(app_cleanup_callback=None):
                     time.sleep(0.05)
                     sys.exit(0)
                 return
-            if result is True:
-                # Had events. Remain responsive!
-                if event_loop_ms > 10:
-                    event_loop_ms = 10
-            else:
-                # No events. Take some time
-                max_sleep = maximum_sleep_time()
-                if event_loop_ms < 500:
-                    event_loop_ms = min(
-                        event_loop_ms + 3,
-                        500)
-                    if event_loop_ms > 150:
-                        # We hit this code path in higher intervals/slower,
-                        # so increase interval even faster:
-                        event_loop_ms = min(
-                            event_loop_ms + 10,
-                            500)
     except (SystemExit, KeyboardInterrupt) as e:
-        loginfo("APP SHUTDOWN INITIATED. CLEANING UP...")
-        
-        # Close windows quickly to make it feel fast:
-        try:
-            for w_ref in get_all_windows():
-                w = w_ref()
-                if w is not None and not w.is_closed:
-                    w.close()
-        except Exception as inner_e:
-            print("Unexpected window close exception: " +
-                str(inner_e)
-            )
-
-        sdlfont.stop_queue_for_process_shutdown()
-        if app_cleanup_callback != None:
-            app_cleanup_callback()
-
-        # Get __del__ processed on as many things as possible
-        # to allow them to wrap up things cleanly:
-        import gc; gc.collect()
-        time.sleep(0.05)
-        gc.collect()
-        time.sleep(0.05)
+        _cleanup_for_shutdown(app_cleanup_callback)
+        raise e
+
+
+cdef _cleanup_for_shutdown(app_cleanup_callback):
+    loginfo("APP SHUTDOWN INITIATED. CLEANING UP...")
+
+    # Close windows quickly to make it feel fast:
+    try:
+        for w_ref in get_all_windows():
+            w = w_ref()
+            if w is not None and not w.is_closed:
+                w.close()
+    except Exception as inner_e:
+        print("Unexpected window close exception: " +
+            str(inner_e)
+        )
+
+    sdlfont.stop_queue_for_process_shutdown()
+    if app_cleanup_callback != None:
+        app_cleanup_callback()
+
+    # Get __del__ processed on as many things as possible
+    # to allow them to wrap up things cleanly:
+    import gc; gc.collect()
+    time.sleep(0.05)
+    gc.collect()
+    time.sleep(0.05)
+
+
+# Polling interval range used by async_event_loop(), since SDL has no way
+# to notify asyncio of new events:
+cdef double min_async_poll_interval = 0.002
+cdef double max_async_poll_interval = 0.03
+
+
+async def async_event_loop(app_cleanup_callback=None):
+    """ Coroutine version of event_loop() for use with asyncio:
+
+            asyncio.run(wobblui.async_event_loop())
+
+        This must run in an asyncio loop on the main thread. All other
+        coroutines and callbacks of that asyncio loop then run on the UI
+        thread too, so they may change widgets directly without any
+        locking or job queues.
+
+        SDL can't wake up asyncio when input arrives, so its event queue
+        is checked in short intervals that grow slowly while the UI is
+        idle. Input latency is therefore bounded by
+        max_async_poll_interval (30ms) rather than immediate like with
+        event_loop(). Returns once the app was quit and everything was
+        shut down like event_loop() does.
+    """
+    global stuck_thread, last_alive_time
+    import asyncio
+    if threading.current_thread() != threading.main_thread():
+        raise RuntimeError("async_event_loop() must run on " +
+            "the main thread")
+    if stuck_thread is None:
+        stuck_thread = threading.Thread(target=stuck_check, daemon=True)
+        stuck_thread.start()
+    initialize_sdl()
+    poll_interval = min_async_poll_interval
+    try:
+        while True:
+            last_alive_time = time.monotonic()
+            had_jobs = sdlfont.process_jobs()
+            result = do_event_processing(ui_active=True)
+            if result == "appquit":
+                _cleanup_for_shutdown(app_cleanup_callback)
+                return
+            if result is True or had_jobs:
+                poll_interval = min_async_poll_interval
+            else:
+                poll_interval = min(max_async_poll_interval,
+                    poll_interval * 1.5)
+
+            # Let the other coroutines run until the next check is due:
+            wait_amount = poll_interval
+            max_sleep = maximum_sleep_time()
+            if max_sleep != None:
+                wait_amount = max(0, min(wait_amount, max_sleep))
+            if internal_ui_thread_work_pending() or \
+                    internal_idle_work_pending():
+                wait_amount = 0
+            elif windows_need_update():
+                wait_amount = min(wait_amount, time_until_next_frame())
+            start_time = time.monotonic()
+            await asyncio.sleep(wait_amount)
+            Perf.count("event_loop_sleep", time.monotonic() - start_time)
+    except (SystemExit, KeyboardInterrupt, asyncio.CancelledError) as e:
+        _cleanup_for_shutdown(app_cleanup_callback)
         raise e
 
 
@@ -421,6 +581,60 @@ def debug_describe_event(event):
     return t
 
 
+cdef list coalesce_events(list events):
+    """ Collapse bursts of motion, wheel and resize events within one
+        poll batch: only the latest motion per window and device is
+        kept (with relative motion summed up), wheel deltas are added
+        up, and only the last resize per window remains. Any other
+        event in between ends a burst so ordering with e.g. clicks and
+        key presses is preserved.
+    """
+    import sdl2 as sdl
+    cdef list result = []
+    cdef dict burst = dict()
+    cdef int coalesced = 0
+    for event in events:
+        key = None
+        if event.type == sdl.SDL_MOUSEMOTION:
+            key = ("motion", event.motion.windowID, event.motion.which)
+        elif event.type == sdl.SDL_FINGERMOTION:
+            key = ("finger", event.tfinger.touchId,
+                event.tfinger.fingerId)
+        elif event.type == sdl.SDL_MOUSEWHEEL:
+            key = ("wheel", event.wheel.windowID, event.wheel.which,
+                event.wheel.direction)
+        elif event.type == sdl.SDL_WINDOWEVENT and (
+                event.window.event == sdl.SDL_WINDOWEVENT_RESIZED or
+                event.window.event == sdl.SDL_WINDOWEVENT_SIZE_CHANGED):
+            key = ("resize", event.window.windowID)
+        if key is None:
+            burst.clear()
+            result.append(event)
+            continue
+        if not key in burst:
+            burst[key] = len(result)
+            result.append(event)
+            continue
+        coalesced += 1
+        earlier = result[burst[key]]
+        if event.type == sdl.SDL_MOUSEMOTION:
+            event.motion.xrel += earlier.motion.xrel
+            event.motion.yrel += earlier.motion.yrel
+            result[burst[key]] = event
+        elif event.type == sdl.SDL_FINGERMOTION:
+            event.tfinger.dx += earlier.tfinger.dx
+            event.tfinger.dy += earlier.tfinger.dy
+            result[burst[key]] = event
+        elif event.type == sdl.SDL_MOUSEWHEEL:
+            earlier.wheel.x += event.wheel.x
+            earlier.wheel.y += event.wheel.y
+        else:
+            result[burst[key]] = event
+    if coalesced > 0:
+        Perf.count("events_coalesced", coalesced)
+    return result
+
+
 def do_event_processing_if_on_main_thread(ui_active=True):
     if threading.current_thread() != threading.main_thread():
         return
@@ -435,38 +649,51 @@ def do_event_processing(int ui_active=True):
         raise RuntimeError("UI events can't be processed " +
             "from another thread")
     last_alive_time = time.monotonic()
+    frame_start_time = last_alive_time
     if _last_clean_shortcuts_ts is None:
         _last_clean_shortcuts_ts = time.monotonic()
     if _last_clean_shortcuts_ts + 1.0 < time.monotonic():
         clean_global_shortcuts()
         _last_clean_shortcuts_ts = time.monotonic()
 
-    if config.get("debug_core_event_loop") is True:
+    if is_enabled(LOG_DEBUG) and \
+            config.get("debug_core_event_loop") is True:
         logdebug("do_event_processing(): fetching SDL " +
-            "events at " + str(time.monotonic()))
+            "events at %f", (time.monotonic(),))
     initialize_sdl()
     events = []
     while True:
         ev = sdl.SDL_Event()
         result = sdl.SDL_PollEvent(ctypes.byref(ev))
         if result == 1:
-            events.append(ev)
+            if not is_wakeup_event(ev):
+                events.append(ev)
             continue
         break
-    if config.get("debug_core_event_loop") is True:
+    if is_enabled(LOG_DEBUG) and \
+            config.get("debug_core_event_loop") is True:
         logdebug("do_event_processing(): done fetching SDL " +
-            "events at " + str(time.monotonic()))
+            "events at %f", (time.monotonic(),))
+    events = coalesce_events(events)
     loading_screen_fix()
     update_multitouch()
     if len(events) == 0:
         internal_trigger_check(idle=True)
+        internal_process_ui_thread_queue()
         internal_update_text_events()
-        redraw_windows()
+        redraw_windows_if_frame_due()
+        internal_run_idle_callbacks(frame_start_time)
         return False
     for event in events:
-        if config.get("debug_source_events") is True:
-            logdebug("wobblui.__init__.py: DEBUG: sdl event: " +
-                debug_describe_event(event))
+        if windows_need_update(layout_only=True):
+            # Timers, the UI thread queue or the previous event may
+            # have changed things since the last frame. Hit-testing
+            # must see the current layout, not a stale one:
+            redraw_windows(layout_only=True)
+        if is_enabled(LOG_DEBUG) and \
+                config.get("debug_source_events") is True:
+            logdebug("wobblui.__init__.py: DEBUG: sdl event: %s",
+                (debug_describe_event(event),))
         if not ui_active:
             # Skip this event unless it is essential.
             if (event.type != sdl.SDL_QUIT and
@@ -509,8 +736,11 @@ def do_event_processing(int ui_active=True):
                     _process_mouse_click_event(event,
                         force_no_widget_can_receive_new_input=True)
         try:
-            perf_id = Perf.start("sdlevent_" + str(
-                debug_describe_event(event)) + "_processing")
+            perf_id = ""
+            if Perf.tracing_enabled or config.get("perf_debug"):
+                # (Only describe the event if it gets measured at all.)
+                perf_id = Perf.start("sdlevent_" + str(
+                    debug_describe_event(event)) + "_processing")
             if _handle_event(event) is False and ui_active:
                 # App termination.
                 Perf.stop(perf_id)
@@ -519,18 +749,21 @@ def do_event_processing(int ui_active=True):
         except Exception as e:
             logerror("*** ERROR IN EVENT HANDLER ***")
             logerror(str(traceback.format_exc()))
-    if config.get("debug_core_event_loop") is True:
+    if is_enabled(LOG_DEBUG) and \
+            config.get("debug_core_event_loop") is True:
         logdebug("do_event_processing(): post event handling " +
             "(window redraw, font job queue, ...) " +
-            "starting at " + str(time.monotonic()))
-    redraw_windows(layout_only=True)
+            "starting at %f", (time.monotonic(),))
     internal_trigger_check(idle=False)
+    internal_process_ui_thread_queue()
     internal_update_text_events()
-    redraw_windows()
+    redraw_windows_if_frame_due()
     sdlfont.process_jobs()
-    if config.get("debug_core_event_loop") is True:
+    internal_run_idle_callbacks(frame_start_time)
+    if is_enabled(LOG_DEBUG) and \
+            config.get("debug_core_event_loop") is True:
         logdebug("do_event_processing(): finished processing " +
-            "at " + str(time.monotonic()))
+            "at %f", (time.monotonic(),))
     return True
 
 
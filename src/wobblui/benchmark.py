@@ -0,0 +1,283 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+
+""" Headless end-to-end rendering benchmarks. These run without a GPU or
+    display by using SDL's dummy video driver and the software renderer:
+
+        python3 -m wobblui.benchmark --output results.json
+
+    Each scenario reports per-frame latency percentiles, cache hit rates
+    and the peak SDL texture count. Compare the JSON output of different
+    versions to spot regressions.
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+CACHE_NAMES = ["font_cache", "render_size_cache", "rendered_words_cache"]
+
+LOREM_HTML = ("<p>Lorem <b>ipsum</b> dolor sit amet, <i>consectetur</i> " +
+    "adipiscing elit, sed do eiusmod tempor incididunt ut labore et " +
+    "dolore magna aliqua. Ut enim ad minim veniam, quis nostrud " +
+    "<a href='#'>exercitation</a> ullamco laboris nisi ut aliquip.</p>")
+
+def setup_headless():
+    """ Must be called before any window is created. """
+    if not "SDL_VIDEODRIVER" in os.environ:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+    from wobblui.uiconf import config
+    config.set("software_renderer", True)
+    # No frame pacing, every frame should be measured:
+    config.set("frame_rate", 1000000)
+
+def percentile(sorted_values, fraction):
+    if len(sorted_values) == 0:
+        return 0.0
+    index = min(len(sorted_values) - 1,
+        max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class ScenarioRun(object):
+    """ Runs and measures the frames of one benchmark scenario. """
+
+    def __init__(self, name):
+        from wobblui.perf import Perf
+        self.name = name
+        self.frame_times = []
+        self.peak_textures = 0
+        self.setup_time = 0.0
+        self.counters_at_start = dict()
+        for cache_name in CACHE_NAMES:
+            for suffix in ["_hit", "_miss"]:
+                self.counters_at_start[cache_name + suffix] = \
+                    Perf.counter(cache_name + suffix)
+
+    def frame(self):
+        from wobblui import do_event_processing
+        import wobblui.texture
+        start_time = time.monotonic()
+        do_event_processing(ui_active=True)
+        self.frame_times.append(time.monotonic() - start_time)
+        self.peak_textures = max(self.peak_textures,
+            wobblui.texture.sdl_tex_count)
+
+    def result(self):
+        from wobblui.perf import Perf
+        times = sorted(self.frame_times)
+        hit_rates = dict()
+        for cache_name in CACHE_NAMES:
+            hits = Perf.counter(cache_name + "_hit") -\
+                self.counters_at_start[cache_name + "_hit"]
+            misses = Perf.counter(cache_name + "_miss") -\
+                self.counters_at_start[cache_name + "_miss"]
+            hit_rates[cache_name] = (hits / float(hits + misses)
+                if hits + misses > 0 else None)
+        return {
+            "frames": len(times),
+            "setup_ms": self.setup_time * 1000.0,
+            "frame_ms": {
+                "mean": (sum(times) * 1000.0 / len(times)
+                    if len(times) > 0 else 0.0),
+                "p50": percentile(times, 0.50) * 1000.0,
+                "p95": percentile(times, 0.95) * 1000.0,
+                "p99": percentile(times, 0.99) * 1000.0,
+                "max": (times[-1] * 1000.0 if len(times) > 0 else 0.0),
+            },
+            "cache_hit_rates": hit_rates,
+            "peak_texture_count": self.peak_textures,
+        }
+
+def resize_window(window, width, height):
+    import sdl2 as sdl
+    if window._sdl_window is not None:
+        sdl.SDL_SetWindowSize(window._sdl_window, width, height)
+    window.update_to_real_sdlw_size()
+
+def close_window(window):
+    window.close()
+    gc.collect()
+
+def bench_list_scroll(run, frames):
+    from wobblui.list import List
+    from wobblui.window import Window
+    w = Window(title="benchmark", width=800, height=600)
+    start_time = time.monotonic()
+    entries = List()
+    for i in range(10000):
+        entries.add("Entry number " + str(i),
+            side_text=str(i * 7))
+    w.add(entries)
+    run.frame()
+    run.setup_time = time.monotonic() - start_time
+    for i in range(frames):
+        entries.mousewheel(0, 0, -3 if (i // 50) % 2 == 0 else 3)
+        run.frame()
+    close_window(w)
+
+def bench_label_resize(run, frames):
+    from wobblui.label import Label
+    from wobblui.window import Window
+    w = Window(title="benchmark", width=800, height=600)
+    start_time = time.monotonic()
+    html = ""
+    while len(html) < 200 * 1024:
+        html += LOREM_HTML
+    w.add(Label(html))
+    run.frame()
+    run.setup_time = time.monotonic() - start_time
+    for i in range(frames):
+        resize_window(w, 500 + (i % 10) * 40, 600)
+        run.frame()
+    close_window(w)
+
+def bench_textedit_typing(run, frames):
+    from wobblui.textedit import TextEdit
+    from wobblui.window import Window
+    w = Window(title="benchmark", width=800, height=600)
+    start_time = time.monotonic()
+    text = ("The quick brown fox jumps over the lazy dog. " * 20 +
+        "\n") * 100
+    edit = TextEdit(text)
+    w.add(edit)
+    edit.focus()
+    run.frame()
+    run.setup_time = time.monotonic() - start_time
+    for i in range(frames):
+        edit.textinput("a" if i % 10 != 9 else " ", set())
+        run.frame()
+    close_window(w)
+
+def bench_filedialog(run, frames):
+    from wobblui.filedialog import _FileOrDirChooserDialogContents
+    from wobblui.window import Window
+    directory = tempfile.mkdtemp(prefix="wobblui-benchmark-")
+    try:
+        for i in range(5000):
+            with open(os.path.join(directory,
+                    "file" + str(i) + ".txt"), "w") as f:
+                pass
+        w = Window(title="benchmark", width=800, height=600)
+        start_time = time.monotonic()
+        contents = _FileOrDirChooserDialogContents(
+            start_directory=directory)
+        w.add(contents)
+        # Run until the listing has arrived and is shown:
+        while not contents.listing_done and \
+                time.monotonic() < start_time + 60.0:
+            run.frame()
+        run.frame()
+        run.setup_time = time.monotonic() - start_time
+        for i in range(frames):
+            contents.contents_list.mousewheel(0, 0, -3)
+            run.frame()
+        close_window(w)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+def bench_dpi_switch(run, frames):
+    from wobblui.box import VBox
+    from wobblui.button import Button
+    from wobblui.label import Label
+    from wobblui.window import Window, change_dpi_scale_on_all_windows
+    w = Window(title="benchmark", width=800, height=600)
+    start_time = time.monotonic()
+    box = VBox()
+    for i in range(30):
+        box.add(Label(LOREM_HTML), expand=False)
+        box.add(Button("Button " + str(i)), expand=False)
+    w.add(box)
+    run.frame()
+    run.setup_time = time.monotonic() - start_time
+    for i in range(frames):
+        change_dpi_scale_on_all_windows(1.0 if i % 2 == 0 else 2.0)
+        run.frame()
+    change_dpi_scale_on_all_windows(1.0)
+    close_window(w)
+
+SCENARIOS = {
+    "list_scroll_10k": bench_list_scroll,
+    "label_html_200kb_resize": bench_label_resize,
+    "textedit_typing": bench_textedit_typing,
+    "filedialog_5k_files": bench_filedialog,
+    "dpi_switch": bench_dpi_switch,
+}
+
+def run_benchmarks(names=None, frames=200):
+    """ Run the given scenarios (default: all) and return the results
+        as a JSON-serializable dict.
+    """
+    setup_headless()
+    from wobblui.version import VERSION
+    if names is None or len(names) == 0:
+        names = list(SCENARIOS)
+    results = {
+        "wobblui_version": VERSION,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "video_driver": os.environ.get("SDL_VIDEODRIVER"),
+        "timestamp": time.time(),
+        "frames_per_scenario": frames,
+        "scenarios": dict(),
+    }
+    for name in names:
+        if not name in SCENARIOS:
+            raise ValueError("unknown scenario: " + str(name))
+        run = ScenarioRun(name)
+        SCENARIOS[name](run, frames)
+        results["scenarios"][name] = run.result()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run the headless wobblui rendering benchmarks.")
+    parser.add_argument("scenario", nargs="*",
+        help="scenarios to run, any of: " + ", ".join(SCENARIOS) +
+        " (default: all)")
+    parser.add_argument("--frames", type=int, default=200,
+        help="frames to measure per scenario")
+    parser.add_argument("--output", default=None,
+        help="file to write the JSON results to")
+    args = parser.parse_args()
+    results = run_benchmarks(args.scenario, frames=args.frames)
+    for name, result in results["scenarios"].items():
+        print(name + ": p50 " +
+            str(round(result["frame_ms"]["p50"], 2)) + "ms, p95 " +
+            str(round(result["frame_ms"]["p95"], 2)) + "ms, p99 " +
+            str(round(result["frame_ms"]["p99"], 2)) + "ms, max " +
+            str(round(result["frame_ms"]["max"], 2)) + "ms, " +
+            "peak textures " + str(result["peak_texture_count"]))
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(json.dumps(results, indent=4, sort_keys=True))
+    else:
+        print(json.dumps(results, indent=4, sort_keys=True))
+
+if __name__ == "__main__":
+    main()
@@ -120,7 +120,7 @@ cdef class Box(ScrollbarDrawingWidget):
         # Draw border:
         border_color = Color.black()
         if self.style is not None:
-            border_color = Color(self.style.get("widget_text"))
+            border_color = self.style.get_color("widget_text")
         if self.border > 0:
             border = self.effective_border
             draw_rectangle(
@@ -539,6 +539,30 @@ cdef class Box(ScrollbarDrawingWidget):
         self.add(BoxSpacer(), expand=True, shrink=True)
         assert(len(self._children) > 0)
 
+    def get_layout_options(self):
+        """ Returns the constructor options of this box and the
+            expand/shrink options each child was added with, e.g.
+            for layout snapshots.
+        """
+        children = []
+        i = 0
+        while i < len(self._children):
+            children.append({
+                "expand_horizontally": bool(self.expand_info[i][0]),
+                "expand_vertically": bool(self.expand_info[i][1]),
+                "shrink": bool(self.shrink_info[i]),
+            })
+            i += 1
+        return {
+            "horizontal": bool(self.horizontal),
+            "box_surrounding_padding": self.box_surrounding_padding,
+            "default_expand_on_secondary_axis":
+                bool(self.default_expand_on_secondary_axis),
+            "item_padding": self.item_padding,
+            "with_border": (self.border > 0),
+            "children": children,
+        }
+
 cdef class VBox(Box):
     def __init__(self, box_surrounding_padding=0,
             default_expand_on_secondary_axis=True,
@@ -24,11 +24,13 @@ import html
 import math
 import os
 import PIL.Image
+import weakref
 
 from wobblui.color cimport Color
 from wobblui.event cimport ForceDisabledDummyEvent, Event
 from wobblui.gfx cimport draw_rectangle, pop_render_clip, push_render_clip
 from wobblui.image cimport RenderImage, stock_image
+from wobblui.image import SharedImage
 from wobblui.richtext cimport RichText
 from wobblui.texture cimport Texture
 from wobblui.uiconf import config
@@ -76,7 +78,6 @@ class Button(Widget):
         self.contained_image = None
         self.contained_image_scale = 1.0
         self.contained_richtext_obj = None
-        self.contained_image_pil = None
         self.known_font_family = None
         self.text_layout_width = None
         self.text_scale = text_scale
@@ -155,14 +156,34 @@ class Button(Widget):
                 "and scale to width measure")
         if scale is None and scale_to_width is None:
             scale = 1.0
-        if not hasattr(pil_image_or_path, "save"):
-            pil_image_or_path = PIL.Image.open(pil_image_or_path)
+        # Buttons showing the same icon share its scaled variants
+        # through the image cache:
+        self_ref = weakref.ref(self)
+        def image_loaded():
+            button = self_ref()
+            if button is not None:
+                button.needs_redraw = True
+        self.contained_image = SharedImage(pil_image_or_path,
+            on_loaded=image_loaded)
         if scale_to_width != None:
-            scale = scale_to_width / float(pil_image_or_path.size[0])
-        self.contained_image_pil = pil_image_or_path
+            scale = scale_to_width / float(
+                self.contained_image.render_size[0])
         assert(scale != None)
         self.contained_image_scale = scale
-        self.contained_image = RenderImage(self.contained_image_pil)
+        self.needs_relayout = True
+
+    def _image_draw_size(self):
+        (w, h) = self.contained_image.render_size
+        return (math.ceil(w * self.contained_image_scale *
+            self.dpi_scale * self._image_draw_scaledown),
+            math.ceil(h * self.contained_image_scale *
+            self.dpi_scale * self._image_draw_scaledown))
+
+    def on_relayout(self):
+        # Scale the image here, so drawing doesn't need to:
+        if self.contained_image is not None:
+            (w, h) = self._image_draw_size()
+            self.contained_image.prepare(w, h)
 
     def set_image_color(self, color):
         self.image_color = Color(color)
@@ -265,11 +286,11 @@ class Button(Widget):
         if self.with_surrounding_frame:
             c = Color.white()
             if self.style is not None:
-                c = Color(self.style.get("button_bg"))
+                c = self.style.get_color("button_bg")
                 if self.style.has("button_bg_hover") and \
                         self.hovered and not self.disabled and \
                         self.clickable:
-                    c = Color(self.style.get("button_bg_hover"))
+                    c = self.style.get_color("button_bg_hover")
             if self.override_bg_color != None:
                 c = self.override_bg_color
             fill_border = max(0, round(
@@ -286,7 +307,7 @@ class Button(Widget):
             border_color = None
             if self.style is not None and \
                     self.style.has("button_border"):
-                border_color = Color(self.style.get("button_border"))
+                border_color = self.style.get_color("button_border")
             if border_color is not None:
                 if self.with_surrounding_frame_all_sides:
                     # Top border:
@@ -340,9 +361,9 @@ class Button(Widget):
         if full_available_size_x <= 0 or full_available_size_y <= 0:
             return
         used_up_size_x = (self.text_layout_width or 0)
-        if self.contained_image_pil is not None:
+        if self.contained_image is not None:
             used_up_size_x += math.ceil(
-                self.contained_image_pil.size[0] *
+                self.contained_image.render_size[0] *
                 self.contained_image_scale * self.dpi_scale) +\
                 round(self.border_size * 0.7)
         extra_size = max(0, full_available_size_x - used_up_size_x)
@@ -350,10 +371,10 @@ class Button(Widget):
         if self.contained_image is not None:
             x = offset_x
             y = round(self.border_size)
-            w_full_float = (self.contained_image_pil.size[0] *
+            w_full_float = (self.contained_image.render_size[0] *
                 self.contained_image_scale *
                 self.dpi_scale * 1.0)
-            h_full_float = (self.contained_image_pil.size[1] *
+            h_full_float = (self.contained_image.render_size[1] *
                 self.contained_image_scale *
                 self.dpi_scale * 1.0)
             w_full = math.ceil(w_full_float)
@@ -373,13 +394,13 @@ class Button(Widget):
         if self.contained_richtext_obj != None:
             c = Color.white()
             if self.style != None:
-                c = Color(self.style.get("widget_text"))
+                c = self.style.get_color("widget_text")
                 if self.disabled and self.style.has("widget_disabled_text"):
-                    c = Color(self.style.get("widget_disabled_text"))
+                    c = self.style.get_color("widget_disabled_text")
                 elif self.hovered and \
                         self.style.has("widget_text_hover") and \
                         not self.disabled:
-                    c = Color(self.style.get("widget_text_hover"))
+                    c = self.style.get_color("widget_text_hover")
             if self.override_text_color != None:
                 c = self.override_text_color
             sdl.SDL_SetRenderDrawColor(self.renderer, 255, 255, 255, 255)
@@ -415,7 +436,7 @@ class Button(Widget):
         my_h = round(self.border_size * 2)
         if self.contained_image != None:
             my_h = max(my_h,
-                round(self.contained_image_pil.size[1] *\
+                round(self.contained_image.render_size[1] *\
                 self.contained_image_scale * self.dpi_scale +
                 self.border_size * 2))
         if self.contained_richtext_obj != None:
@@ -427,7 +448,7 @@ class Button(Widget):
     def get_natural_width(self):
         my_w = round(self.border_size * 2)
         if self.contained_image != None:
-            my_w += round(self.contained_image_pil.size[0] *\
+            my_w += round(self.contained_image.render_size[0] *\
                 self.contained_image_scale * self.dpi_scale)
         if self.contained_image != None and \
                 self.contained_richtext_obj != None:
@@ -452,13 +473,13 @@ class ImageButton(Button):
         if self.style != None:
             color = self.style.get("widget_text")
             if self.style.has("widget_text_saturated"):
-                color = Color(self.style.get("widget_text_saturated"))
+                color = self.style.get_color("widget_text_saturated")
             if self.disabled and self.style.has("widget_disabled_text"):
-                color = Color(self.style.get("widget_disabled_text"))
+                color = self.style.get_color("widget_disabled_text")
         assert(isinstance(color, Color))
         self.set_image_color(color)
         if self.style != None and self.style.has("widget_text_hover"):
-            color = Color(self.style.get("widget_text_hover"))
+            color = self.style.get_color("widget_text_hover")
             self.set_image_color_hover(color)
 
     def __repr__(self):
@@ -469,14 +490,14 @@ class ImageButton(Button):
             orig_img.replace("'", "'\"'\"'") + "'>"
 
     def do_redraw(self):
-        color = Color(self.style.get("widget_text"))
+        color = self.style.get_color("widget_text")
         if self.style.has("saturated_widget_text"):
-            color = Color(self.style.get("saturated_widget_text"))
+            color = self.style.get_color("saturated_widget_text")
         if self.disabled and self.style.has("widget_disabled_text"):
-            color = Color(self.style.get("widget_disabled_text"))
+            color = self.style.get_color("widget_disabled_text")
         self.image_color = color
         if self.style != None and self.style.has("widget_text_hover"):
-            color = Color(self.style.get("widget_text_hover"))
+            color = self.style.get_color("widget_text_hover")
             self.image_color_hover = color
         super().do_redraw()
 
@@ -27,7 +27,7 @@ import sys
 
 from wobblui.box import HBox, VBox
 from wobblui.font.manager import font_manager
-from wobblui.label import Label
+from wobblui.logview import LogView
 from wobblui.textentry import TextEntry
 from wobblui.widget import Widget
 from wobblui.woblog import logdebug, logerror, loginfo, logwarning
@@ -54,12 +54,12 @@ class DebugTerminal(VBox):
                     cmd = cmd.strip()
                     if cmd == "exit" or cmd == "quit" or \
                             cmd == "exit()" or cmd == "quit()":
-                        self.output_label.set_text("")
+                        self.output_label.clear()
                         if self.on_exit_callback is not None:
                             self.on_exit_callback()
                         return True
                     elif cmd == "reset" or cmd == "clear":
-                        self.output_label.set_text("")
+                        self.output_label.clear()
                         return True
                     elif cmd == "help" or cmd == "?" or \
                             cmd == "help()":
@@ -96,20 +96,9 @@ class DebugTerminal(VBox):
                         s = s.decode("utf-8", "replace")
                     except AttributeError:
                         pass
+                    self.output_label.append_text("> " + text)
                     if len(s.strip()) > 0:
-                        if s.endswith("\n"):
-                            s = s[:-1]
-                        elif s.endswith("\r\n"):
-                            s = s[:-2]
-                        self.output_label.set_text(
-                            self.output_label.get_text() + "\n> " +
-                            text + "\n" + s
-                            )
-                    else:
-                        self.output_label.set_text(
-                            self.output_label.get_text() + "\n> " +
-                            text
-                            )
+                        self.output_label.append_text(s)
 
                     # Scroll down if we were scrolled down:
                     if was_scrolled_down:
@@ -137,7 +126,7 @@ class DebugTerminal(VBox):
                     "failed to load monospace font for terminal")
                 font = None
             if self.output_label is None:
-                self.output_label = Label(font=font)
+                self.output_label = LogView(font=font)
             if font is not None:
                 self.output_label.set_font(font)
 
@@ -0,0 +1,67 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+
+from libc.stdint cimport uintptr_t
+
+
+ctypedef struct _SDL_Rect:
+    int x, y, w, h
+
+ctypedef int (*_sdl_RenderFillRectsType)(
+    void *renderer, const _SDL_Rect *rects, int count
+) nogil
+ctypedef int (*_sdl_RenderCopyType)(
+    void *renderer, void *texture, void *rect1, void *rect2
+) nogil
+ctypedef int (*_sdl_SetRenderDrawColorType)(void *renderer,
+    unsigned char r, unsigned char g, unsigned char b, unsigned char a
+) nogil
+ctypedef int (*_sdl_SetRenderDrawBlendModeType)(
+    void *renderer, int mode
+) nogil
+ctypedef int (*_sdl_SetTextureColorModType)(void *texture,
+    unsigned char r, unsigned char g, unsigned char b
+) nogil
+
+
+cdef class DrawBatch:
+    cdef uintptr_t renderer_address
+    cdef list commands
+    cdef int depth
+
+    cdef record_fill(self, unsigned int color, int x, int y, int w, int h)
+    cdef record_copy(self, object texture_obj,
+        uintptr_t texture_address, unsigned int color,
+        int src_x, int src_y, int src_w, int src_h,
+        int dst_x, int dst_y, int dst_w, int dst_h)
+    cdef flush(self)
+
+cdef DrawBatch get_draw_batch(uintptr_t renderer_address)
+
+cdef flush_draw_batch_by_address(uintptr_t renderer_address)
+
+cpdef begin_draw_batch(renderer)
+
+cpdef end_draw_batch(renderer)
+
+cpdef flush_draw_batch(renderer)
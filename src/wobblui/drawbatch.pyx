@@ -0,0 +1,251 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+
+import ctypes
+import cython
+from libc.stdint cimport uintptr_t
+from libc.stdlib cimport realloc
+
+from wobblui.perf cimport CPerf as Perf
+from wobblui.render_lock cimport can_renderer_safely_be_used
+from wobblui.uiconf import config
+
+
+cdef _sdl_RenderFillRectsType _sdl_RenderFillRects = NULL
+cdef _sdl_RenderCopyType _sdl_RenderCopy = NULL
+cdef _sdl_SetRenderDrawColorType _sdl_SetRenderDrawColor = NULL
+cdef _sdl_SetRenderDrawBlendModeType _sdl_SetRenderDrawBlendMode = NULL
+cdef _sdl_SetTextureColorModType _sdl_SetTextureColorMod = NULL
+cdef int _sdl_BLENDMODE_BLEND = 0
+
+cdef _SDL_Rect *fill_rects = NULL
+cdef int fill_rects_size = 0
+
+cdef _load_function_ptrs():
+    global _sdl_RenderFillRects, _sdl_RenderCopy, \
+        _sdl_SetRenderDrawColor, _sdl_SetRenderDrawBlendMode, \
+        _sdl_SetTextureColorMod, _sdl_BLENDMODE_BLEND
+    if _sdl_RenderFillRects:
+        return
+    import sdl2 as sdl
+    _sdl_BLENDMODE_BLEND = sdl.SDL_BLENDMODE_BLEND
+    _sdl_RenderCopy = <_sdl_RenderCopyType>(
+        cython.operator.dereference(<uintptr_t*>(
+        <uintptr_t>ctypes.addressof(sdl.SDL_RenderCopy)
+        ))
+    )
+    _sdl_SetRenderDrawColor = <_sdl_SetRenderDrawColorType>(
+        cython.operator.dereference(<uintptr_t*>(
+        <uintptr_t>ctypes.addressof(sdl.SDL_SetRenderDrawColor)
+        ))
+    )
+    _sdl_SetRenderDrawBlendMode = <_sdl_SetRenderDrawBlendModeType>(
+        cython.operator.dereference(<uintptr_t*>(
+        <uintptr_t>ctypes.addressof(sdl.SDL_SetRenderDrawBlendMode)
+        ))
+    )
+    _sdl_SetTextureColorMod = <_sdl_SetTextureColorModType>(
+        cython.operator.dereference(<uintptr_t*>(
+        <uintptr_t>ctypes.addressof(sdl.SDL_SetTextureColorMod)
+        ))
+    )
+    _sdl_RenderFillRects = <_sdl_RenderFillRectsType>(
+        cython.operator.dereference(<uintptr_t*>(
+        <uintptr_t>ctypes.addressof(sdl.SDL_RenderFillRects)
+        ))
+    )
+
+cdef _ensure_fill_rects(int count):
+    global fill_rects, fill_rects_size
+    cdef _SDL_Rect *new_rects = NULL
+    if count <= fill_rects_size:
+        return
+    new_rects = <_SDL_Rect *>realloc(fill_rects,
+        sizeof(_SDL_Rect) * count * 2)
+    if new_rects == NULL:
+        raise MemoryError("failed to allocate fill rects")
+    fill_rects = new_rects
+    fill_rects_size = count * 2
+
+
+cdef class DrawBatch:
+    """ A per-renderer list of recorded draw commands. Flushing
+        merges consecutive same-color rectangle fills into one
+        SDL_RenderFillRects() call, and consecutive copies of the
+        same texture share a single color mod update.
+
+        While a batch is active, anything issuing SDL render calls
+        directly must call flush_draw_batch() first to keep the
+        drawing order intact. Clip and render target changes in
+        wobblui already do that.
+
+        MEMBERS IN drawbatch.pxd
+    """
+
+    def __init__(self, uintptr_t renderer_address):
+        self.renderer_address = renderer_address
+        self.commands = []
+        self.depth = 0
+
+    cdef record_fill(self, unsigned int color, int x, int y, int w, int h):
+        self.commands.append((0, color, x, y, w, h))
+
+    cdef record_copy(self, object texture_obj,
+            uintptr_t texture_address, unsigned int color,
+            int src_x, int src_y, int src_w, int src_h,
+            int dst_x, int dst_y, int dst_w, int dst_h):
+        # texture_obj is kept to stop the texture from going away
+        # before the flush, and to restore its color mod afterwards:
+        self.commands.append((1, color, texture_obj, texture_address,
+            src_x, src_y, src_w, src_h, dst_x, dst_y, dst_w, dst_h))
+
+    cdef flush(self):
+        cdef list commands = self.commands
+        cdef int count = len(commands)
+        cdef int i = 0
+        cdef int j, k
+        cdef unsigned int color
+        cdef int sdl_calls = 0
+        cdef uintptr_t texture_address
+        cdef void *renderer = <void*>self.renderer_address
+        cdef _SDL_Rect src_rect, dst_rect
+        if count == 0:
+            return
+        self.commands = []
+        if not can_renderer_safely_be_used(self.renderer_address):
+            return
+        _load_function_ptrs()
+        touched_textures = dict()
+        while i < count:
+            cmd = commands[i]
+            color = cmd[1]
+            j = i + 1
+            if cmd[0] == 0:
+                while j < count and commands[j][0] == 0 and \
+                        commands[j][1] == color:
+                    j += 1
+                _ensure_fill_rects(j - i)
+                k = i
+                while k < j:
+                    fill_rects[k - i].x = commands[k][2]
+                    fill_rects[k - i].y = commands[k][3]
+                    fill_rects[k - i].w = commands[k][4]
+                    fill_rects[k - i].h = commands[k][5]
+                    k += 1
+                with nogil:
+                    _sdl_SetRenderDrawColor(renderer,
+                        (color >> 24) & 0xff, (color >> 16) & 0xff,
+                        (color >> 8) & 0xff, color & 0xff)
+                    _sdl_SetRenderDrawBlendMode(renderer,
+                        _sdl_BLENDMODE_BLEND)
+                    _sdl_RenderFillRects(renderer, fill_rects, j - i)
+                sdl_calls += 3
+            else:
+                texture_address = cmd[3]
+                while j < count and commands[j][0] == 1 and \
+                        commands[j][1] == color and \
+                        commands[j][3] == texture_address:
+                    j += 1
+                texture_obj = cmd[2]
+                if texture_obj is not None:
+                    if texture_obj.is_unloaded():
+                        i = j
+                        continue
+                    touched_textures[id(texture_obj)] = texture_obj
+                _sdl_SetTextureColorMod(<void*>texture_address,
+                    (color >> 16) & 0xff, (color >> 8) & 0xff,
+                    color & 0xff)
+                sdl_calls += 1
+                k = i
+                while k < j:
+                    cmd = commands[k]
+                    src_rect.x = cmd[4]
+                    src_rect.y = cmd[5]
+                    src_rect.w = cmd[6]
+                    src_rect.h = cmd[7]
+                    dst_rect.x = cmd[8]
+                    dst_rect.y = cmd[9]
+                    dst_rect.w = cmd[10]
+                    dst_rect.h = cmd[11]
+                    with nogil:
+                        _sdl_RenderCopy(renderer, <void*>texture_address,
+                            &src_rect, &dst_rect)
+                    k += 1
+                sdl_calls += j - i
+            i = j
+        for texture_obj in touched_textures.values():
+            texture_obj._restore_color_mod()
+        Perf.count("draw_batch_commands", count)
+        Perf.count("draw_batch_sdl_calls", sdl_calls)
+
+
+cdef dict active_batches = dict()
+
+cdef DrawBatch get_draw_batch(uintptr_t renderer_address):
+    if len(active_batches) == 0:
+        return None
+    return active_batches.get(renderer_address)
+
+cdef flush_draw_batch_by_address(uintptr_t renderer_address):
+    cdef DrawBatch batch = get_draw_batch(renderer_address)
+    if batch is not None:
+        batch.flush()
+
+cpdef begin_draw_batch(renderer):
+    """ Start recording rectangle fills and texture copies for the
+        given renderer instead of drawing them right away. Calls
+        nest, the commands are drawn at the outermost
+        end_draw_batch(). Does nothing if the batch_draw_calls
+        setting is off.
+    """
+    cdef DrawBatch batch
+    cdef uintptr_t renderer_address = <uintptr_t>(
+        ctypes.addressof(renderer.contents))
+    batch = active_batches.get(renderer_address)
+    if batch is None:
+        if not config.get("batch_draw_calls"):
+            return
+        batch = DrawBatch(renderer_address)
+        active_batches[renderer_address] = batch
+    batch.depth += 1
+
+cpdef end_draw_batch(renderer):
+    cdef DrawBatch batch
+    cdef uintptr_t renderer_address = <uintptr_t>(
+        ctypes.addressof(renderer.contents))
+    batch = active_batches.get(renderer_address)
+    if batch is None:
+        return
+    batch.depth -= 1
+    if batch.depth > 0:
+        return
+    del(active_batches[renderer_address])
+    batch.flush()
+
+cpdef flush_draw_batch(renderer):
+    """ Draw all commands recorded so far for the given renderer.
+        Needed before issuing SDL render calls directly while a
+        batch may be active.
+    """
+    flush_draw_batch_by_address(<uintptr_t>(
+        ctypes.addressof(renderer.contents)))
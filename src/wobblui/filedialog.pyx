@@ -20,10 +20,12 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+import collections
 import functools
 import html
 import os
 import platform
+import threading
 import time
 
 from wobblui.box cimport HBox, VBox
@@ -31,12 +33,12 @@ from wobblui.button import Button, ImageButton
 from wobblui.color cimport Color
 from wobblui.gfx cimport draw_rectangle
 from wobblui.image cimport stock_image
-from wobblui.label import Label
+from wobblui.label import ImageWithLabel, Label
 from wobblui.list import List
 from wobblui.modal cimport ModalDialog
 from wobblui.osinfo cimport is_android
 from wobblui.textentry import TextEntry
-from wobblui.timer import schedule
+from wobblui.timer import run_on_ui_thread, schedule
 from wobblui.topbar import Topbar
 from wobblui.uiconf import config
 from wobblui.widget cimport Widget
@@ -45,6 +47,92 @@ from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
 
 CHOSEN_NOTHING=-1
 
+# Recent listings by path, with the folder's mtime when they were made:
+directory_listing_cache = collections.OrderedDict()
+directory_listing_cache_lock = threading.Lock()
+DIRECTORY_LISTING_CACHE_SIZE = 16
+
+class _DirectoryListingJob(object):
+    """ Lists a folder with os.scandir() in a worker thread, and hands
+        the (name, is_dir) entries to batch_callback(batch, is_last)
+        on the UI thread as they come in. done_callback(error) is
+        called at the end, with the OSError if listing failed.
+
+        Listings are cached and reused while the folder's mtime stays
+        the same, so returning to a folder is instant.
+    """
+
+    def __init__(self, path, batch_callback, done_callback,
+            int batch_size=500):
+        self.path = path
+        self.batch_callback = batch_callback
+        self.done_callback = done_callback
+        self.batch_size = batch_size
+        self.cancelled = False
+        # A thread of its own, since a hanging network mount must not
+        # block listing other folders:
+        self._thread = threading.Thread(target=self._list, daemon=True)
+        self._thread.start()
+
+    def cancel(self):
+        """ No callbacks will be called after this. """
+        self.cancelled = True
+
+    def _list(self):
+        # Runs in the worker thread.
+        try:
+            mtime = os.stat(self.path).st_mtime
+            with directory_listing_cache_lock:
+                cached = directory_listing_cache.get(self.path)
+                if cached is not None and cached[0] == mtime:
+                    directory_listing_cache.move_to_end(self.path)
+            if cached is not None and cached[0] == mtime:
+                run_on_ui_thread(self._deliver_batch, cached[1], True)
+                run_on_ui_thread(self._deliver_done, None)
+                return
+            items = []
+            batch = []
+            last_delivery = time.monotonic()
+            with os.scandir(self.path) as it:
+                for entry in it:
+                    if self.cancelled:
+                        return
+                    try:
+                        is_dir = entry.is_dir()
+                    except OSError:
+                        is_dir = None
+                    batch.append((entry.name, is_dir))
+                    if len(batch) >= self.batch_size or \
+                            time.monotonic() > last_delivery + 0.1:
+                        items += batch
+                        run_on_ui_thread(self._deliver_batch, batch,
+                            False)
+                        batch = []
+                        last_delivery = time.monotonic()
+            items += batch
+            run_on_ui_thread(self._deliver_batch, batch, True)
+            with directory_listing_cache_lock:
+                directory_listing_cache[self.path] = (mtime, items)
+                directory_listing_cache.move_to_end(self.path)
+                while len(directory_listing_cache) > \
+                        DIRECTORY_LISTING_CACHE_SIZE:
+                    directory_listing_cache.popitem(last=False)
+        except OSError as e:
+            run_on_ui_thread(self._deliver_done, e)
+            return
+        run_on_ui_thread(self._deliver_done, None)
+
+    def _deliver_batch(self, batch, is_last):
+        if self.cancelled:
+            return
+        self.batch_callback(batch, is_last)
+
+    def _deliver_done(self, error):
+        if self.cancelled:
+            return
+        self.cancelled = True
+        self.done_callback(error)
+
 class _FileOrDirChooserDialogContents(Widget):
     def __init__(self,
             choose_dir=False,
@@ -74,12 +162,20 @@ class _FileOrDirChooserDialogContents(Widget):
         self.start_directory = start_directory
         self.listing_data = None
         self.listing_path = None
+        self._listing_job = None
+        self._unfiltered_listing = []
+        self._streamed_batches = 0
         self.file_filter = file_filter
         vbox = VBox()
         nav_hbox = HBox()
         self.location_label = Label("")
         nav_hbox.add(self.location_label, expand=True,
             shrink=True)
+        self.loading_indicator = ImageWithLabel(stock_image("hourglass"),
+            scale_to_width=20, color_with_text_color=True)
+        self.loading_indicator.set_html("Loading...")
+        self.loading_indicator.invisible = True
+        nav_hbox.add(self.loading_indicator, expand=False)
         self.up_button = Button("To Parent")
         self.up_button.set_image(stock_image("outandup"),
             scale_to_width=25.0)
@@ -137,12 +233,24 @@ class _FileOrDirChooserDialogContents(Widget):
         try:
             if not os.path.exists(path):
                 return False
-            contents = os.listdir(path)
+            with os.scandir(path):
+                pass
             return True
         except (OSError, PermissionError):
             return False
 
+    @property
+    def listing_done(self):
+        """ Whether the listing of the current folder has fully arrived
+            (or failed), rather than still streaming in.
+        """
+        return (self.listing_data is not None and
+            self._listing_job is None)
+
     def abort_dialog(self):
+        if self._listing_job is not None:
+            self._listing_job.cancel()
+            self._listing_job = None
         self.done_callback(None)
 
     def select_item(self, no_target=False):
@@ -185,6 +293,9 @@ class _FileOrDirChooserDialogContents(Widget):
 
     def on_parentchanged(self):
         if self.parent_window is None:
+            if self._listing_job is not None:
+                self._listing_job.cancel()
+                self._listing_job = None
             return
         if self.debug:
             logdebug("wobblui.filedialog " + str(id(self)) +
@@ -213,86 +324,115 @@ class _FileOrDirChooserDialogContents(Widget):
             logdebug("wobblui.filedialog " + str(id(self)) + ": " +
                 "refreshing dialog with path: " +
                 str(self.current_path))
-        try:
-            new_listing_data = [[f, None] for f in \
-                os.listdir(self.current_path)]
-            for item in new_listing_data:
-                try:
-                    item[1] = os.path.isdir(os.path.join(
-                        self.current_path, item[0]))
-                except (OSError, PermissionError) as e:
-                    if self.debug:
-                        logdebug("wobblui.filedialog " +
-                            str(id(self)) + ": " +
-                            "error getting isdir for '" +
-                            str(item) + "': " + str(e))
-            if self.debug:
-                logdebug("wobblui.filedialog " + str(id(self)) + ": " +
-                    "listing obtained is: " +
-                    str(new_listing_data))
-        except (OSError, PermissionError) as e:
+        if self._listing_job is not None:
+            self._listing_job.cancel()
+        self.contents_list.clear()
+        self.listing_path = self.current_path
+        self.listing_data = []
+        self._unfiltered_listing = []
+        self._streamed_batches = 0
+        self.location_label.set_html("<b>At:</b> " +
+            html.escape(os.path.normpath(os.path.abspath(
+                self.current_path))))
+        self.loading_indicator.invisible = False
+        self._listing_job = _DirectoryListingJob(self.current_path,
+            self._listing_batch_received, self._listing_done)
+        self.needs_redraw = True
+        self.needs_relayout = True
+
+    def _listing_batch_received(self, batch, is_last):
+        self._streamed_batches += 1
+        self._unfiltered_listing += batch
+        if is_last and self._streamed_batches == 1:
+            # Everything arrived at once, e.g. from the cache.
+            # Show it sorted right away:
+            return
+        items = self._filter_listing(batch)
+        self.listing_data += items
+        self._add_listing_items(items)
+
+    def _listing_done(self, error):
+        self._listing_job = None
+        self.loading_indicator.invisible = True
+        if error is not None:
             if self.debug:
                 logdebug("wobblui.filedialog " + str(id(self)) + ": " +
                     "failed to obtain listing: " +
-                    str(e))
-            new_listing_data = "error"
-        if self.listing_path != self.current_path and \
-                new_listing_data != self.listing_data:
-            if self.debug:
-                logdebug("wobblui.filedialog " + str(id(self)) + ": " +
-                    "rebuilding list contents")
+                    str(error))
             self.contents_list.clear()
-            self.listing_path = self.current_path
-            self.listing_data = new_listing_data
-            if self.listing_data == "error":
-                self.contents_list.add_html("<b>Failed to access " +
-                    "folder contents.</b>")
-            elif len(self.listing_data) == 0:
-                self.contents_list.add_html("<i>(Empty)</i>")
-            else:
-                def sort_items(a, b):
-                    if a[1] == True and b[1] != True:
-                        return -1
-                    elif a[1] != True and b[1] == True:
-                        return 1
-                    if (a[0].lower() > b[0].lower()):
-                        return 1
-                    return -1
-                self.listing_data = sorted(
-                    self.listing_data, key=\
-                    functools.cmp_to_key(sort_items))
-                if not self.show_hidden:
-                    self.listing_data = [entry for entry in \
-                        self.listing_data if not entry[0].startswith(".")]
-                if self.choose_dir:
-                    self.listing_data = [entry for entry in \
-                        self.listing_data if entry[1]]
-                if self.file_filter != "*":
-                    filters = self.file_filter.replace(" ", ",").split(",")
-                    filters = [f.strip() for f in filters if\
-                        len(f.strip()) > 0]
-                    def is_filtered(name):
-                        for filefilter in filters:
-                            if filefilter.startswith("*"):
-                                if name.lower().endswith(filefilter[1:]):
-                                    return False
-                        return True
-                    self.listing_data = [entry for entry in \
-                        self.listing_data if not is_filtered(
-                        entry[0].lower()) or entry[1]]
-                for item in self.listing_data:
-                    t = item[0]
-                    if len(t) > 50:
-                        t = t[:50] + "..."
-                    side_text = None
-                    if item[1]:
-                        side_text = "(Folder)"
-                    self.contents_list.add(t, side_text=side_text)
-            self.location_label.set_html("<b>At:</b> " +
-                html.escape(os.path.normpath(os.path.abspath(
-                    self.current_path))))
-            self.needs_redraw = True
-            self.needs_relayout = True
+            self.listing_data = "error"
+            self.contents_list.add_html("<b>Failed to access " +
+                "folder contents.</b>")
+            return
+        if self.debug:
+            logdebug("wobblui.filedialog " + str(id(self)) + ": " +
+                "listing obtained is: " +
+                str(self._unfiltered_listing))
+        shown_while_streaming = (len(self.listing_data) > 0)
+        if not shown_while_streaming:
+            # E.g. a cached listing that arrived in one go:
+            self.listing_data = self._sort_listing(
+                self._filter_listing(self._unfiltered_listing))
+        self._unfiltered_listing = []
+        if len(self.listing_data) == 0:
+            self.contents_list.clear()
+            self.contents_list.add_html("<i>(Empty)</i>")
+            return
+        if not shown_while_streaming:
+            self._add_listing_items(self.listing_data)
+            return
+        # Sort the streamed in entries in place, which keeps the
+        # scroll position and what the user picked in the meantime:
+        order = self._sort_listing(range(len(self.listing_data)),
+            key=lambda i: self.listing_data[i])
+        self.listing_data = [self.listing_data[i] for i in order]
+        self.contents_list.reorder(order)
+
+    def _filter_listing(self, items):
+        if not self.show_hidden:
+            items = [entry for entry in \
+                items if not entry[0].startswith(".")]
+        if self.choose_dir:
+            items = [entry for entry in \
+                items if entry[1]]
+        if self.file_filter != "*":
+            filters = self.file_filter.replace(" ", ",").split(",")
+            filters = [f.strip() for f in filters if\
+                len(f.strip()) > 0]
+            def is_filtered(name):
+                for filefilter in filters:
+                    if filefilter.startswith("*"):
+                        if name.lower().endswith(filefilter[1:]):
+                            return False
+                return True
+            items = [entry for entry in \
+                items if not is_filtered(
+                entry[0].lower()) or entry[1]]
+        return items
+
+    def _sort_listing(self, items, key=None):
+        def sort_items(a, b):
+            if key is not None:
+                (a, b) = (key(a), key(b))
+            if a[1] == True and b[1] != True:
+                return -1
+            elif a[1] != True and b[1] == True:
+                return 1
+            if (a[0].lower() > b[0].lower()):
+                return 1
+            return -1
+        return sorted(items, key=functools.cmp_to_key(sort_items))
+
+    def _add_listing_items(self, items):
+        texts = []
+        side_texts = []
+        for item in items:
+            t = item[0]
+            if len(t) > 50:
+                t = t[:50] + "..."
+            texts.append(t)
+            side_texts.append("(Folder)" if item[1] else None)
+        self.contents_list.extend(texts, side_texts=side_texts)
 
     def on_relayout(self):
         inner_padding = max(2, round(5.0 * self.dpi_scale))
@@ -305,7 +445,7 @@ class _FileOrDirChooserDialogContents(Widget):
     def on_redraw(self):
         border_c = Color.black()
         if self.style != None:
-            border_c = Color(self.style.get("window_bg"))
+            border_c = self.style.get_color("window_bg")
         draw_rectangle(self.renderer, 0, 0,
                        self.width, self.height, color=border_c)
         self.draw_children()
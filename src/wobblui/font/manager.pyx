@@ -29,6 +29,7 @@ import time
 from wobblui.cache cimport KeyValueCache
 from wobblui.color cimport Color
 import wobblui.font.info
+from wobblui.perf cimport CPerf as Perf
 cimport wobblui.font.sdlfont as sdlfont
 from wobblui.sdlinit cimport initialize_sdl
 from wobblui.texture cimport Texture
@@ -41,6 +42,15 @@ render_size_cache = KeyValueCache(size=500)
 rendered_words_cache = KeyValueCache(size=50,
     destroy_func=lambda x: x._force_unload())
 
+def _free_surface(surface):
+    import sdl2 as sdl
+    sdl.SDL_FreeSurface(surface)
+
+# Rasterized words independent of the renderer, so that textures lost
+# with a renderer can be restored with just an upload:
+rendered_word_surfaces_cache = KeyValueCache(size=200,
+    destroy_func=_free_surface)
+
 
 cdef class Font:
     cdef public int italic, bold
@@ -92,7 +102,9 @@ cdef class Font:
         text_bytes = text.encode("utf-8", "replace")
         result = render_size_cache.get(str((unique_key, text_bytes)))
         if result != None:
+            Perf.count("render_size_cache_hit")
             return result
+        Perf.count("render_size_cache_miss")
         font = self.get_sdl_font()
         result = sdlfont.get_thread_safe_render_size(font, text_bytes)
         render_size_cache.add(str((unique_key, text_bytes)), result)
@@ -109,25 +121,30 @@ cdef class Font:
         global rendered_words_cache
         import sdl2 as sdl
         import sdl2.sdlttf as sdlttf
-        cdef str key = str((self.font_family, self.italic, self.bold,
-            self.px_size, str(ctypes.addressof(
-                renderer.contents)))) + "_" + text
+        cdef str surface_key = str((self.font_family, self.italic,
+            self.bold, self.px_size)) + "_" + text
+        cdef str key = str(ctypes.addressof(
+            renderer.contents)) + "_" + surface_key
         value = rendered_words_cache.get(key)
         if value != None:
+            Perf.count("rendered_words_cache_hit")
             return value
-        font = self.get_sdl_font()
-        c = sdl.SDL_Color(255, 255, 255)
-        try:
-            text_bytes = text.encode("utf-8", "replace")
-        except AttributeError:
-            pass
-        surface = sdlttf.TTF_RenderUTF8_Blended(
-            font.font, text_bytes, c)
-        if not surface:
-            raise RuntimeError("failed to render text: " +
-                str(text_bytes))
+        Perf.count("rendered_words_cache_miss")
+        surface = rendered_word_surfaces_cache.get(surface_key)
+        if surface is None:
+            font = self.get_sdl_font()
+            c = sdl.SDL_Color(255, 255, 255)
+            try:
+                text_bytes = text.encode("utf-8", "replace")
+            except AttributeError:
+                pass
+            surface = sdlttf.TTF_RenderUTF8_Blended(
+                font.font, text_bytes, c)
+            if not surface:
+                raise RuntimeError("failed to render text: " +
+                    str(text_bytes))
+            rendered_word_surfaces_cache.add(surface_key, surface)
         tex = Texture.new_from_sdl_surface(renderer, surface)
-        sdl.SDL_FreeSurface(surface)
         rendered_words_cache.add(key, tex)
         return tex
 
@@ -328,6 +345,7 @@ cdef class FontManager:
         self.font_by_sizedpistyle_cache_times[key] =\
             time.monotonic()
         if key not in self.font_by_sizedpistyle_cache:
+            Perf.count("font_cache_miss")
             f = Font(name, actual_px_size,
                 italic=italic,
                 bold=bold)
@@ -337,6 +355,8 @@ cdef class FontManager:
             if self.next_limit_cache_counter > 10:
                 self.next_limit_cache_counter = 0
                 self._limit_cache()
+        else:
+            Perf.count("font_cache_hit")
         return self.font_by_sizedpistyle_cache[key]
 
 
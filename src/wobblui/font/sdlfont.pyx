@@ -26,7 +26,7 @@ import queue
 from queue import Queue
 import threading
 
-from wobblui.sdlinit import initialize_sdl
+from wobblui.sdlinit import initialize_sdl, wake_up_event_loop
 
 
 
@@ -186,6 +186,7 @@ cpdef tuple get_thread_safe_render_size(SDLFontWrapper sdl_ttf_font,
         text_bytes = bytes(text)
         size_job = SDLFontSizeJob(sdl_ttf_font, text_bytes)
         job_queue.put(size_job)
+        wake_up_event_loop()
         size_job.wait_for_done()
         return size_job.result
 
@@ -204,6 +205,7 @@ cdef class SDLFontWrapper:
 
     def __dealloc__(self):
         job_queue.put(SDLFontCloseJob(self.font))
+        wake_up_event_loop()
 
 
 cdef int ttf_was_initialized = False
@@ -220,6 +222,7 @@ cpdef SDLFontWrapper get_thread_safe_sdl_font(path, px_size):
         return load_job.result
     else:
         job_queue.put(load_job)
+        wake_up_event_loop()
         load_job.wait_for_done()
         return load_job.result
 
@@ -27,6 +27,8 @@ import math
 import weakref
 
 from wobblui.color cimport Color
+from wobblui.drawbatch cimport DrawBatch, get_draw_batch, \
+    flush_draw_batch_by_address
 from wobblui.font.manager cimport c_font_manager as font_manager
 from wobblui.perf cimport CPerf as Perf
 from wobblui.render_lock cimport can_renderer_safely_be_used
@@ -56,14 +58,12 @@ cpdef draw_rectangle(
         double unfilled_border_thickness=1.0,
         double alpha=1.0):
     global _rect
-    if not can_renderer_safely_be_used(
-            <uintptr_t>ctypes.addressof(renderer.contents)
-            ):
+    cdef DrawBatch batch
+    cdef uintptr_t renderer_address = <uintptr_t>(
+        ctypes.addressof(renderer.contents))
+    if not can_renderer_safely_be_used(renderer_address):
         raise RuntimeError("cannot draw now, "
                            "hardware context unavailable")
-    import sdl2 as sdl
-    if _rect is None:
-        _rect = sdl.SDL_Rect()
     if color is None:
         color = Color("#aaa")
     if not filled:
@@ -81,6 +81,21 @@ cpdef draw_rectangle(
             x + w - min(border, w), y, min(border, w), h,
             color=color, filled=True)
         return
+    batch = get_draw_batch(renderer_address)
+    if batch is not None:
+        if abs(w) + min(0, x) <= 0 or abs(h) + min(0, y) <= 0:
+            return
+        batch.record_fill(
+            (max(0, min(255, round(color.value_red))) << 24) |
+            (max(0, min(255, round(color.value_green))) << 16) |
+            (max(0, min(255, round(color.value_blue))) << 8) |
+            max(0, min(255, round(255.0 * alpha))),
+            max(0, x), max(0, y),
+            abs(w) + min(0, x), abs(h) + min(0, y))
+        return
+    import sdl2 as sdl
+    if _rect is None:
+        _rect = sdl.SDL_Rect()
     _rect.x = max(0, round(x))
     _rect.y = max(0, round(y))
     _rect.w = round(abs(w) + min(0, x))
@@ -114,6 +129,9 @@ cdef get_dashed_texture(renderer, int vertical=False):
     renderer_key = str(ctypes.addressof(renderer.contents))
     if (vertical, renderer_key) in dashed_texture_store:
         return dashed_texture_store[(vertical, renderer_key)]
+    # Switching the render target, so draw what's pending first:
+    flush_draw_batch_by_address(
+        <uintptr_t>ctypes.addressof(renderer.contents))
     if not vertical:
         tex = sdl.SDL_CreateTexture(
             renderer, sdl.SDL_PIXELFORMAT_ARGB8888,
@@ -142,6 +160,8 @@ cdef get_dashed_texture(renderer, int vertical=False):
             color=Color.white(), dash_length=dash_tex_dashlength,
             thickness=round(dash_tex_wide * 1.5))
 
+    flush_draw_batch_by_address(
+        <uintptr_t>ctypes.addressof(renderer.contents))
     sdl.SDL_SetRenderDrawColor(renderer, 255, 255, 255, 255)
     sdl.SDL_SetRenderTarget(renderer, old_t)
     dashed_texture_store[(vertical, renderer_key)] = tex
@@ -172,10 +192,11 @@ cpdef draw_dashed_line(
         object color=None,
         double dash_length=7.0,
         double thickness=3.0):
+    cdef DrawBatch batch
+    cdef uintptr_t renderer_address = <uintptr_t>(
+        ctypes.addressof(renderer.contents))
     _load_function_ptrs()
-    if not can_renderer_safely_be_used(
-            <uintptr_t>ctypes.addressof(renderer.contents)
-            ):
+    if not can_renderer_safely_be_used(renderer_address):
         raise RuntimeError("cannot draw now, "
                            "hardware context unavailable")
     import sdl2 as sdl
@@ -201,8 +222,10 @@ cpdef draw_dashed_line(
     draw_y = round(draw_y)
     source_rect = sdl.SDL_Rect()
     target_rect = sdl.SDL_Rect()
-    sdl.SDL_SetTextureColorMod(tex,
-        color.value_red, color.value_green, color.value_blue)
+    batch = get_draw_batch(renderer_address)
+    if batch is None:
+        sdl.SDL_SetTextureColorMod(tex,
+            color.value_red, color.value_green, color.value_blue)
     offset = 0
     while offset < length:
         tex_target_uncut_length = max(1,
@@ -224,7 +247,6 @@ cpdef draw_dashed_line(
             target_rect.y = draw_y + offset
             target_rect.w = tex_target_width
             target_rect.h = tex_target_length
-            sdl.SDL_RenderCopy(renderer, tex, source_rect, target_rect)
         else:
             source_rect.x = 0
             source_rect.y = 1
@@ -234,6 +256,17 @@ cpdef draw_dashed_line(
             target_rect.y = draw_y
             target_rect.w = tex_target_length
             target_rect.h = tex_target_width
+        if batch is not None:
+            batch.record_copy(None,
+                <uintptr_t>ctypes.addressof(tex.contents),
+                (round(color.value_red) << 16) |
+                (round(color.value_green) << 8) |
+                round(color.value_blue),
+                source_rect.x, source_rect.y,
+                source_rect.w, source_rect.h,
+                target_rect.x, target_rect.y,
+                target_rect.w, target_rect.h)
+        else:
             sdl.SDL_RenderCopy(renderer, tex, source_rect, target_rect)
         offset += tex_target_length
 
@@ -400,6 +433,8 @@ cdef _apply_clip_rect(object renderer, int x, int y, int w, int h):
         raise RuntimeError("cannot use drawing operation, "
                            "hardware context unavailable")
     import sdl2 as sdl
+    flush_draw_batch_by_address(
+        <uintptr_t>ctypes.addressof(renderer.contents))
     new_clip = sdl.SDL_Rect()
     new_clip.x = x
     new_clip.y = y
@@ -434,6 +469,8 @@ cpdef pop_render_clip(renderer):
     else:
         if not clipping_is_enabled(renderer):
             raise RuntimeError("no clipping active")
+        flush_draw_batch_by_address(
+            <uintptr_t>ctypes.addressof(renderer.contents))
         sdl.SDL_RenderSetClipRect(renderer, None)
         if clipping_is_enabled(renderer):
             raise RuntimeError("internal error: " +
@@ -0,0 +1,169 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+import collections
+import heapq
+import time
+import traceback
+
+from wobblui.perf cimport CPerf as Perf
+from wobblui.uiconf import config
+from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
+
+cdef class IdleDeadline:
+    """ Passed to idle callbacks so they can tell how much longer they
+        may keep working in the current frame.
+    """
+    cdef double end_time
+    cdef readonly int did_timeout
+
+    def __init__(self, double end_time, int did_timeout=False):
+        self.end_time = end_time
+        self.did_timeout = did_timeout
+
+    def time_remaining(self):
+        return max(0.0, self.end_time - time.monotonic())
+
+cdef class IdleCallback:
+    """ A queued idle callback as returned by schedule_idle(). """
+    cdef object func
+    cdef double timeout_time
+    cdef long long seq
+    cdef readonly int cancelled, done
+
+    def __init__(self, func, timeout=None):
+        global next_seq
+        next_seq += 1
+        self.seq = next_seq
+        self.func = func
+        self.timeout_time = -1.0
+        if timeout is not None:
+            self.timeout_time = time.monotonic() + timeout
+        self.cancelled = False
+        self.done = False
+
+    def cancel(self):
+        self.cancelled = True
+
+cdef long long next_seq = 0
+cdef object idle_queue = collections.deque()
+
+# Min-heap of (timeout_time, seq, callback) for callbacks with a
+# timeout, so overdue ones are found no matter where they are queued.
+# Entries of callbacks that ran in the meantime are skipped:
+cdef list timeout_heap = []
+
+def schedule_idle(func, timeout=None):
+    """ Queue func(deadline) to run when a frame has time to spare,
+        like requestIdleCallback() in browsers. Use this for expensive
+        work that can be deferred, like measuring or pre-rendering
+        content which isn't visible yet.
+
+        The callback should check deadline.time_remaining() and stop
+        early if it runs out. If it returns True, it is queued again at
+        the end to continue the work in a later frame. If a timeout in
+        seconds is given, the callback also runs after that time even
+        if no frame ever had any time left (deadline.did_timeout is
+        then set).
+
+        Returns an IdleCallback which can be cancel()ed.
+    """
+    callback = IdleCallback(func, timeout=timeout)
+    idle_queue.append(callback)
+    if timeout is not None:
+        heapq.heappush(timeout_heap,
+            (callback.timeout_time, callback.seq, callback))
+    return callback
+
+cpdef int internal_idle_work_pending():
+    while len(idle_queue) > 0 and (
+            (<IdleCallback>idle_queue[0]).cancelled or
+            (<IdleCallback>idle_queue[0]).done):
+        idle_queue.popleft()
+    return (len(idle_queue) > 0)
+
+cdef int _input_pending():
+    import sdl2 as sdl
+    sdl.SDL_PumpEvents()
+    # (User events are only used for event loop wakeups, ignore them)
+    return (sdl.SDL_HasEvents(sdl.SDL_FIRSTEVENT,
+        sdl.SDL_USEREVENT - 1) == sdl.SDL_TRUE)
+
+cdef _run_callback(IdleCallback callback, double now, double end_time,
+        int timed_out):
+    # Returns True if the callback wants to continue in a later frame.
+    try:
+        again = callback.func(IdleDeadline(max(now, end_time),
+            did_timeout=timed_out))
+    except Exception as e:
+        logerror("*** ERROR IN IDLE CALLBACK ***")
+        logerror(str(traceback.format_exc()))
+        again = False
+    callback.timeout_time = -1.0
+    if again is True and not callback.cancelled:
+        return True
+    callback.done = True
+    return False
+
+cpdef internal_run_idle_callbacks(double frame_start_time):
+    """ Run queued idle callbacks with whatever is left of the frame
+        budget ("idle_frame_budget" config option, in seconds counted
+        from frame_start_time), stopping early when input arrives.
+        Callbacks whose timeout passed always run first.
+    """
+    cdef IdleCallback callback
+    cdef double now = time.monotonic()
+    cdef double end_time = frame_start_time +\
+        config.get("idle_frame_budget")
+    cdef int amount = len(idle_queue)
+    cdef int i = 0
+    if amount == 0:
+        # (Every live callback is in the queue, so these are stale.)
+        timeout_heap.clear()
+        return
+    perf_id = Perf.start("idle_callbacks")
+
+    # Run all overdue callbacks, regardless of the budget. If they
+    # want to continue, their queue entry is left where it is:
+    while len(timeout_heap) > 0 and timeout_heap[0][0] <= now:
+        callback = heapq.heappop(timeout_heap)[2]
+        if callback.cancelled or callback.done or \
+                callback.timeout_time < 0:
+            continue
+        _run_callback(callback, now, end_time, True)
+        now = time.monotonic()
+
+    while i < amount and len(idle_queue) > 0:
+        i += 1
+        callback = idle_queue.popleft()
+        if callback.cancelled or callback.done:
+            continue
+        now = time.monotonic()
+        if now >= end_time or _input_pending():
+            # No time left, keep it for later:
+            idle_queue.appendleft(callback)
+            break
+        if _run_callback(callback, now, end_time,
+                callback.timeout_time >= 0 and
+                callback.timeout_time <= now):
+            idle_queue.append(callback)
+    Perf.stop(perf_id)
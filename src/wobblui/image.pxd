@@ -25,8 +25,14 @@ from wobblui.color cimport Color
 cdef class RenderImage(object):
     cdef object _pil_image, _pil_image_scaled
     cdef tuple _render_size, internal_image_size
-    cdef object _color, _texture
-    cdef public object surface
+    cdef object _color
+    cdef dict _textures, _dirty_rects
+    cdef Py_ssize_t _buffer_shape[3]
+    cdef Py_ssize_t _buffer_strides[3]
+    cdef int _buffer_exports
+    cdef readonly int shared
+    # Not settable from outside, since buffer exports point into it:
+    cdef readonly object surface
     cdef int render_low_res
 
 cpdef str stock_image(name)
@@ -20,27 +20,33 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+import collections
+import concurrent.futures
+from cpython.buffer cimport PyBUF_WRITABLE
 import ctypes
 import cython
+import hashlib
 import io
 from libc.stdint cimport uintptr_t
+import math
 import os
 import PIL.Image
 import PIL.ImageDraw
-import platform
 import subprocess
 import sys
 import tempfile
-import time
+import threading
 
 from wobblui.color cimport Color
 from wobblui.font.manager cimport c_font_manager
 from wobblui.osinfo import is_android
+from wobblui.perf cimport CPerf as Perf
 from wobblui.sdlinit cimport initialize_sdl
 from wobblui.texture cimport Texture
+from wobblui.timer import run_on_ui_thread
+from wobblui.uiconf import config
 from wobblui.widget cimport Widget
-
-sdlimage_initialized = False
+from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
 
 ctypedef void* (*_sdl_FreeSurfaceType)(
     void *srf
@@ -60,98 +66,102 @@ cpdef str stock_image(name):
 
 def _internal_sdl_surface_to_pil_image(sdl_surface):
     import sdl2 as sdl
-    (fd, fpath) = tempfile.mkstemp(
-        prefix="wobblui-srf-to-pil-", suffix=".bmp"
-    )
+    converted_srf = None
+    if sdl_surface.contents.format.contents.format != \
+            sdl.SDL_PIXELFORMAT_RGBA32:
+        converted_srf = sdl.SDL_ConvertSurfaceFormat(
+            sdl_surface, sdl.SDL_PIXELFORMAT_RGBA32, 0
+        )
+        if not converted_srf:
+            raise RuntimeError("SDL_ConvertSurfaceFormat returned error")
+        sdl_surface = converted_srf
     try:
+        if sdl.SDL_LockSurface(sdl_surface) != 0:
+            raise RuntimeError("SDL_LockSurface returned error")
         try:
-            os.close(fd)
-        except OSError:
-            pass
-        result = sdl.SDL_SaveBMP(
-            sdl_surface,
-            fpath.encode('utf-8', 'replace')
-        )
-        if result != 0:
-            raise RuntimeError("SDL_SaveBMP returned error")
-        pil_image = PIL.Image.open(fpath)
-        return pil_image
+            (w, h) = (sdl_surface.contents.w, sdl_surface.contents.h)
+            pitch = sdl_surface.contents.pitch
+            pixels = (ctypes.c_uint8 * (pitch * h)).from_address(
+                sdl_surface.contents.pixels)
+            # Wrap the raw pixels directly, and copy them once since the
+            # surface may be modified or freed while the image lives on:
+            return PIL.Image.frombuffer("RGBA", (w, h), pixels,
+                "raw", "RGBA", pitch, 1).copy()
+        finally:
+            sdl.SDL_UnlockSurface(sdl_surface)
     finally:
-        os.remove(fpath)
+        if converted_srf is not None:
+            sdl.SDL_FreeSurface(converted_srf)
 
-def _internal_pil_image_to_sdl_surface(pil_image, retries=5):
-    global sdlimage_initialized
+def _internal_pil_image_to_sdl_surface(pil_image, pixels=None):
     initialize_sdl()
     import sdl2 as sdl
-    import sdl2.sdlimage as sdlimage
 
-    if not sdlimage_initialized:
-        sdlimage_initialized = True
-        if not platform.system().lower() == "windows":
-            flags = sdlimage.IMG_INIT_JPG|sdlimage.IMG_INIT_PNG
-        else:
-            flags = sdlimage.IMG_INIT_TIF
-        sdlimage.IMG_Init(flags)
-    sdl_image = None
-
-    # Write image to ctypes buffer:
-    bytes_obj = io.BytesIO()
-    if platform.system().lower() != "windows":
-        pil_image.save(bytes_obj, format="PNG")
-    else:
-        pil_image.save(bytes_obj, format="TIFF")
-    bytes_obj.flush()
-    bytes_value = bytearray(bytes_obj.getvalue())
-    del(bytes_obj)
-    if len(bytes_value) == 0:
-        raise RuntimeError("saved image unexpectedly empty")
-    ctypes_bytes = (ctypes.c_uint8 * len(bytes_value)).\
-        from_buffer(bytes_value)
-
-    # Create SDL RW Ops and load with SDL_Image from that:
-    rwops = sdl.SDL_RWFromMem(ctypes.byref(ctypes_bytes),
-        len(bytes_value))
-    sdl_image = sdlimage.IMG_Load_RW(rwops, 0)
-    sdl.SDL_FreeRW(rwops)
-    del(rwops)
-
-    # Handle error:
-    if sdl_image is None or not sdl_image:  # ptr will evaluate False if NULL
-        if retries > 0:
-            retries -= 1
-            time.sleep(0.1)
-            return _internal_pil_image_to_sdl_surface(
-                pil_image,
-                retries=(retries - 1))
-        err_msg = sdlimage.IMG_GetError()
+    if pixels is None:
+        if pil_image.mode != "RGBA":
+            pil_image = pil_image.convert("RGBA")
+        pixels = pil_image.tobytes("raw", "RGBA")
+    (w, h) = pil_image.size
+    sdl_image = sdl.SDL_CreateRGBSurfaceWithFormat(
+        0, w, h, 32, sdl.SDL_PIXELFORMAT_RGBA32
+    )
+    if not sdl_image:  # ptr will evaluate False if NULL
+        err_msg = sdl.SDL_GetError()
         try:
             err_msg = err_msg.decode("utf-8", "replace")
         except AttributeError:
             pass
         raise ValueError(
-            "failed to load image with SDL Image: " +
+            "failed to create SDL surface for image: " +
             str(err_msg))
+
+    # Copy the raw pixels over, row by row if SDL padded the rows:
+    sdl.SDL_LockSurface(sdl_image)
+    try:
+        pitch = sdl_image.contents.pitch
+        target = sdl_image.contents.pixels
+        if pitch == w * 4:
+            ctypes.memmove(target, pixels, len(pixels))
+        else:
+            source = ctypes.cast(ctypes.c_char_p(pixels),
+                ctypes.c_void_p).value
+            for row in range(h):
+                ctypes.memmove(target + row * pitch,
+                    source + row * w * 4, w * 4)
+    finally:
+        sdl.SDL_UnlockSurface(sdl_image)
     return sdl_image
 
 cdef class RenderImage:
     """ A mutable image object for use in widget draw callbacks.
         This RenderImage can be created either from a PIL
         image or a disk file path. Rendering a RenderImage with
-        draw() is fast after it was rendered at least once, all
-        other operations like the editing manipulation are SLOW.
+        draw() is fast after it was rendered at least once.
 
         Modification / editing of a RenderImage
         ---------------------------------------
 
-        The RenderImage object supports slow but flexible editing
+        The RenderImage object supports flexible editing
         operations. Check them out:
 
         - draw_text_onto_image
-        - draw_filled_rectangle_onto_image
-        - draw_other_image_onto_image
+        - draw_rectangle_onto_image
+        - draw_image_onto_image
+
+        The pixels live in a single RGBA buffer which is also exposed
+        through the buffer protocol, e.g. numpy.asarray(image) gives a
+        writable (height, width, 4) view. Call mark_dirty() after
+        writing to it directly.
+
+        Edits only track the changed rectangles: the next draw()
+        switches the texture to a streaming texture once, and from
+        then on only uploads the changed regions.
+
+        MEMBERS IN image.pxd
     """
 
-    def __init__(self, object pil_image, render_low_res=False):
+    def __init__(self, object pil_image, render_low_res=False,
+            _internal_rgba_pixels=None):
         global _sdl_FreeSurface
         initialize_sdl()
         if not _sdl_FreeSurface:
@@ -161,10 +171,17 @@ cdef class RenderImage:
                 <uintptr_t>ctypes.addressof(sdl.SDL_FreeSurface)
                 ))
             )
+        if self._buffer_exports > 0:
+            raise RuntimeError("cannot replace the pixels of a " +
+                "RenderImage while its buffer is in use")
         if type(pil_image) == str:
             pil_image = PIL.Image.open(pil_image)
         self.surface = None
-        self._pil_image = pil_image.copy()
+        if _internal_rgba_pixels is not None:
+            # Decoded by the async loader, which no longer uses it:
+            self._pil_image = pil_image
+        else:
+            self._pil_image = pil_image.copy()
         self._render_size = tuple(self._pil_image.size)
         self.internal_image_size = tuple(self._render_size)
         self.render_low_res = (render_low_res is True)
@@ -179,9 +196,61 @@ cdef class RenderImage:
                 self._pil_image = self._pil_image.resize(
                     (new_w, new_h))
         self.surface = _internal_pil_image_to_sdl_surface(
-            self._pil_image)
+            self._pil_image, pixels=_internal_rgba_pixels)
         self.internal_image_size = tuple(self._pil_image.size)
-        self._texture = None
+        self._textures = dict()
+        self._dirty_rects = dict()
+
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            self._check_editable()
+        self._buffer_shape[0] = self.surface.contents.h
+        self._buffer_shape[1] = self.surface.contents.w
+        self._buffer_shape[2] = 4
+        self._buffer_strides[0] = self.surface.contents.pitch
+        self._buffer_strides[1] = 4
+        self._buffer_strides[2] = 1
+        buffer.buf = <char *><uintptr_t>(ctypes.cast(
+            self.surface.contents.pixels, ctypes.c_void_p).value)
+        buffer.format = "B"
+        buffer.internal = NULL
+        buffer.itemsize = 1
+        buffer.len = (self._buffer_shape[0] * self._buffer_strides[0])
+        buffer.ndim = 3
+        buffer.obj = self
+        buffer.readonly = (self.render_low_res or self.shared)
+        buffer.shape = self._buffer_shape
+        buffer.strides = self._buffer_strides
+        buffer.suboffsets = NULL
+        self._buffer_exports += 1
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        self._buffer_exports -= 1
+
+    def mark_dirty(self, x=0, y=0, w=None, h=None):
+        """ Mark a region as changed after writing to the pixel buffer
+            directly, so the next draw() uploads it. Without arguments,
+            the whole image is marked.
+        """
+        if w is None:
+            w = self.internal_image_size[0]
+        if h is None:
+            h = self.internal_image_size[1]
+        self._mark_dirty(*self._clip_rect_to_image(x, y, w, h))
+
+    def _mark_dirty(self, int x, int y, int w, int h):
+        if w <= 0 or h <= 0:
+            return
+        self._pil_image = None
+        for renderer_key in self._textures:
+            rects = self._dirty_rects.get(renderer_key)
+            if rects is None:
+                rects = []
+                self._dirty_rects[renderer_key] = rects
+            rects.append((x, y, w, h))
+            if len(rects) > 16:
+                # Many small strokes, just upload their bounding box:
+                rects[:] = [_dirty_rects_bounding_box(rects)]
 
     def show_image(self):
         cmd = [sys.executable, "-c",
@@ -206,6 +275,13 @@ cdef class RenderImage:
             max(1, round(height))), (0, 0, 0, 0))
         return RenderImage(pil_image, render_low_res=False)
 
+    def _check_editable(self):
+        if self.render_low_res:
+            raise TypeError("cannot modify low-res rendered image")
+        if self.shared:
+            raise TypeError("cannot modify shared image from the " +
+                "image cache")
+
     def _clip_rect_to_image(self, x, y, w, h):
         x = round(x)
         y = round(y)
@@ -222,8 +298,7 @@ cdef class RenderImage:
             alpha=1.0, filled=True
             ):
         import sdl2 as sdl
-        if self.render_low_res:
-            raise TypeError("cannot modify low-res rendered image")
+        self._check_editable()
         if not filled:
             raise NotImplementedError("filled=False not implemented")
 
@@ -251,11 +326,10 @@ cdef class RenderImage:
                 max(0, min(255, round(color.value_blue))),
                 255
             )
-            self._texture = None
-            self._pil_image = None    
             result = sdl.SDL_FillRect(self.surface, rect, scolor)
             if result != 0:
                 raise RuntimeError("SDL_FillRect returned an error")
+            self._mark_dirty(x, y, w, h)
             return
         # Work around broken alpha handling by rendering to a surface copy:
         copied_srf = sdl.SDL_ConvertSurface(
@@ -280,17 +354,16 @@ cdef class RenderImage:
                 raise RuntimeError("SDL_FillRect returned an error")
 
             # Now render the copied surface back, but with alpha blending:
-            self._texture = None
             sdl.SDL_SetSurfaceBlendMode(copied_srf,
                 sdl.SDL_BLENDMODE_BLEND)
             sdl.SDL_SetSurfaceAlphaMod(copied_srf, alpha)
-            sdl.SDL_BlitSurface(copied_srf, rect, self.surface, rect)
+            result = sdl.SDL_BlitSurface(
+                copied_srf, rect, self.surface, rect)
             if result != 0:
                 raise RuntimeError("SDL_BlitSurface returned an error")
         finally:
             sdl.SDL_FreeSurface(copied_srf)
-            self._texture = None
-            self._pil_image = None
+            self._mark_dirty(x, y, w, h)
 
     def draw_text_onto_image(self,
             text, font=None,
@@ -300,8 +373,7 @@ cdef class RenderImage:
             ):
         import sdl2 as sdl
         import sdl2.ttf as sdlttf
-        if self.render_low_res:
-            raise TypeError("cannot modify low-res rendered image")
+        self._check_editable()
         try:
             text = text.encode("utf-8", "replace")
         except AttributeError:
@@ -315,7 +387,6 @@ cdef class RenderImage:
         )
         if not surface:
             raise RuntimeError("TTF_RenderUTF8_Blended reported error")
-        self._texture = None
         try:
             self._draw_srf_onto_image(
                 surface, x, y, alpha=alpha,
@@ -334,8 +405,7 @@ cdef class RenderImage:
             surface, x, y, alpha=1.0, color=Color.white()
             ):
         import sdl2 as sdl
-        if self.render_low_res:
-            raise TypeError("cannot modify low-res rendered image")
+        self._check_editable()
         alpha = max(0, min(255, round(255.0 * alpha)))
         if alpha == 0:
             return
@@ -346,7 +416,6 @@ cdef class RenderImage:
         rect.y = round(y)
         rect.w = surface.contents.w
         rect.h = surface.contents.h
-        self._texture = None
         sdl.SDL_SetSurfaceBlendMode(surface,
             sdl.SDL_BLENDMODE_BLEND)
         sdl.SDL_SetSurfaceAlphaMod(surface, alpha)
@@ -360,7 +429,8 @@ cdef class RenderImage:
         sdl.SDL_SetSurfaceAlphaMod(surface, 255)
         if result != 0:
             raise RuntimeError("SDL_BlitSurface returned an error")
-        self._pil_image = None
+        self._mark_dirty(*self._clip_rect_to_image(
+            x, y, surface.contents.w, surface.contents.h))
 
     @property
     def pil_image(self):
@@ -393,13 +463,27 @@ cdef class RenderImage:
         if renderer is None:
             raise ValueError("renderer cannot be None")
         initialize_sdl()
-        if self._texture is None or \
-                self._texture.is_unloaded() or \
-                not self._texture.is_for_renderer(renderer):
-            self._texture = Texture.new_from_sdl_surface(renderer,
-                self.surface)
-            self._apply_color()
-        return self._texture
+        # One texture per renderer, so shared images can be drawn
+        # into multiple windows:
+        renderer_key = ctypes.addressof(renderer.contents)
+        tex = self._textures.get(renderer_key)
+        dirty_rects = self._dirty_rects.pop(renderer_key, None)
+        if tex is None or tex.is_unloaded() or \
+                not tex.is_for_renderer(renderer):
+            tex = Texture.new_from_sdl_surface(renderer, self.surface)
+            tex.set_color(self._color)
+            self._textures[renderer_key] = tex
+        elif dirty_rects and not tex.streaming:
+            # First edit since upload: only edited images pay for
+            # a streaming texture.
+            tex = Texture.new_streaming_from_sdl_surface(
+                renderer, self.surface)
+            tex.set_color(self._color)
+            self._textures[renderer_key] = tex
+        elif dirty_rects:
+            for (x, y, w, h) in dirty_rects:
+                tex.update_from_sdl_surface(self.surface, x, y, w, h)
+        return tex
 
     @property
     def color(self):
@@ -410,12 +494,16 @@ cdef class RenderImage:
         self.set_color(v)
 
     def set_color(self, c):
+        if self.shared:
+            raise TypeError("cannot change color of shared image " +
+                "from the image cache, pass color to draw() instead")
         self._color = Color(c)
         self._apply_color()
 
     def _apply_color(self):
-        if self._texture is not None and not self._texture.is_unloaded():
-            self._texture.set_color(self._color)
+        for tex in self._textures.values():
+            if not tex.is_unloaded():
+                tex.set_color(self._color)
 
     def draw(self, renderer,
              int x, int y, w=None, h=None, color=None
@@ -425,6 +513,9 @@ cdef class RenderImage:
             w = self._render_size[0]
         if h is None:
             h = self._render_size[1]
+        if color is None and self.shared:
+            # Another user may have drawn it with a different color:
+            color = self._color
         if color is not None:
             tex.set_color(color)
         tex.draw(x, y, w, h)
@@ -433,6 +524,350 @@ cdef class RenderImage:
     def render_size(self):
         return tuple(self._render_size)
 
+def _dirty_rects_bounding_box(rects):
+    min_x = min([r[0] for r in rects])
+    min_y = min([r[1] for r in rects])
+    max_x = max([r[0] + r[2] for r in rects])
+    max_y = max([r[1] + r[3] for r in rects])
+    return (min_x, min_y, max_x - min_x, max_y - min_y)
+
+image_load_executor = None
+image_load_executor_lock = threading.Lock()
+
+def _get_image_load_executor():
+    global image_load_executor
+    with image_load_executor_lock:
+        if image_load_executor is None:
+            image_load_executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max(1, config.get("image_loader_threads")),
+                thread_name_prefix="wobblui-image-loader")
+        return image_load_executor
+
+class ImageLoadJob(object):
+    """ Loads an image in the background: decoding, optional scaling
+        and the pixel conversion run in a worker thread, and only the
+        final SDL surface creation happens on the UI thread. Then
+        callback(render_image) is called on the UI thread, with None
+        if loading failed (see the error attribute).
+
+        Use load_render_image_async() to start one.
+    """
+
+    def __init__(self, source, callback, max_size=None,
+            render_low_res=False):
+        if type(source) != str and type(source) != bytes:
+            # Copy on the calling thread, since the caller may go on
+            # modifying its image while the worker decodes:
+            source = source.copy()
+        self.source = source
+        self.callback = callback
+        self.max_size = max_size
+        self.render_low_res = (render_low_res is True)
+        self.cancelled = False
+        self.done = False
+        self.error = None
+        self.original_size = None
+        self.render_image = None
+        self._future = _get_image_load_executor().submit(self._decode)
+
+    def cancel(self):
+        """ Stop the load if it hasn't finished yet. The callback is
+            guaranteed not to be called after this.
+        """
+        if self.done:
+            return
+        self.cancelled = True
+        self._future.cancel()
+
+    def _decode(self):
+        # Runs in a worker thread.
+        if self.cancelled:
+            return
+        try:
+            if type(self.source) == str or type(self.source) == bytes:
+                pil_image = PIL.Image.open(self.source)
+                pil_image.load()
+            else:
+                pil_image = self.source
+            self.original_size = tuple(pil_image.size)
+            (w, h) = pil_image.size
+            scale_f = 1.0
+            if self.max_size is not None:
+                scale_f = min(1.0, self.max_size / float(max(w, h)))
+            if self.render_low_res:
+                scale_f = min(scale_f, (512 + 512) / float(w + h))
+            if scale_f < 0.95:
+                pil_image = pil_image.resize((max(1, round(w * scale_f)),
+                    max(1, round(h * scale_f))), PIL.Image.LANCZOS)
+            if self.cancelled:
+                return
+            if pil_image.mode != "RGBA":
+                pil_image = pil_image.convert("RGBA")
+            pixels = pil_image.tobytes("raw", "RGBA")
+        except Exception as e:
+            run_on_ui_thread(self._finish, None, None, e)
+            return
+        if not self.cancelled:
+            run_on_ui_thread(self._finish, pil_image, pixels, None)
+
+    def _finish(self, pil_image, pixels, error):
+        # Runs on the UI thread.
+        if self.cancelled:
+            return
+        self.done = True
+        if error is None:
+            try:
+                self.render_image = RenderImage(pil_image,
+                    _internal_rgba_pixels=pixels)
+            except Exception as e:
+                error = e
+        if error is not None:
+            self.error = error
+            logwarning("wobblui.image: failed to load image " +
+                str(self.source)[:100] + ": " + str(error))
+        self.callback(self.render_image)
+
+def load_render_image_async(source, callback, max_size=None,
+        render_low_res=False):
+    """ Load a RenderImage from a file path or PIL image without
+        blocking the UI thread. Returns an ImageLoadJob, see there.
+    """
+    return ImageLoadJob(source, callback, max_size=max_size,
+        render_low_res=render_low_res)
+
+image_cache = collections.OrderedDict()
+image_cache_bytes = 0
+image_cache_lock = threading.Lock()
+
+def _image_cache_get(key):
+    with image_cache_lock:
+        entry = image_cache.get(key)
+        if entry is None:
+            Perf.count("image_cache_miss")
+            return None
+        image_cache.move_to_end(key)
+    Perf.count("image_cache_hit")
+    return entry[0]
+
+def _image_cache_put(key, value, int nbytes):
+    global image_cache_bytes
+    with image_cache_lock:
+        if key in image_cache:
+            image_cache_bytes -= image_cache.pop(key)[1]
+        image_cache[key] = (value, nbytes)
+        image_cache_bytes += nbytes
+        # Evict least recently used entries over the budget:
+        while image_cache_bytes > config.get("image_cache_max_bytes") and \
+                len(image_cache) > 1:
+            (old_key, old_entry) = image_cache.popitem(last=False)
+            image_cache_bytes -= old_entry[1]
+
+def _image_cache_pop(key):
+    global image_cache_bytes
+    with image_cache_lock:
+        entry = image_cache.pop(key, None)
+        if entry is not None:
+            image_cache_bytes -= entry[1]
+
+def clear_image_cache():
+    global image_cache_bytes
+    with image_cache_lock:
+        image_cache.clear()
+        image_cache_bytes = 0
+
+def _image_source_key(source):
+    if type(source) == str or type(source) == bytes:
+        path = os.path.abspath(source)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        return ("path", path, mtime)
+    return ("pil", source.mode, tuple(source.size),
+        hashlib.sha1(source.tobytes()).hexdigest())
+
+def _size_bucket(int requested_size, int full_size):
+    # Sizes go 16, 24, 32, 48, 64, 96, ... so a variant is never more
+    # than 1.5x larger than needed:
+    cdef int size = 16
+    while size < full_size:
+        if size >= requested_size:
+            return size
+        if (size * 3) // 2 >= requested_size:
+            return min(full_size, (size * 3) // 2)
+        size *= 2
+    return full_size
+
+def _decoded_image(key, source):
+    # Decoded originals are only cached until a variant is made from
+    # them, see get_shared_render_image():
+    decoded_key = ("decoded",) + key
+    pil_image = _image_cache_get(decoded_key)
+    if pil_image is not None:
+        return pil_image
+    if type(source) == str or type(source) == bytes:
+        pil_image = PIL.Image.open(source)
+        pil_image.load()
+    else:
+        pil_image = source
+    _image_cache_put(decoded_key, pil_image,
+        pil_image.size[0] * pil_image.size[1] *
+        len(pil_image.getbands()))
+    return pil_image
+
+def _image_size(key, source):
+    # Only reads the file header, without decoding the image:
+    size_key = ("size",) + key
+    size = _image_cache_get(size_key)
+    if size is not None:
+        return size
+    if type(source) == str or type(source) == bytes:
+        with PIL.Image.open(source) as pil_image:
+            size = tuple(pil_image.size)
+    else:
+        size = tuple(source.size)
+    _image_cache_put(size_key, size, 64)
+    return size
+
+def _variant_key(key, full_size, max_size, color_key):
+    size = max(full_size)
+    if max_size is not None:
+        size = _size_bucket(max(1, math.ceil(max_size)), size)
+    return ("variant",) + key + (size, color_key)
+
+def _put_variant(variant_key, RenderImage render_image, color):
+    if color is not None:
+        render_image.set_color(color)
+    render_image.shared = True
+    # Account for both the surface and the texture:
+    _image_cache_put(variant_key, render_image,
+        render_image.internal_image_size[0] *
+        render_image.internal_image_size[1] * 4 * 2)
+
+def get_shared_render_image(source, max_size=None, color=None,
+        _source_key=None):
+    """ Returns a RenderImage for the given file path or PIL image from
+        the process-wide image cache, scaled down to the smallest size
+        bucket of at least max_size (longest side) if that is given.
+        The result is shared with other users and must not be edited.
+    """
+    cdef RenderImage render_image
+    key = _source_key
+    if key is None:
+        key = _image_source_key(source)
+    color_key = None
+    if color is not None:
+        color = Color(color)
+        color_key = (color.value_red, color.value_green,
+            color.value_blue)
+    variant_key = _variant_key(key, _image_size(key, source),
+        max_size, color_key)
+    render_image = _image_cache_get(variant_key)
+    if render_image is not None:
+        return render_image
+    pil_image = _decoded_image(key, source)
+    (w, h) = pil_image.size
+    size = variant_key[-2]
+    if size < max(w, h):
+        # Scale down on the CPU with proper filtering, which looks a lot
+        # better than scaling down on the GPU at draw time:
+        scale_f = size / float(max(w, h))
+        pil_image = pil_image.resize((max(1, round(w * scale_f)),
+            max(1, round(h * scale_f))), PIL.Image.LANCZOS)
+    render_image = RenderImage(pil_image)
+    _put_variant(variant_key, render_image, color)
+    # The variant has its own pixels now, so don't keep the decoded
+    # original around as well:
+    _image_cache_pop(("decoded",) + key)
+    return render_image
+
+class SharedImage(object):
+    """ A lightweight handle to an image in the process-wide image
+        cache, which can be drawn like a RenderImage. Drawing picks a
+        pre-scaled variant matching the draw size, which all handles
+        for the same file share.
+
+        Variants are made by prepare(), which widgets call when laying
+        out. draw() never decodes anything: if the variant isn't ready,
+        it draws the last one this handle used and loads the missing
+        one in the background, calling on_loaded() once it's there.
+    """
+
+    def __init__(self, source, on_loaded=None):
+        if isinstance(source, RenderImage):
+            source = source.pil_image
+        self._source = source
+        self._key = _image_source_key(source)
+        self._size = _image_size(self._key, source)
+        self._color = Color.white()
+        self._render_image = None
+        self._load_jobs = dict()
+        self.on_loaded = on_loaded
+
+    @property
+    def pil_image(self):
+        """ The decoded image, decoding it if necessary. Don't modify
+            it.
+        """
+        return _decoded_image(self._key, self._source)
+
+    @property
+    def render_size(self):
+        return self._size
+
+    @property
+    def color(self):
+        return self._color
+
+    @color.setter
+    def color(self, v):
+        self.set_color(v)
+
+    def set_color(self, c):
+        self._color = Color(c)
+
+    def prepare(self, w=None, h=None):
+        """ Make sure the variant for drawing at the given size exists,
+            decoding the image if needed.
+        """
+        (full_w, full_h) = self._size
+        self._render_image = get_shared_render_image(self._source,
+            max_size=max(w or full_w, h or full_h),
+            _source_key=self._key)
+
+    def _load_variant(self, variant_key):
+        if variant_key in self._load_jobs:
+            return
+        def loaded(render_image):
+            self._load_jobs.pop(variant_key, None)
+            if render_image is None:
+                return
+            _put_variant(variant_key, render_image, None)
+            self._render_image = render_image
+            if self.on_loaded is not None:
+                self.on_loaded()
+        self._load_jobs[variant_key] = load_render_image_async(
+            self._source, loaded, max_size=variant_key[-2])
+
+    def draw(self, renderer, int x, int y, w=None, h=None, color=None):
+        (full_w, full_h) = self._size
+        if w is None:
+            w = full_w
+        if h is None:
+            h = full_h
+        variant_key = _variant_key(self._key, self._size,
+            max(w, h), None)
+        render_image = _image_cache_get(variant_key)
+        if render_image is None:
+            self._load_variant(variant_key)
+            # Scale whatever we have until then:
+            render_image = self._render_image
+            if render_image is None:
+                return
+        self._render_image = render_image
+        render_image.draw(renderer, x, y, w=w, h=h,
+            color=(color if color is not None else self._color))
+
 def image_as_grayscale(pil_image):
     if pil_image.mode.upper() == "RGBA":
         gray_image = pil_image.convert("LA")
@@ -464,17 +899,38 @@ def remove_image_alpha(pil_image):
 class ImageWidget(Widget):
     def __init__(self, pil_image,
             fit_to_width=None,
-            fit_to_height=None):
+            fit_to_height=None,
+            load_async=False):
         super().__init__()
+        self.fit_to_width = fit_to_width
+        self.fit_to_height = fit_to_height
+        self.render_image = None
+        self._load_job = None
+        self._pil_image = None
+        self._image_source = None
+        max_size = 4096
+        if is_android():
+            max_size = 1024
+        if load_async:
+            # Show a placeholder until the worker threads are done:
+            if type(pil_image) == RenderImage:
+                pil_image = pil_image.pil_image
+            self._image_source = pil_image
+            self._max_size = max_size
+            # (Shared, so a grid of loading images decodes it once.)
+            self._placeholder = get_shared_render_image(
+                stock_image("hourglass"))
+            self._image_size = self._placeholder.render_size
+            self._start_load()
+            return
+        self._placeholder = None
         if type(pil_image) == str or type(pil_image) == bytes:
             pil_image = PIL.Image.open(pil_image)
         elif type(pil_image) == RenderImage:
             pil_image = pil_image.pil_image
         self._pil_image = pil_image.copy()
         self._pil_image_small = pil_image
-        max_size = 4096
-        if is_android():
-            max_size = 1024
+        self._image_size = tuple(self._pil_image.size)
         (imgw, imgh) = self._pil_image_small.size
         if imgw > max_size or imgh > max_size:
             scaledown_w = (max_size / imgw)
@@ -483,14 +939,48 @@ class ImageWidget(Widget):
             self._pil_image_small = self._pil_image_small.resize(
                 [max(1, round(imgw * scaledown)),
                 max(1, round(imgh * scaledown))], PIL.Image.ANTIALIAS)
-        self.fit_to_width = fit_to_width
-        self.fit_to_height = fit_to_height
-        self.render_image = None
 
     def __del__(self):
+        if self._load_job is not None:
+            self._load_job.cancel()
         if hasattr(super(), "__del__"):
             super().__del__()
 
+    @property
+    def loading(self):
+        return (self._placeholder is not None)
+
+    def _start_load(self):
+        self._load_job = load_render_image_async(self._image_source,
+            self._load_done, max_size=self._max_size)
+
+    def _load_done(self, render_image):
+        job = self._load_job
+        self._load_job = None
+        if render_image is None:
+            self._placeholder = get_shared_render_image(stock_image(
+                "broken_document"))
+            self._image_size = self._placeholder.render_size
+        else:
+            self._placeholder = None
+            self._image_source = None
+            self.render_image = render_image
+            self._image_size = render_image.render_size
+            if job is not None and job.original_size is not None:
+                self._image_size = job.original_size
+        self.needs_relayout = True
+        self.needs_redraw = True
+
+    def on_parentchanged(self):
+        # Don't keep decoding images for widgets that were removed:
+        if self.parent is None and self._load_job is not None:
+            self._load_job.cancel()
+            self._load_job = None
+        elif self.parent is not None and self._load_job is None and \
+                self.render_image is None and \
+                self._image_source is not None:
+            self._start_load()
+
     def update_renderer(self):
         super().update_renderer()
 
@@ -498,9 +988,18 @@ class ImageWidget(Widget):
         import sdl2 as sdl
         if self.renderer is None:
             return
+        if self._placeholder is not None:
+            (pw, ph) = self._placeholder.render_size
+            scale = min(1.0, self.width / float(max(1, pw)),
+                self.height / float(max(1, ph)))
+            self._placeholder.draw(self.renderer,
+                round((self.width - pw * scale) / 2),
+                round((self.height - ph * scale) / 2),
+                w=round(pw * scale), h=round(ph * scale))
+            return
         if self.render_image is None:
             self.render_image = RenderImage(self._pil_image_small)
-        (imgw, imgh) = self._pil_image.size
+        (imgw, imgh) = self._image_size
         scale_w = (self.width / imgw)
         scale_h = (self.height / imgh)
         scale = min(scale_w, scale_h)
@@ -520,7 +1019,7 @@ class ImageWidget(Widget):
         return h
 
     def _natural_size(self):
-        (w, h) = self._pil_image.size
+        (w, h) = self._image_size
         w *= self.dpi_scale
         h *= self.dpi_scale
         if self.fit_to_width != None:
@@ -140,7 +140,7 @@ cdef class Label(ScrollbarDrawingWidget):
             return self._user_set_color
         if self.style is None:
             return Color.black()
-        return Color(self.style.get("widget_text"))
+        return self.style.get_color("widget_text")
 
     def update_window(self):
         super().update_window()
@@ -389,9 +389,9 @@ class ImageWithLabel(Button):
         self.original_image = image_path
         color = Color.white()
         if color_with_text_color:
-            color = Color(self.style.get("widget_text"))
+            color = self.style.get_color("widget_text")
             if self.style.has("saturated_widget_text"):
-                color = Color(self.style.get("saturated_widget_text"))
+                color = self.style.get_color("saturated_widget_text")
         self.color_with_text_color = color_with_text_color
         self.set_image(image_path, scale=scale,
             scale_to_width=scale_to_width)
@@ -399,9 +399,9 @@ class ImageWithLabel(Button):
 
     def do_redraw(self):
         if self.color_with_text_color:
-            color = Color(self.style.get("widget_text"))
+            color = self.style.get_color("widget_text")
             if self.style.has("saturated_widget_text"):
-                color = Color(self.style.get("saturated_widget_text"))
+                color = self.style.get_color("saturated_widget_text")
             self.image_color = color
         super().do_redraw()
 
@@ -0,0 +1,285 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+
+""" Layout snapshots: capture a window's widget tree to a JSON file,
+    and replay its layouting offline without the application:
+
+        python3 -m wobblui.layoutsnapshot snapshot.json \\
+            --sizes 800x600,1280x720 --profile perf
+
+    Widgets that can't be reconstructed from the snapshot are replaced
+    by placeholders with the same natural size.
+"""
+
+import argparse
+import cProfile
+import importlib
+import io
+import json
+import pstats
+import sys
+import time
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+def _widget_type_name(widget):
+    return widget.__class__.__module__ + "." + \
+        widget.__class__.__name__
+
+def _capture_widget(widget):
+    from wobblui.box import Box
+    from wobblui.label import Label
+    node = {
+        "type": _widget_type_name(widget),
+        "width": widget.width,
+        "height": widget.height,
+        "natural_width": widget.get_natural_width(),
+        "natural_height": widget.get_natural_height(
+            given_width=widget.width),
+        "children": [],
+    }
+    if isinstance(widget, Box):
+        node["box"] = widget.get_layout_options()
+    elif isinstance(widget, Label):
+        node["html"] = widget.html
+    elif isinstance(getattr(widget, "text", None), str):
+        node["text"] = widget.text
+    for child in widget.children:
+        node["children"].append(_capture_widget(child))
+    return node
+
+def capture_snapshot(window):
+    """ Returns a JSON-serializable snapshot of the widget tree of the
+        given window, including its style and DPI scale.
+    """
+    style = window.style
+    return {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "window": {
+            "width": window.width,
+            "height": window.height,
+        },
+        "style": {
+            "type": _widget_type_name(style),
+            "values": dict(style.values),
+            "dpi_scale": style._dpi_scale,
+            "dpi_scale_base": style._dpi_scale_base,
+        },
+        "children": [_capture_widget(child)
+            for child in window.children],
+    }
+
+def save_snapshot(window, path):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(capture_snapshot(window), indent=1))
+
+def load_snapshot(path):
+    with open(path, "r", encoding="utf-8") as f:
+        snapshot = json.loads(f.read())
+    if snapshot.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise ValueError("unsupported layout snapshot version: " +
+            str(snapshot.get("format_version")))
+    return snapshot
+
+def _make_placeholder(node):
+    from wobblui.widget import Widget
+
+    class SnapshotPlaceholder(Widget):
+        def __init__(self, natural_width, natural_height):
+            super().__init__(is_container=True)
+            self.snapshot_type = node["type"]
+            self.fixed_natural_width = natural_width
+            self.fixed_natural_height = natural_height
+
+        def get_natural_width(self):
+            return self.fixed_natural_width
+
+        def get_natural_height(self, given_width=None):
+            return self.fixed_natural_height
+
+    return SnapshotPlaceholder(node["natural_width"],
+        node["natural_height"])
+
+def _find_class(type_name):
+    module_name, _, class_name = type_name.rpartition(".")
+    try:
+        return getattr(importlib.import_module(module_name),
+            class_name)
+    except (ImportError, AttributeError):
+        return None
+
+def _rebuild_widget(node):
+    from wobblui.box import Box
+    cls = _find_class(node["type"])
+    if "box" in node:
+        options = dict(node["box"])
+        del options["children"]
+        widget = Box(options.pop("horizontal"), **options)
+        for child_node, add_options in zip(node["children"],
+                node["box"]["children"]):
+            child = _rebuild_widget(child_node)
+            if not add_options["expand_horizontally"] and \
+                    not add_options["expand_vertically"]:
+                widget.add(child, expand=False,
+                    shrink=add_options["shrink"])
+            else:
+                widget.add(child, shrink=add_options["shrink"],
+                    expand_horizontally=\
+                        add_options["expand_horizontally"],
+                    expand_vertically=\
+                        add_options["expand_vertically"])
+        return widget
+    widget = None
+    if cls is not None:
+        try:
+            if "html" in node:
+                widget = cls(node["html"])
+            elif "text" in node:
+                widget = cls(node["text"])
+            else:
+                widget = cls()
+        except (TypeError, ValueError):
+            widget = None
+    if widget is None:
+        widget = _make_placeholder(node)
+    if len(widget.children) == 0:
+        # (If the widget created its own internal children, the
+        # recorded ones are just those and must not be added again.)
+        for child_node in node["children"]:
+            widget.add(_rebuild_widget(child_node))
+    return widget
+
+def rebuild_window(snapshot):
+    """ Creates a new window from the given snapshot and returns it. """
+    from wobblui.style import AppStyle
+    from wobblui.window import Window
+    window = Window(title="layout snapshot replay",
+        width=snapshot["window"]["width"],
+        height=snapshot["window"]["height"])
+    style_cls = _find_class(snapshot["style"]["type"])
+    if style_cls is None:
+        style_cls = AppStyle
+    style = style_cls(window)
+    style.values = dict(snapshot["style"]["values"])
+    style._dpi_scale = snapshot["style"]["dpi_scale"]
+    style._dpi_scale_base = snapshot["style"]["dpi_scale_base"]
+    window.set_style(style)
+    for node in snapshot["children"]:
+        window.add(_rebuild_widget(node))
+    return window
+
+def _relayout_at_size(window, width, height):
+    from wobblui.benchmark import resize_window
+    resize_window(window, width, height)
+    window.needs_relayout = True
+    for child in window.children:
+        child.needs_relayout = True
+    window.relayout_if_necessary()
+
+def replay(snapshot, sizes, profile="perf", rounds=1):
+    """ Rebuilds the snapshot headlessly and relayouts it at each of the
+        given (width, height) sizes. With profile="perf", returns the
+        relayout time per widget class as measured by the perf tracer.
+        With profile="cprofile", returns the cProfile statistics text.
+    """
+    from wobblui.benchmark import setup_headless
+    from wobblui.perf import Perf
+    setup_headless()
+    window = rebuild_window(snapshot)
+    window.relayout_if_necessary()
+    profiler = None
+    if profile == "cprofile":
+        profiler = cProfile.Profile()
+    elif profile == "perf":
+        was_tracing = Perf.tracing_enabled
+        Perf.reset()
+        Perf.set_tracing_enabled(True)
+    else:
+        raise ValueError("unknown profiler: " + str(profile))
+    start_time = time.monotonic()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        for i in range(rounds):
+            for (width, height) in sizes:
+                _relayout_at_size(window, width, height)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        else:
+            Perf.set_tracing_enabled(was_tracing)
+    duration = time.monotonic() - start_time
+    window.close()
+    if profiler is not None:
+        output = io.StringIO()
+        pstats.Stats(profiler, stream=output).sort_stats(
+            "cumulative").print_stats(40)
+        return {"total_seconds": duration,
+            "cprofile": output.getvalue()}
+    per_class = dict()
+    for name, stats in Perf.percentiles("relayout_",
+            startswith=True).items():
+        per_class[name[len("relayout_"):]] = {
+            "count": stats["count"],
+            "total_seconds": stats["mean"] * stats["count"],
+            "max_seconds": stats["max"],
+        }
+    return {"total_seconds": duration, "per_class": per_class}
+
+def _parse_sizes(text):
+    sizes = []
+    for size in text.split(","):
+        width, _, height = size.strip().partition("x")
+        sizes.append((int(width), int(height)))
+    return sizes
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Replay the layouting of a wobblui layout snapshot.")
+    parser.add_argument("snapshot", help="snapshot JSON file, as " +
+        "written by wobblui.layoutsnapshot.save_snapshot()")
+    parser.add_argument("--sizes", default="800x600,1280x720,400x800",
+        help="comma-separated list of window sizes, e.g. 800x600")
+    parser.add_argument("--rounds", type=int, default=1,
+        help="how often to go through all sizes")
+    parser.add_argument("--profile", default="perf",
+        choices=["perf", "cprofile"],
+        help="profile with the wobblui perf tracer or cProfile")
+    args = parser.parse_args()
+    result = replay(load_snapshot(args.snapshot),
+        _parse_sizes(args.sizes), profile=args.profile,
+        rounds=args.rounds)
+    print("Total relayout time: " +
+        str(round(result["total_seconds"] * 1000.0, 2)) + "ms")
+    if "cprofile" in result:
+        print(result["cprofile"])
+        return
+    for name, stats in sorted(result["per_class"].items(),
+            key=lambda item: -item[1]["total_seconds"]):
+        print("  " + name + ": " +
+            str(round(stats["total_seconds"] * 1000.0, 2)) + "ms in " +
+            str(stats["count"]) + " relayouts, max " +
+            str(round(stats["max_seconds"] * 1000.0, 2)) + "ms")
+
+if __name__ == "__main__":
+    main()
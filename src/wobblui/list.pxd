@@ -52,7 +52,8 @@ cdef class ListEntry:
     cdef public int disabled
     cdef public int is_alternating
     cdef public double px_size_scaler
-    cdef public object text_obj
+    cdef object _text_obj
+    cdef int _text_objects_outdated
     cdef public int need_size_update
     cdef public int _height
     cdef public double effective_dpi_scale
@@ -65,6 +66,44 @@ cdef class ListEntry:
     cdef public int side_icon_or_space_left
     cdef public int side_icon_with_text_color
 
+    # Layout generation of the list this entry was last measured for:
+    cdef public long layout_generation
+
+    cdef _ensure_text_objects(self)
+
+cdef class _HeightIndex:
+    cdef readonly list values
+    cdef list tree
+    cdef readonly long total
+    cdef readonly long base
+
+    cpdef fill(self, long count, long height)
+    cpdef rebuild(self, list values)
+    cpdef append(self, long height)
+    cpdef insert(self, long index, long height)
+    cpdef set(self, long index, long height)
+    cdef long _delta_prefix(self, long count)
+    cpdef long prefix(self, long count)
+    cpdef long find(self, long offset)
+
+cdef class _SearchIndex:
+    cdef list texts, ids, position_keys
+    cdef dict key_of
+    cdef list blocks, block_maxes, block_pos_ids, block_pos_keys
+    cdef dict trigrams
+    cdef long next_id
+
+    cdef double _new_position_key(self, long index)
+    cdef _relabel(self)
+    cdef _set_block_positions(self, long b)
+    cdef _sorted_insert(self, tuple item, double key)
+    cdef _sorted_remove(self, tuple item, double key)
+    cpdef insert(self, long index, str html_text)
+    cpdef remove(self, long index)
+    cpdef long _index_of(self, long entry_id)
+    cpdef long find_prefix(self, str prefix, long start_index)
+    cpdef list filter(self, str query)
+
 cdef class ListBase(ScrollbarDrawingWidget):
     cdef public object triggered
     cdef list _entries
@@ -75,7 +114,41 @@ cdef class ListBase(ScrollbarDrawingWidget):
     cdef public int render_as_menu, fixed_one_line_entries
     cdef object cached_natural_width
     cdef int triggered_by_single_click
+    cdef _HeightIndex _height_index
+    cdef long _layout_generation
+    cdef int _entry_width
+    cdef double _layout_dpi_scale
+    cdef long _layout_style_version
+    cdef long _measured_height_sum, _measured_count
+    cdef _SearchIndex _search_index
+    cdef str _type_ahead_text
+    cdef double _type_ahead_time
+
+    cdef int _entry_layout_width(self)
+    cdef long _estimated_entry_height(self)
+    cdef _sync_entry_style(self, ListEntry entry)
+    cdef _update_height_index(self)
+    cdef long _measure_entry(self, long index) except? -1
+    cdef _measure_visible_entries(self)
+    cdef long _entry_y_offset(self, long index)
+    cdef _fill_height_index(self)
+    cdef long _entry_count(self)
+    cdef ListEntry _get_entry(self, long index)
+    cdef int _is_entry_disabled(self, long index)
+    cdef _SearchIndex _get_search_index(self)
+    cdef _scroll_to_entry(self, long index)
+    cdef _append_entries(self, list html_entries, list side_htmls,
+        list subtitle_htmls)
 
 cdef class List(ListBase):
     pass
 
+cdef class ModelList(ListBase):
+    cdef object _model, _model_listener
+    cdef long _row_count
+    cdef dict _entry_cache
+    cdef list _entry_pool
+
+    cdef _recycle_entry(self, long index)
+    cdef _recycle_invisible_entries(self)
+
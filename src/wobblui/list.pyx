@@ -20,14 +20,19 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+import bisect
 import copy
 import html
 import math
+import re
+import time
+import weakref
 
 from wobblui.color cimport Color
 from wobblui.event cimport Event
 from wobblui.gfx cimport draw_dashed_line, draw_rectangle
 from wobblui.image cimport RenderImage
+from wobblui.image import SharedImage
 from wobblui.osinfo import is_android
 from wobblui.perf cimport CPerf as Perf
 from wobblui.richtext cimport RichText
@@ -50,6 +55,9 @@ cdef class ListEntry:
             with_visible_bg=False,
             override_dpi_scale=None):
         self.y_offset = None
+        self.layout_generation = -1
+        self._text_obj = None
+        self._text_objects_outdated = True
         self.with_visible_bg = with_visible_bg
         self._max_width = -1
         self._cached_natural_width = None
@@ -80,6 +88,10 @@ cdef class ListEntry:
             side_icon_to_left=side_icon_to_left,
             side_icon_with_text_color=side_icon_with_text_color)
 
+    def set_html(self, new_html):
+        self._html = new_html
+        self.update()
+
     def set_side_html(self, new_html=None, new_html_scale=None):
         self.extra_html_at_right = new_html
         if new_html_scale is not None:
@@ -89,7 +101,8 @@ cdef class ListEntry:
     def update(self):
         self._cached_natural_width = None
         self.need_size_update = True
-        self.update_text_objects()
+        self.layout_generation = -1
+        self._text_objects_outdated = True
         self.clear_texture()
 
     def set_blank_side_space(self, space_to_left=True, space_width=40):
@@ -106,8 +119,8 @@ cdef class ListEntry:
             side_icon_width=40,
             side_icon_with_text_color=False):
         if side_icon is not None and \
-                not isinstance(side_icon, RenderImage):
-            side_icon = RenderImage(side_icon)
+                not isinstance(side_icon, (RenderImage, SharedImage)):
+            side_icon = SharedImage(side_icon)
         self.side_icon = side_icon
         self.side_icon_or_space_left = side_icon_to_left
         self.side_icon_or_space_width = 0
@@ -122,7 +135,14 @@ cdef class ListEntry:
         # Clear caches:
         self.update()
 
+    cdef _ensure_text_objects(self):
+        # The HTML is only parsed once the entry is measured or drawn,
+        # since most entries of long lists are never scrolled into view:
+        if self._text_objects_outdated:
+            self.update_text_objects()
+
     def update_text_objects(self):
+        self._text_objects_outdated = False
         if self._cached_render_tex != None:
             self.clear_texture()
         dpi_scale = 1.0
@@ -137,11 +157,11 @@ cdef class ListEntry:
             dpi_scale = self.override_dpi_scale
 
         # Main text:
-        self.text_obj = RichText(font_family=font_family,
+        self._text_obj = RichText(font_family=font_family,
             px_size=round(px_size),
             draw_scale=dpi_scale)
-        self.text_obj.set_html(self._html)
-        self._text = self.text_obj.text
+        self._text_obj.set_html(self._html)
+        self._text = self._text_obj.text
 
         # Extra text at the right:
         self.extra_html_at_right_x = 0
@@ -181,8 +201,14 @@ cdef class ListEntry:
         self.need_size_update = True
         self.effective_dpi_scale = dpi_scale
 
+    @property
+    def text_obj(self):
+        self._ensure_text_objects()
+        return self._text_obj
+
     @property
     def text(self):
+        self._ensure_text_objects()
         return self._text
 
     @property
@@ -235,6 +261,7 @@ cdef class ListEntry:
             draw_hover=False,
             draw_soft_hover=False,
             draw_keyboard_focus=False):
+        self._ensure_text_objects()
         no_bg = (not self.with_visible_bg)
         c = Color((200, 200, 200))
         if self.style != None:
@@ -242,36 +269,35 @@ cdef class ListEntry:
                 if not self.is_alternating or \
                         not self.style.has(
                             "inner_widget_alternating_bg"):
-                    c = Color(self.style.get("inner_widget_bg"))
+                    c = self.style.get_color("inner_widget_bg")
                     if draw_soft_hover and self.style.has(
                             "inner_widget_bg_hover"
                             ):
-                        c = Color(self.style.get("inner_widget_bg_hover"))
+                        c = self.style.get_color("inner_widget_bg_hover")
                 else:
-                    c = Color(self.style.get(
-                        "inner_widget_alternating_bg"))
+                    c = self.style.get_color(
+                        "inner_widget_alternating_bg")
                     if draw_soft_hover and self.style.has(
                             "inner_widget_alternating_bg_hover"
                             ):
-                        c = Color(self.style.get(
+                        c = self.style.get_color(
                             "inner_widget_alternating_bg_hover")
-                        )
             if draw_hover:
                 no_bg = False
-                c = Color(self.style.get("hover_bg"))
+                c = self.style.get_color("hover_bg")
             elif draw_selected:
                 no_bg = False
-                c = Color(self.style.get("selected_bg"))
+                c = self.style.get_color("selected_bg")
         if not no_bg:
             draw_rectangle(renderer, x, y,
                 self.width, self.height, color=c)
         c = Color((0, 0, 0))
         if self.style != None:
-            c = Color(self.style.get("widget_text"))
+            c = self.style.get_color("widget_text")
             if draw_hover or draw_selected:
-                c = Color(self.style.get("selected_text"))
+                c = self.style.get_color("selected_text")
             if self.disabled and self.style.has("widget_disabled_text"):
-                c = Color(self.style.get("widget_disabled_text"))
+                c = self.style.get_color("widget_disabled_text")
         perf_id = Perf.start("ListItem.draw -> text_objs draw")
         self.text_obj.draw(renderer,
             round(5.0 * self.effective_dpi_scale) + x +
@@ -296,11 +322,11 @@ cdef class ListEntry:
         if self.side_icon is not None:
             c = Color.white()
             if self.side_icon_with_text_color:
-                c = Color(self.style.get("widget_text"))
+                c = self.style.get_color("widget_text")
                 if draw_hover or draw_selected:
-                    c = Color(self.style.get("selected_text"))
+                    c = self.style.get_color("selected_text")
                 if self.disabled and self.style.has("widget_disabled_text"):
-                    c = Color(self.style.get("widget_disabled_text"))
+                    c = self.style.get_color("widget_disabled_text")
             self.side_icon.draw(renderer,
                 self.iconoffset_x + x, self.iconoffset_y + y,
                 round(self.side_icon_or_space_width *
@@ -312,17 +338,19 @@ cdef class ListEntry:
         Perf.stop(perf_id)
 
     def copy(self):
+        cdef ListEntry li
         old_self_tex = self._cached_render_tex
         self._cached_render_tex = None
         li = copy.copy(self)
         self._cached_render_tex = old_self_tex
-        li.update_text_objects()
+        li._text_objects_outdated = True
         return li
 
     def get_desired_width(self):  # not a regular widget.
                                   # (where we'd define "natural" width)
         if self._cached_natural_width != None:
             return self._cached_natural_width
+        self._ensure_text_objects()
         text_copy = self.text_obj.copy()
         (w, h) = text_copy.layout(max_width=None)
         if self.extra_html_at_right_obj != None:
@@ -374,7 +402,8 @@ cdef class ListEntry:
     def on_stylechanged(self):
         self._cached_natural_width = None
         self.need_size_update = True
-        self.update_text_objects()
+        self.layout_generation = -1
+        self._text_objects_outdated = True
         self.clear_texture()
 
     @property
@@ -398,12 +427,20 @@ cdef class ListEntry:
         return 10.0
 
     def update_size(self):
+        self._ensure_text_objects()
         if not self.need_size_update:
             return
 
         self.need_size_update = False
         if self._cached_render_tex != None:
             self.clear_texture()
+        if isinstance(self.side_icon, SharedImage):
+            # Scale the icon now, so drawing doesn't need to:
+            self.side_icon.prepare(
+                round(self.side_icon_or_space_width *
+                    self.effective_dpi_scale),
+                round(self.side_icon_height *
+                    self.effective_dpi_scale))
         padding = max(0, round(5.0 * self.effective_dpi_scale))
         padding_vertical = max(0,
             round(self.vertical_padding * self.effective_dpi_scale))
@@ -556,6 +593,361 @@ cdef class ListEntry:
             self.iconoffset_x = max_width_without_icon + padding_side_icon
 
 
+cdef class _HeightIndex:
+    """ A Fenwick tree (binary indexed tree) over the entry heights of
+        a list. Changing one height, getting the offset of an entry and
+        finding the entry at a given offset are all O(log n).
+
+        The tree holds the difference of each height to a base height,
+        so filling it with one uniform height doesn't need to compute
+        any tree nodes. (Which matters for huge models, where most of
+        the entries are never measured.)
+
+        MEMBERS IN list.pxd
+    """
+
+    def __init__(self):
+        self.values = []
+        self.tree = [0]
+        self.total = 0
+        self.base = 0
+
+    def __len__(self):
+        return len(self.values)
+
+    cpdef fill(self, long count, long height):
+        """ Reset to count entries which are all of the given height. """
+        self.values = [height] * count
+        self.tree = [0] * (count + 1)
+        self.base = height
+        self.total = height * count
+
+    cpdef rebuild(self, list values):
+        cdef long i, parent
+        cdef long n = len(values)
+        self.values = list(values)
+        self.tree = [0] + self.values
+        self.total = 0
+        i = 1
+        while i <= n:
+            self.total += self.values[i - 1]
+            self.tree[i] -= self.base
+            i += 1
+        i = 1
+        while i <= n:
+            parent = i + (i & -i)
+            if parent <= n:
+                self.tree[parent] += self.tree[i]
+            i += 1
+
+    cpdef append(self, long height):
+        cdef long n = len(self.values) + 1
+        # Node n covers the heights of entries (n - lowbit(n), n]:
+        self.tree.append(height - self.base +
+            self._delta_prefix(n - 1) -
+            self._delta_prefix(n - (n & -n)))
+        self.values.append(height)
+        self.total += height
+
+    cpdef insert(self, long index, long height):
+        values = self.values
+        values.insert(index, height)
+        self.rebuild(values)
+
+    cpdef set(self, long index, long height):
+        cdef long delta = height - self.values[index]
+        cdef long i = index + 1
+        cdef long n = len(self.values)
+        if delta == 0:
+            return
+        self.values[index] = height
+        self.total += delta
+        while i <= n:
+            self.tree[i] += delta
+            i += (i & -i)
+
+    cdef long _delta_prefix(self, long count):
+        cdef long result = 0
+        cdef long i = count
+        while i > 0:
+            result += self.tree[i]
+            i -= (i & -i)
+        return result
+
+    cpdef long prefix(self, long count):
+        """ Sum of the heights of the first count entries. """
+        count = max(0, min(count, len(self.values)))
+        return self.base * count + self._delta_prefix(count)
+
+    cpdef long find(self, long offset):
+        """ Index of the entry containing the given offset, clamped to
+            the last entry. Returns -1 if there are no entries.
+        """
+        cdef long n = len(self.values)
+        cdef long pos = 0
+        cdef long step = 1
+        cdef long node_height
+        if n == 0:
+            return -1
+        while step * 2 <= n:
+            step *= 2
+        while step > 0:
+            if pos + step <= n:
+                # Node pos + step covers exactly step entries here:
+                node_height = self.tree[pos + step] + self.base * step
+                if node_height <= offset:
+                    pos += step
+                    offset -= node_height
+            step //= 2
+        return min(pos, n - 1)
+
+
+cdef object _html_tag_regex = re.compile("<[^>]*>")
+
+cdef str _search_text_from_html(str html_text):
+    return html.unescape(_html_tag_regex.sub("", html_text)).\
+        strip().lower()
+
+# Target size of the blocks of the sorted text index. Blocks are split
+# when they grow to twice that:
+cdef long _search_block_size = 256
+
+cdef class _SearchIndex:
+    """ Search index over the plain text of list entries: the texts
+        sorted for prefix lookups, and a trigram index for substring
+        filtering.
+
+        Entries are tracked by a stable id, and their list position by
+        a float position key which stays valid when entries are
+        inserted or removed elsewhere, so the index of an entry can
+        always be found by bisecting the sorted position keys.
+
+        The sorted texts are split into blocks, each of which also
+        keeps its entries sorted by position. Finding the first match
+        of a prefix after a given index then only needs to bisect the
+        blocks which match as a whole, instead of checking every
+        matching entry.
+
+        MEMBERS IN list.pxd
+    """
+
+    def __init__(self):
+        self.texts = []
+        self.ids = []
+        self.position_keys = []
+        self.key_of = dict()
+        self.blocks = []
+        self.block_maxes = []
+        self.block_pos_ids = []
+        self.block_pos_keys = []
+        self.trigrams = dict()
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    cdef double _new_position_key(self, long index):
+        # Needs index <= len(self.position_keys):
+        cdef list keys = self.position_keys
+        cdef double key
+        if len(keys) == 0:
+            return 0.0
+        if index >= len(keys):
+            return keys[-1] + 1.0
+        if index == 0:
+            return keys[0] - 1.0
+        key = (keys[index - 1] + keys[index]) * 0.5
+        if key <= keys[index - 1] or key >= keys[index]:
+            # Out of float precision in this gap, renumber everything:
+            self._relabel()
+            key = index - 0.5
+        return key
+
+    cdef _relabel(self):
+        cdef long i = 0
+        cdef long b
+        for entry_id in self.ids:
+            self.key_of[entry_id] = float(i)
+            i += 1
+        self.position_keys = [float(i) for i in range(len(self.ids))]
+        # (The position order within blocks doesn't change.)
+        b = 0
+        while b < len(self.blocks):
+            self.block_pos_keys[b] = [self.key_of[entry_id]
+                for entry_id in self.block_pos_ids[b]]
+            b += 1
+
+    cdef _set_block_positions(self, long b):
+        pos = sorted([(self.key_of[item[1]], item[1])
+            for item in self.blocks[b]])
+        self.block_pos_keys[b] = [item[0] for item in pos]
+        self.block_pos_ids[b] = [item[1] for item in pos]
+
+    cdef _sorted_insert(self, tuple item, double key):
+        cdef long b, k
+        cdef list block
+        if len(self.blocks) == 0:
+            self.blocks.append([item])
+            self.block_maxes.append(item)
+            self.block_pos_ids.append([item[1]])
+            self.block_pos_keys.append([key])
+            return
+        b = min(bisect.bisect_left(self.block_maxes, item),
+            len(self.blocks) - 1)
+        block = self.blocks[b]
+        bisect.insort(block, item)
+        self.block_maxes[b] = block[-1]
+        k = bisect.bisect_left(self.block_pos_keys[b], key)
+        self.block_pos_keys[b].insert(k, key)
+        self.block_pos_ids[b].insert(k, item[1])
+        if len(block) >= _search_block_size * 2:
+            self.blocks[b:b + 1] = [block[:_search_block_size],
+                block[_search_block_size:]]
+            self.block_maxes[b:b + 1] = [self.blocks[b][-1],
+                self.blocks[b + 1][-1]]
+            self.block_pos_ids[b:b + 1] = [None, None]
+            self.block_pos_keys[b:b + 1] = [None, None]
+            self._set_block_positions(b)
+            self._set_block_positions(b + 1)
+
+    cdef _sorted_remove(self, tuple item, double key):
+        cdef long b, j, k
+        cdef list block
+        b = bisect.bisect_left(self.block_maxes, item)
+        block = self.blocks[b]
+        j = bisect.bisect_left(block, item)
+        del block[j]
+        k = bisect.bisect_left(self.block_pos_keys[b], key)
+        del self.block_pos_keys[b][k]
+        del self.block_pos_ids[b][k]
+        if len(block) == 0:
+            del self.blocks[b]
+            del self.block_maxes[b]
+            del self.block_pos_ids[b]
+            del self.block_pos_keys[b]
+        else:
+            self.block_maxes[b] = block[-1]
+
+    cpdef insert(self, long index, str html_text):
+        cdef long i
+        cdef double key
+        cdef str text = _search_text_from_html(html_text)
+        cdef long entry_id = self.next_id
+        self.next_id += 1
+        index = max(0, min(index, len(self.ids)))
+        key = self._new_position_key(index)
+        self.texts.insert(index, text)
+        self.ids.insert(index, entry_id)
+        self.position_keys.insert(index, key)
+        self.key_of[entry_id] = key
+        self._sorted_insert((text, entry_id), key)
+        i = 0
+        while i < len(text) - 2:
+            trigram = text[i:i + 3]
+            if not trigram in self.trigrams:
+                self.trigrams[trigram] = {entry_id}
+            else:
+                self.trigrams[trigram].add(entry_id)
+            i += 1
+
+    cpdef remove(self, long index):
+        cdef long i
+        cdef str text = self.texts.pop(index)
+        cdef long entry_id = self.ids.pop(index)
+        cdef double key = self.key_of.pop(entry_id)
+        del self.position_keys[index]
+        self._sorted_remove((text, entry_id), key)
+        i = 0
+        while i < len(text) - 2:
+            self.trigrams.get(text[i:i + 3], set()).discard(entry_id)
+            i += 1
+
+    cpdef long _index_of(self, long entry_id):
+        return bisect.bisect_left(self.position_keys,
+            self.key_of[entry_id])
+
+    cpdef long find_prefix(self, str prefix, long start_index):
+        """ Returns the first entry at or after start_index whose text
+            starts with the given prefix, wrapping around at the end,
+            or -1 if there is none.
+        """
+        cdef long b, j, k
+        cdef double start_key, key
+        cdef double best = -1.0
+        cdef double first = -1.0
+        cdef int have_best = False
+        cdef int have_first = False
+        cdef list block, keys
+        prefix = prefix.lower()
+        if len(self.ids) == 0:
+            return -1
+        if start_index >= len(self.ids):
+            start_key = self.position_keys[-1] + 1.0
+        else:
+            start_key = self.position_keys[max(0, start_index)]
+        lo_item = (prefix, -1)
+        b = bisect.bisect_left(self.block_maxes, lo_item)
+        while b < len(self.blocks):
+            block = self.blocks[b]
+            if block[0][0].startswith(prefix) and \
+                    block[-1][0].startswith(prefix):
+                # All of the block matches, so just bisect by position:
+                keys = self.block_pos_keys[b]
+                k = bisect.bisect_left(keys, start_key)
+                if k < len(keys) and (not have_best or keys[k] < best):
+                    best = keys[k]
+                    have_best = True
+                if not have_first or keys[0] < first:
+                    first = keys[0]
+                    have_first = True
+                b += 1
+                continue
+            j = bisect.bisect_left(block, lo_item)
+            while j < len(block) and block[j][0].startswith(prefix):
+                key = self.key_of[block[j][1]]
+                if key >= start_key and (not have_best or key < best):
+                    best = key
+                    have_best = True
+                if not have_first or key < first:
+                    first = key
+                    have_first = True
+                j += 1
+            if j < len(block):
+                break  # past the matching range
+            b += 1
+        if have_best:
+            return bisect.bisect_left(self.position_keys, best)
+        if have_first:
+            return bisect.bisect_left(self.position_keys, first)
+        return -1
+
+    cpdef list filter(self, str query):
+        """ Returns the sorted indexes of all entries containing the
+            given text.
+        """
+        cdef long i
+        cdef list texts = self.texts
+        query = query.lower()
+        if len(query) < 3:
+            return [i for i in range(len(texts)) if query in texts[i]]
+        candidates = None
+        trigram_sets = sorted([
+            self.trigrams.get(query[i:i + 3], set())
+            for i in range(len(query) - 2)], key=len)
+        candidates = set(trigram_sets[0])
+        for trigram_set in trigram_sets[1:]:
+            if len(candidates) == 0:
+                break
+            candidates &= trigram_set
+        result = []
+        for entry_id in candidates:
+            i = self._index_of(entry_id)
+            if query in texts[i]:
+                result.append(i)
+        result.sort()
+        return result
+
+
 cdef class ListBase(ScrollbarDrawingWidget):
     def __init__(self,
             render_as_menu=False,
@@ -580,6 +972,14 @@ cdef class ListBase(ScrollbarDrawingWidget):
         self.last_known_effective_dpi_scale = None
         self.render_as_menu = render_as_menu
         self.fixed_one_line_entries = fixed_one_line_entries
+        self._height_index = _HeightIndex()
+        self._layout_generation = 1
+        self._entry_width = -1
+        self._measured_height_sum = 0
+        self._measured_count = 0
+        self._search_index = None
+        self._type_ahead_text = ""
+        self._type_ahead_time = 0.0
         self.update_style_info()
         self.cached_natural_width = None
         self._top_extra_drawing_space = _internal_top_extra_drawing_space
@@ -609,11 +1009,148 @@ cdef class ListBase(ScrollbarDrawingWidget):
         if self.usual_entry_height <= 0:
             raise RuntimeError("got invalid zero height for entry")
         del(entry)
-        for entry in self._entries:
+        # (Entries pick up the new style when they are measured next.)
+        self._layout_style_version = -1
+        self.last_known_effective_dpi_scale = self.dpi_scale
+
+    cdef int _entry_layout_width(self):
+        border_size = max(1, round(1.0 * self.dpi_scale))
+        if not self.render_as_menu:
+            border_size = 0
+        return self.width - round(border_size * 2)
+
+    cdef long _estimated_entry_height(self):
+        if self.fixed_one_line_entries or self._measured_count == 0:
+            return self.usual_entry_height
+        return max(1, round(self._measured_height_sum /
+            float(self._measured_count)))
+
+    cdef _sync_entry_style(self, ListEntry entry):
+        if entry.override_dpi_scale != self.dpi_scale or \
+                entry.style is not self.style:
             entry.override_dpi_scale = self.dpi_scale
-            entry.style = self.style
+            entry._style = self.style
             entry.on_stylechanged()
-        self.last_known_effective_dpi_scale = self.dpi_scale
+
+    cdef _update_height_index(self):
+        # If the entry width, style or DPI scale changed, all entries
+        # need measuring again. Until they are measured, they are in
+        # the height index with an estimated height:
+        entry_width = self._entry_layout_width()
+        style_version = (self.style.version
+            if self.style is not None else -1)
+        if entry_width == self._entry_width and \
+                self.dpi_scale == self._layout_dpi_scale and \
+                style_version == self._layout_style_version and \
+                len(self._height_index) == self._entry_count():
+            return
+        self._entry_width = entry_width
+        self._layout_dpi_scale = self.dpi_scale
+        self._layout_style_version = style_version
+        self._layout_generation += 1
+        self._measured_height_sum = 0
+        self._measured_count = 0
+        self._fill_height_index()
+
+    cdef _fill_height_index(self):
+        self._height_index.fill(self._entry_count(),
+            self._estimated_entry_height())
+
+    cdef long _entry_count(self):
+        return len(self._entries)
+
+    cdef ListEntry _get_entry(self, long index):
+        return self._entries[index]
+
+    cdef int _is_entry_disabled(self, long index):
+        return self._entries[index].disabled
+
+    cdef _SearchIndex _get_search_index(self):
+        # Built on first use, and then kept up to date as entries are
+        # added or removed:
+        cdef long i = 0
+        if self._search_index is None:
+            search_index = _SearchIndex()
+            for html_text in self.entries:
+                search_index.insert(i, html_text)
+                i += 1
+            self._search_index = search_index
+        return self._search_index
+
+    def filter(self, query):
+        """ Returns the indexes of all entries whose plain text contains
+            the given query, ignoring case.
+        """
+        return self._get_search_index().filter(query)
+
+    def find_prefix(self, prefix, start_index=0):
+        """ Returns the index of the first entry at or after start_index
+            whose plain text starts with the given prefix, ignoring case.
+            Wraps around to the start, and returns -1 if none matches.
+        """
+        return self._get_search_index().find_prefix(prefix, start_index)
+
+    cdef _scroll_to_entry(self, long index):
+        self._update_height_index()
+        self._measure_entry(index)
+        self.scroll_y_offset = min(self._entry_y_offset(index),
+            max(self.scroll_y_offset, self._entry_y_offset(index) +
+                self._height_index.values[index] - self.height))
+        self.needs_redraw = True
+
+    cdef long _measure_entry(self, long index) except? -1:
+        """ Lay out the given entry for the current width if it isn't
+            yet, and return by how much its height changed.
+        """
+        cdef ListEntry entry = self._get_entry(index)
+        cdef long old_height, height
+        if entry.layout_generation == self._layout_generation:
+            return 0
+        self._sync_entry_style(entry)
+        entry.width = self._entry_width
+        entry.layout_generation = self._layout_generation
+        if self.fixed_one_line_entries:
+            height = self.usual_entry_height
+        else:
+            height = round(entry.height)
+            self._measured_height_sum += height
+            self._measured_count += 1
+        old_height = self._height_index.values[index]
+        self._height_index.set(index, height)
+        return height - old_height
+
+    cdef _measure_visible_entries(self):
+        # Measure the entries in view plus a margin around it, and
+        # leave all others at their estimated height:
+        cdef long count = self._entry_count()
+        cdef long view_start, margin, anchor, i, y, shift
+        if count == 0:
+            return
+        margin = max(self.height // 2, self.usual_entry_height)
+        view_start = max(0, self.scroll_y_offset -
+            math.ceil(self._top_extra_drawing_space))
+        anchor = self._height_index.find(view_start)
+        i = anchor
+        y = self._height_index.prefix(anchor)
+        while i < count and y < view_start + self.height + margin:
+            self._measure_entry(i)
+            y += self._height_index.values[i]
+            i += 1
+        # Entries above the view change the offset of everything
+        # after them, so adjust the scroll position to compensate:
+        shift = 0
+        i = anchor - 1
+        y = self._height_index.prefix(anchor)
+        while i >= 0 and y > view_start - margin:
+            shift += self._measure_entry(i)
+            y -= self._height_index.values[i]
+            i -= 1
+        if shift != 0:
+            self.scroll_y_offset = max(0, self.scroll_y_offset + shift)
+
+    cdef long _entry_y_offset(self, long index):
+        return math.ceil(self._top_extra_drawing_space) +\
+            self._height_index.prefix(index)
 
     def set_disabled(self, entry_index, state):
         new_state = (state is True)
@@ -632,12 +1169,46 @@ cdef class ListBase(ScrollbarDrawingWidget):
             return
         self.cached_natural_width = None
         self._entries = []
+        self._height_index.rebuild([])
+        self._search_index = None
         self._selected_index = -1
         self._hover_index = -1
         self.scroll_y_offset = 0
         self.needs_redraw = True
         self.needs_relayout = True
 
+    def reorder(self, order):
+        """ Rearrange the entries, so that the one at index order[i]
+            moves to index i. Unlike clearing and adding them again,
+            this keeps the selection on the same entry and doesn't
+            change the scroll position.
+        """
+        cdef long i
+        cdef long count = len(self._entries)
+        order = list(order)
+        if sorted(order) != list(range(count)):
+            raise ValueError("order must contain every entry index " +
+                "exactly once")
+        new_index = [0] * count
+        i = 0
+        while i < count:
+            new_index[order[i]] = i
+            i += 1
+        self._entries = [self._entries[i] for i in order]
+        values = self._height_index.values
+        self._height_index.rebuild([values[i] for i in order])
+        i = 0
+        while i < count:
+            self._entries[i].is_alternating = (((i + 1) % 2) == 0)
+            self._entries[i].clear_texture()
+            i += 1
+        if self._selected_index >= 0:
+            self._selected_index = new_index[self._selected_index]
+        self._hover_index = -1
+        self._search_index = None
+        self.needs_relayout = True
+        self.needs_redraw = True
+
     @property
     def hover_index(self):
         return self._hover_index
@@ -661,54 +1232,76 @@ cdef class ListBase(ScrollbarDrawingWidget):
     def on_keydown(self, key, physical_key, modifiers):
         if key == "down":
             self._selected_index += 1
-            if self._selected_index >= len(self._entries):
-                self._selected_index = len(self._entries) - 1
-                if len(self._entries) == 0:
+            if self._selected_index >= self._entry_count():
+                self._selected_index = self._entry_count() - 1
+                if self._entry_count() == 0:
                     self._selected_index = -1
             # Make sure we haven't selected a disabled entry:
-            if len(self._entries) > 0:
-                while self._selected_index < len(self._entries) and \
-                        self._entries[self._selected_index].disabled:
+            if self._entry_count() > 0:
+                while self._selected_index < self._entry_count() and \
+                        self._is_entry_disabled(self._selected_index):
                     self._selected_index += 1
                 while self.selected_index >= 0 and \
-                        (self._selected_index >= len(self._entries) or
-                        self._entries[self._selected_index].disabled):
+                        (self._selected_index >= self._entry_count() or
+                        self._is_entry_disabled(self._selected_index)):
                     self._selected_index -= 1
                 if self._selected_index < 0:
                     # No non-disabled entries.
                     self._selected_index = -1
 
-            self.scroll_y_offset = max(
-                self._entries[self._selected_index].y_offset +
-                self._entries[self._selected_index].height -
-                self.height,
-                self.scroll_y_offset)
+            if self._selected_index >= 0:
+                self._update_height_index()
+                self._measure_entry(self._selected_index)
+                self.scroll_y_offset = max(
+                    self._entry_y_offset(self._selected_index) +
+                    self._height_index.values[self._selected_index] -
+                    self.height,
+                    self.scroll_y_offset)
             self.needs_redraw = True
         elif key == "up":
             self._selected_index -= 1
             if self._selected_index < 0:
                 self._selected_index = 0
-                if len(self._entries) == 0:
+                if self._entry_count() == 0:
                     self._selected_index = -1
             # Make sure we haven't selected a disabled entry:
-            if len(self._entries) > 0:
+            if self._entry_count() > 0:
                 while self._selected_index >= 0 and \
-                        self._entries[self._selected_index].disabled:
+                        self._is_entry_disabled(self._selected_index):
                     self._selected_index -= 1
-                while self.selected_index < len(self._entries) and \
+                while self.selected_index < self._entry_count() and \
                         (self._selected_index < 0 or
-                        self._entries[self._selected_index].disabled):
+                        self._is_entry_disabled(self._selected_index)):
                     self._selected_index += 1
-                if self._selected_index >= len(self._entries):
+                if self._selected_index >= self._entry_count():
                     # No non-disabled entries.
                     self._selected_index = -1
-            self.scroll_y_offset = min(
-                self._entries[self._selected_index].y_offset,
-                self.scroll_y_offset)
+            if self._selected_index >= 0:
+                self._update_height_index()
+                self._measure_entry(self._selected_index)
+                self.scroll_y_offset = min(
+                    self._entry_y_offset(self._selected_index),
+                    self.scroll_y_offset)
             self.needs_redraw = True
         elif key == "space" or key == "return":
             if self._selected_index >= 0:
                 self.triggered()
+        elif len(key) == 1 and not "ctrl" in modifiers and \
+                not "alt" in modifiers:
+            # Type-ahead: jump to the next entry starting with what was
+            # typed, with a pause of one second starting over:
+            start_index = max(0, self._selected_index + 1)
+            if time.monotonic() > self._type_ahead_time + 1.0:
+                self._type_ahead_text = ""
+            elif len(self._type_ahead_text) > 0:
+                start_index = max(0, self._selected_index)
+            self._type_ahead_text += key
+            self._type_ahead_time = time.monotonic()
+            index = self.find_prefix(self._type_ahead_text,
+                start_index=start_index)
+            if index >= 0 and not self._is_entry_disabled(index):
+                self._selected_index = index
+                self._scroll_to_entry(index)
 
     def on_mousewheel(self, mouse_id, x, y):
         self.scroll_y_offset = max(0,
@@ -723,7 +1316,7 @@ cdef class ListBase(ScrollbarDrawingWidget):
         click_index = self.coords_to_entry(x, y)
         if click_index != self._hover_index:
             if click_index >= 0 and \
-                    self._entries[click_index].disabled:
+                    self._is_entry_disabled(click_index):
                 return  # it's a disabled entry, ignore
             self._hover_index = click_index
             self.needs_redraw = True
@@ -775,42 +1368,21 @@ cdef class ListBase(ScrollbarDrawingWidget):
                 y >= self.height:
             return -1
 
-        if self.fixed_one_line_entries:
-            offset = y + round(self.scroll_y_offset)
-            match = math.floor(offset / float(self.usual_entry_height))
-            return max(-1, min(match, len(self._entries) - 1))
-
-        entry_id = -1
-        for entry in self._entries:
-            entry_id += 1
-            if entry.y_offset is None:
-                raise RuntimeError(
-                    "order issue: " +
-                    "relayouting appears not to have set y_offset " +
-                    "on list entry: " + str(entry)
-                )
-            if entry.y_offset < y + round(self.scroll_y_offset) and \
-                    entry.y_offset + entry.height >\
-                    y + round(self.scroll_y_offset):
-                return entry_id
-        return -1
+        self._update_height_index()
+        offset = y + round(self.scroll_y_offset) -\
+            math.ceil(self._top_extra_drawing_space)
+        if offset < 0:
+            return -1
+        if offset >= self._height_index.total and \
+                not self.fixed_one_line_entries:
+            return -1
+        return self._height_index.find(offset)
 
     def on_relayout(self):
-        # Update the entry positions:
+        # Entries are only measured once they are scrolled into view,
+        # so this just resets the height index if the width changed:
         self.cached_natural_width = None
-        border_size = max(1, round(1.0 * self.dpi_scale))
-        if not self.render_as_menu:
-            border_size = 0
-        cy = math.ceil(self._top_extra_drawing_space)
-        for entry in self._entries:
-            entry.override_dpi_scale = self.dpi_scale
-            entry.style = self.style
-            entry.width = self.width - round(border_size * 2)
-            entry.y_offset = cy
-            if not self.fixed_one_line_entries:
-                cy += round(entry.height)
-            else:
-                cy += self.usual_entry_height
+        self._update_height_index()
 
     def on_redraw(self):
         cdef str perf_id = Perf.start("list_innerdraw")
@@ -828,13 +1400,10 @@ cdef class ListBase(ScrollbarDrawingWidget):
         #Perf.start("sectiona")
 
         # Get height of content:
-        if not self.fixed_one_line_entries:
-            for entry in self._entries:
-                content_height += round(entry.height)
-        else:
-            content_height = round(len(self._entries) *\
-                self.usual_entry_height) 
-        content_height += math.ceil(self._top_extra_drawing_space)
+        self._update_height_index()
+        self._measure_visible_entries()
+        content_height = self._height_index.total +\
+            math.ceil(self._top_extra_drawing_space)
 
         # Make sure scroll down offset is in a valid range:
         max_scroll_down = max(0, content_height - self.height)
@@ -847,7 +1416,7 @@ cdef class ListBase(ScrollbarDrawingWidget):
             border_size = 0
         c = Color.black()
         if self.style != None and self.style.has("border"):
-            c = Color(self.style.get("border"))
+            c = self.style.get_color("border")
         if border_size > 0:
             draw_rectangle(self.renderer, 0, 0,
                 self.width, self.height, color=c)
@@ -855,25 +1424,27 @@ cdef class ListBase(ScrollbarDrawingWidget):
         # Draw background: 
         c = Color.white()
         if self.style != None:
-            c = Color(self.style.get("inner_widget_bg"))
+            c = self.style.get_color("inner_widget_bg")
             if self.render_as_menu and self.style.has("button_bg"):
-                c = Color(self.style.get("button_bg"))
+                c = self.style.get_color("button_bg")
         draw_rectangle(self.renderer, border_size, border_size,
             self.width - border_size * 2,
             self.height - border_size * 2,
             color=c)
 
-        # Draw items:
-        skip_start_items = 0
-        if self.fixed_one_line_entries:
-            skip_start_items = math.floor(
-                round(self.scroll_y_offset) /
-                max(1, self.usual_entry_height))
+        # Draw visible items:
         cx = border_size
         cy = border_size
-        entry_id = -1 + skip_start_items
-        for entry in self._entries[skip_start_items:]:
-            entry_id += 1
+        entry_id = self._height_index.find(max(0,
+            round(self.scroll_y_offset) -
+            math.ceil(self._top_extra_drawing_space)))
+        while entry_id >= 0 and entry_id < self._entry_count():
+            self._measure_entry(entry_id)
+            entry = self._get_entry(entry_id)
+            entry.y_offset = self._entry_y_offset(entry_id)
+            if entry.y_offset - round(self.scroll_y_offset) >= \
+                    self.height:
+                break
             entry.draw(self.renderer,
                 cx,
                 cy + entry.y_offset - round(self.scroll_y_offset),
@@ -885,10 +1456,7 @@ cdef class ListBase(ScrollbarDrawingWidget):
                 entry_id == self._hover_index),
                 draw_soft_hover=(not self.render_as_menu and
                 entry_id == self.hover_index))
-            if self.fixed_one_line_entries and \
-                    entry.y_offset > self.height +\
-                    self.scroll_y_offset:
-                break
+            entry_id += 1
 
         # Draw the upper empty area if present:
         top_area_size = math.ceil(self._top_extra_drawing_space)
@@ -920,15 +1488,32 @@ cdef class ListBase(ScrollbarDrawingWidget):
         border_size = max(1, round(1.0 * self.dpi_scale))
         if not self.render_as_menu:
             border_size = 0
+        # Only look at entries that were laid out already, since getting
+        # the width of all of them means parsing all of them. If none
+        # was, use the ones that would show first:
+        cdef ListEntry entry
+        cdef long i = 0
+        cdef long count = len(self._entries)
         w = 0
-        entry_copies = []
         for entry in self._entries:
+            if entry.layout_generation != self._layout_generation:
+                continue
             w = max(w, entry.get_desired_width())
+        if w == 0:
+            while i < count and i < 50 and \
+                    i * self.usual_entry_height < max(1, self.height):
+                entry = self._entries[i]
+                self._sync_entry_style(entry)
+                w = max(w, entry.get_desired_width())
+                i += 1
         w = max(w, round(12 * self.dpi_scale)) + border_size * 2
         self.cached_natural_width = w
         return w
 
     def get_natural_height(self, given_width=None):
+        # Measuring all entries for this would defeat the point of the
+        # height index, so this uses it as is: entries which weren't
+        # measured yet count with their estimated height.
         border_size = max(1, round(1.0 * self.dpi_scale))
         if not self.render_as_menu:
             border_size = 0
@@ -938,26 +1523,16 @@ cdef class ListBase(ScrollbarDrawingWidget):
                 max(12 * self.dpi_scale,
                     round(self.usual_entry_height *
                           len(self._entries))) + border_size * 2
-        h = math.ceil(self._top_extra_drawing_space)
-        if given_width != None:
-            h = 0
-            entry_width = given_width - round(border_size * 2)
-            entry_copies = []
-            for entry in self._entries:
-                entry_copies.append(entry.copy())
-                entry_copies[-1].max_width = entry_width
-                entry_copies[-1].width = entry_width
-                h += entry_copies[-1].height
-        else:
-            for entry in self._entries:
-                h += entry.height
-        return max(h, round(12 * self.dpi_scale)) + border_size * 2
+        self._update_height_index()
+        return max(round(12 * self.dpi_scale),
+            self._height_index.total +
+            math.ceil(self._top_extra_drawing_space)) + border_size * 2
 
     @property
     def entries(self):
         l = []
         for entry in self._entries:
-            l.append(entry.text_obj.html)
+            l.append(entry.html)
         return l
 
     def modify_side_html(self, index, new_html=None, new_html_scale=None):
@@ -1001,16 +1576,45 @@ cdef class ListBase(ScrollbarDrawingWidget):
         self._entries.insert(index, ListEntry(html_text, self.style,
             with_visible_bg=(not self.render_as_menu),
             override_dpi_scale=self.dpi_scale))
+        self._height_index.insert(index, self._estimated_entry_height())
+        if self._search_index is not None:
+            self._search_index.insert(index, html_text)
         i = 0
         while i < len(self._entries):
             self._entries[i].is_alternating = \
-                (((i + 1) % 0) == 0)
+                (((i + 1) % 2) == 0)
             self._entries[i].clear_texture()
             i += 1
         self.cached_natural_width = None
         self.needs_relayout = True  # to update entry y offset
         self.needs_redraw = True
 
+    def remove(self, index):
+        if index < 0:
+            index += len(self._entries)
+        if index < 0 or index >= len(self._entries):
+            raise IndexError("list entry index out of range")
+        del self._entries[index]
+        values = self._height_index.values
+        del values[index]
+        self._height_index.rebuild(values)
+        if self._search_index is not None:
+            self._search_index.remove(index)
+        i = index
+        while i < len(self._entries):
+            self._entries[i].is_alternating = \
+                (((i + 1) % 2) == 0)
+            self._entries[i].clear_texture()
+            i += 1
+        if self._selected_index == index:
+            self._selected_index = -1
+        elif self._selected_index > index:
+            self._selected_index -= 1
+        self._hover_index = -1
+        self.cached_natural_width = None
+        self.needs_relayout = True  # to update entry y offset
+        self.needs_redraw = True
+
     def add(self, text, side_text=None, subtitle=None,
             side_icon=None,
             side_icon_width=40,
@@ -1046,6 +1650,8 @@ cdef class ListBase(ScrollbarDrawingWidget):
         if len(self._entries) > 0 and \
                 not self._entries[-1].is_alternating:
             last_was_alternating = False
+        if self._search_index is not None:
+            self._search_index.insert(len(self._entries), html)
         self._entries.append(ListEntry(html, self.style,
             is_alternating=(not last_was_alternating),
             extra_html_at_right=side_html,
@@ -1057,6 +1663,93 @@ cdef class ListBase(ScrollbarDrawingWidget):
             side_icon=side_icon,
             side_icon_with_text_color=side_icon_with_text_color,
             ))
+        self._height_index.append(self._estimated_entry_height())
+
+    def extend(self, texts, side_texts=None, subtitles=None):
+        """ Add many plain text entries at once. This is a lot faster
+            than calling add() for each of them, since the list is only
+            relayouted once.
+
+            If given, side_texts and subtitles must be lists of the
+            same length as texts, with None for entries without one.
+        """
+        def escape_all(l):
+            if l is None:
+                return None
+            return [(html.escape(t) if t is not None else None)
+                for t in l]
+        self.extend_html(escape_all(texts),
+            side_htmls=escape_all(side_texts),
+            subtitle_htmls=escape_all(subtitles))
+
+    def extend_html(self, html_entries,
+            side_htmls=None, subtitle_htmls=None):
+        """ Like extend(), but with HTML entries. """
+        html_entries = list(html_entries)
+        if side_htmls is not None:
+            side_htmls = list(side_htmls)
+            if len(side_htmls) != len(html_entries):
+                raise ValueError("side_htmls must have the same " +
+                    "length as the list of entries")
+        if subtitle_htmls is not None:
+            subtitle_htmls = list(subtitle_htmls)
+            if len(subtitle_htmls) != len(html_entries):
+                raise ValueError("subtitle_htmls must have the same " +
+                    "length as the list of entries")
+            if self.fixed_one_line_entries and \
+                    len([t for t in subtitle_htmls if t is not None]) > 0:
+                raise ValueError("cannot use subtitle when list is " +
+                    "forced to simple one-line entries")
+        self._append_entries(html_entries, side_htmls, subtitle_htmls)
+
+    def set_entries(self, texts, side_texts=None, subtitles=None):
+        """ Replace all entries with the given plain text entries.
+            See extend() for the parameters.
+        """
+        self.clear()
+        self.extend(texts, side_texts=side_texts, subtitles=subtitles)
+
+    def set_entries_html(self, html_entries,
+            side_htmls=None, subtitle_htmls=None):
+        """ Replace all entries with the given HTML entries. """
+        self.clear()
+        self.extend_html(html_entries, side_htmls=side_htmls,
+            subtitle_htmls=subtitle_htmls)
+
+    cdef _append_entries(self, list html_entries, list side_htmls,
+            list subtitle_htmls):
+        cdef long i = 0
+        cdef long count = len(html_entries)
+        if count == 0:
+            return
+        style = self.style
+        dpi_scale = self.dpi_scale
+        last_was_alternating = True
+        if len(self._entries) > 0 and \
+                not self._entries[-1].is_alternating:
+            last_was_alternating = False
+        new_entries = []
+        while i < count:
+            last_was_alternating = not last_was_alternating
+            new_entries.append(ListEntry(html_entries[i], style,
+                is_alternating=last_was_alternating,
+                extra_html_at_right=(side_htmls[i]
+                    if side_htmls is not None else None),
+                extra_html_as_subtitle=(subtitle_htmls[i]
+                    if subtitle_htmls is not None else None),
+                with_visible_bg=(not self.render_as_menu),
+                override_dpi_scale=dpi_scale,
+                ))
+            if self._search_index is not None:
+                self._search_index.insert(len(self._entries) + i,
+                    html_entries[i])
+            i += 1
+        self._entries.extend(new_entries)
+        self._height_index.rebuild(self._height_index.values +
+            [self._estimated_entry_height()] * count)
+        self.cached_natural_width = None
+        self.needs_relayout = True  # to update entry y offset
+        self.needs_redraw = True
 
 
 cdef class List(ListBase):
@@ -1072,3 +1765,326 @@ cdef class List(ListBase):
             _internal_top_extra_drawing_space=\
                 _internal_top_extra_drawing_space
             )
+
+
+# Models with more rows than this aren't asked for row_height_hint(),
+# since that needs a call for every single row:
+cdef long _max_row_height_hints = 10000
+
+
+class ListModel(object):
+    """ Base class for the data model of a ModelList. Subclasses must
+        implement row_count() and row_html(), and call the notify_*
+        functions whenever the data changes.
+    """
+
+    def __init__(self):
+        self._listeners = []
+
+    def row_count(self):
+        raise NotImplementedError("row_count() not implemented")
+
+    def row_html(self, index):
+        raise NotImplementedError("row_html() not implemented")
+
+    def row_side_html(self, index):
+        return None
+
+    def row_disabled(self, index):
+        return False
+
+    def row_height_hint(self, index):
+        """ Optional: the expected height of the given row in pixels at
+            a DPI scale of 1.0, or None if unknown. This is used until
+            the row is actually laid out.
+
+            Hints are queried for every row whenever the list needs to
+            estimate its heights again (e.g. after a width change), so
+            they are ignored for models with more than 10000 rows.
+        """
+        return None
+
+    def find_prefix(self, prefix, start_index):
+        """ Optional: the index of the first row at or after start_index
+            whose plain text starts with the given prefix, ignoring
+            case, wrapping around to the start, or -1 if none matches.
+            Returns None if unsupported, which disables type-ahead in
+            the ModelList.
+        """
+        return None
+
+    def filter(self, query):
+        """ Optional: the indexes of all rows whose plain text contains
+            the given query, ignoring case, or None if unsupported.
+        """
+        return None
+
+    def add_listener(self, func):
+        self._listeners.append(func)
+
+    def remove_listener(self, func):
+        self._listeners = [f for f in self._listeners if f is not func]
+
+    def _notify(self, change, index, count):
+        for func in list(self._listeners):
+            func(change, index, count)
+
+    def notify_rows_changed(self, index, count=1):
+        self._notify("changed", index, count)
+
+    def notify_rows_inserted(self, index, count=1):
+        self._notify("inserted", index, count)
+
+    def notify_rows_removed(self, index, count=1):
+        self._notify("removed", index, count)
+
+    def notify_reset(self):
+        self._notify("reset", 0, 0)
+
+
+cdef class ModelList(ListBase):
+    """ A list showing the rows of a ListModel. Only the visible rows
+        are ever materialized as ListEntry objects, and these are
+        recycled while scrolling, so the model can be huge.
+
+        MEMBERS IN list.pxd
+    """
+
+    def __init__(self,
+            model=None,
+            fixed_one_line_entries=False,
+            triggered_by_single_click=False,
+            ):
+        self._model = None
+        self._model_listener = None
+        self._row_count = 0
+        self._entry_cache = dict()
+        self._entry_pool = []
+        super().__init__(
+            render_as_menu=False,
+            fixed_one_line_entries=fixed_one_line_entries,
+            triggered_by_single_click=triggered_by_single_click,
+            )
+        if model is not None:
+            self.set_model(model)
+
+    @property
+    def model(self):
+        return self._model
+
+    def set_model(self, model):
+        if self._model is not None:
+            self._model.remove_listener(self._model_listener)
+            self._model_listener = None
+        self._model = model
+        if model is not None:
+            self_ref = weakref.ref(self)
+            def model_changed(change, index, count):
+                list_widget = self_ref()
+                if list_widget is not None:
+                    list_widget.model_changed(change, index, count)
+            self._model_listener = model_changed
+            model.add_listener(model_changed)
+        self.model_changed("reset", 0, 0)
+
+    def model_changed(self, change, index, count):
+        cdef long i
+        if change == "changed":
+            i = index
+            while i < index + count:
+                self._recycle_entry(i)
+                i += 1
+        elif change == "inserted" or change == "removed":
+            if change == "removed":
+                count = -count
+                i = index
+                while i < index - count:
+                    self._recycle_entry(i)
+                    i += 1
+            # Move cached entries and the selection along:
+            new_cache = dict()
+            for i, entry in self._entry_cache.items():
+                if i >= index:
+                    new_cache[i + count] = entry
+                else:
+                    new_cache[i] = entry
+            self._entry_cache = new_cache
+            if count < 0 and self._selected_index >= index and \
+                    self._selected_index < index - count:
+                # The selected row itself is gone:
+                self._selected_index = -1
+            elif self._selected_index >= index:
+                self._selected_index += count
+            if self._hover_index >= index:
+                self._hover_index = -1
+            values = self._height_index.values
+            if count > 0:
+                values[index:index] = \
+                    [self._estimated_entry_height()] * count
+            else:
+                del values[index:index - count]
+            self._height_index.rebuild(values)
+            self._row_count += count
+        else:
+            for i in list(self._entry_cache):
+                self._recycle_entry(i)
+            self._row_count = (self._model.row_count()
+                if self._model is not None else 0)
+            self._selected_index = -1
+            self._hover_index = -1
+            self.scroll_y_offset = 0
+            # Force a rebuild of the height index:
+            self._entry_width = -1
+            self._update_height_index()
+        self.cached_natural_width = None
+        self.needs_redraw = True
+
+    cdef long _entry_count(self):
+        return self._row_count
+
+    def filter(self, query):
+        """ Returns the indexes of all rows whose plain text contains
+            the given query, ignoring case. Searching all rows is up to
+            the model, see ListModel.filter().
+        """
+        result = (self._model.filter(query)
+            if self._model is not None else [])
+        if result is None:
+            raise TypeError("the model of this ModelList " +
+                "doesn't support filter()")
+        return result
+
+    def find_prefix(self, prefix, start_index=0):
+        """ Like ListBase.find_prefix(), but asks the model, since the
+            rows aren't all available as entries. If the model doesn't
+            implement ListModel.find_prefix(), nothing is ever found.
+        """
+        if self._model is None:
+            return -1
+        result = self._model.find_prefix(prefix, start_index)
+        if result is None:
+            return -1
+        return result
+
+    cdef ListEntry _get_entry(self, long index):
+        cdef ListEntry entry
+        if index in self._entry_cache:
+            return self._entry_cache[index]
+        html_text = self._model.row_html(index)
+        side_html = self._model.row_side_html(index)
+        if len(self._entry_pool) > 0:
+            entry = self._entry_pool.pop()
+            entry.set_html(html_text)
+            entry.set_side_html(side_html)
+            entry.is_alternating = ((index % 2) == 1)
+        else:
+            entry = ListEntry(html_text, self.style,
+                is_alternating=((index % 2) == 1),
+                extra_html_at_right=side_html,
+                with_visible_bg=True,
+                override_dpi_scale=self.dpi_scale)
+        entry.disabled = (self._model.row_disabled(index) is True)
+        self._entry_cache[index] = entry
+        return entry
+
+    cdef int _is_entry_disabled(self, long index):
+        return (self._model.row_disabled(index) is True)
+
+    cdef _fill_height_index(self):
+        cdef long i = 0
+        estimate = self._estimated_entry_height()
+        self._height_index.fill(self._row_count, estimate)
+        if self._model is None or self.fixed_one_line_entries or \
+                self._row_count > _max_row_height_hints or \
+                type(self._model).row_height_hint is \
+                ListModel.row_height_hint:
+            return
+        heights = []
+        while i < self._row_count:
+            hint = self._model.row_height_hint(i)
+            heights.append(estimate if hint is None else
+                max(1, round(hint * self.dpi_scale)))
+            i += 1
+        self._height_index.rebuild(heights)
+
+    cdef _recycle_entry(self, long index):
+        cdef ListEntry entry = self._entry_cache.pop(index, None)
+        if entry is None:
+            return
+        entry.clear_texture()
+        entry.layout_generation = -1
+        if len(self._entry_pool) < 64:
+            self._entry_pool.append(entry)
+
+    cdef _recycle_invisible_entries(self):
+        cdef long first, last
+        if len(self._entry_cache) == 0:
+            return
+        margin = max(self.height // 2, self.usual_entry_height)
+        view_start = self.scroll_y_offset -\
+            math.ceil(self._top_extra_drawing_space)
+        first = self._height_index.find(max(0, view_start - margin))
+        last = self._height_index.find(max(0,
+            view_start + self.height + margin))
+        for i in list(self._entry_cache):
+            if (i < first or i > last) and i != self._selected_index:
+                self._recycle_entry(i)
+
+    def on_redraw(self):
+        super().on_redraw()
+        self._recycle_invisible_entries()
+
+    def renderer_update(self):
+        super().renderer_update()
+        for entry in self._entry_cache.values():
+            entry.clear_texture()
+
+    def get_natural_width(self):
+        if self.cached_natural_width != None:
+            return self.cached_natural_width
+        w = 0
+        for entry in self._entry_cache.values():
+            self._sync_entry_style(entry)
+            w = max(w, entry.get_desired_width())
+        self.cached_natural_width = max(w, round(12 * self.dpi_scale))
+        return self.cached_natural_width
+
+    def get_natural_height(self, given_width=None):
+        self._update_height_index()
+        return max(round(12 * self.dpi_scale),
+            self._height_index.total +
+            math.ceil(self._top_extra_drawing_space))
+
+    @property
+    def entries(self):
+        if self._model is None:
+            return []
+        return [self._model.row_html(i) for i in range(self._row_count)]
+
+    def _unsupported(self, *args, **kwargs):
+        raise TypeError("the rows of a ModelList can only be changed " +
+            "through its model")
+
+    def add_html(self, *args, **kwargs):
+        self._unsupported()
+
+    def insert_html(self, *args, **kwargs):
+        self._unsupported()
+
+    def extend_html(self, *args, **kwargs):
+        self._unsupported()
+
+    def remove(self, *args, **kwargs):
+        self._unsupported()
+
+    def set_disabled(self, *args, **kwargs):
+        self._unsupported()
+
+    def reorder(self, *args, **kwargs):
+        self._unsupported()
+
+    def modify_side_html(self, *args, **kwargs):
+        self._unsupported()
+
+    def modify_side_icon(self, *args, **kwargs):
+        self._unsupported()
@@ -0,0 +1,352 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018-2019 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+
+import collections
+
+from wobblui.color cimport Color
+from wobblui.font.manager cimport c_font_manager
+from wobblui.richtext cimport RichText
+from wobblui.scrollbarwidget cimport ScrollbarDrawingWidget
+from wobblui.uiconf import config
+from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
+
+cdef class _LogLine:
+    cdef str text
+    cdef object text_obj
+    cdef int height, width, layout_generation
+
+    def __init__(self, str text):
+        self.text = text
+        self.text_obj = None
+        self.height = -1
+        self.width = 0
+        self.layout_generation = -1
+
+cdef class LogView(ScrollbarDrawingWidget):
+    """ A scrollable view for output that only ever grows at the end,
+        like logs or a console. Unlike a Label, appending doesn't touch
+        the existing text: each line is laid out on its own, and only
+        when it is new or becomes visible after a resize. At most
+        max_lines lines are kept (default: the "log_view_max_lines"
+        setting), older ones are dropped from the top.
+    """
+    cdef object _lines
+    cdef long _max_lines
+    cdef long _total_height
+    cdef int _max_line_width, _layout_generation, _layouted_for_width
+    cdef int px_size, line_height
+    cdef double known_dpi_scale
+    cdef str font_family, font_family_override
+    cdef double font_px_size_override
+    cdef object _user_set_color
+    cdef public int scroll_y_offset
+
+    def __init__(self, text="", color=None, font=None, max_lines=None):
+        super().__init__()
+        self.no_mouse_events = True
+        self.type = "logview"
+        if max_lines is None:
+            max_lines = config.get("log_view_max_lines")
+        self._max_lines = max(1, int(max_lines))
+        self._lines = collections.deque()
+        self._total_height = 0
+        self._max_line_width = 0
+        self._layout_generation = 0
+        self._layouted_for_width = -1
+        self.scroll_y_offset = 0
+        self._user_set_color = color
+        self.font_family = ""
+        self.px_size = -1
+        self.known_dpi_scale = -1
+        self.set_font(font)
+        if len(text) > 0:
+            self.append_text(text)
+
+    def set_font(self, font):
+        self.font_px_size_override = (
+            font.px_size if font is not None else -1
+        )
+        self.font_family_override = (
+            font.font_family if font is not None else ""
+        )
+        self.font_size_refresh()
+
+    def font_size_refresh(self):
+        if self.font_px_size_override > 0:
+            px_size = round(self.font_px_size_override)
+        elif self.style is not None:
+            px_size = round(self.style.get("widget_text_size"))
+        else:
+            px_size = 12
+        font_family = self.font_family_override
+        if font_family == "":
+            font_family = (self.style.get("widget_font_family")
+                if self.style is not None else "Sans Serif")
+        if px_size == self.px_size and \
+                font_family == self.font_family and \
+                abs(self.dpi_scale - self.known_dpi_scale) < 0.001:
+            return
+        self.px_size = px_size
+        self.font_family = font_family
+        self.known_dpi_scale = self.dpi_scale
+        self.line_height = c_font_manager().get_font(
+            font_family, px_size=px_size
+        ).render_size(" ")[1]
+        self._invalidate_layout()
+
+    cdef _invalidate_layout(self):
+        # Lines are laid out again lazily when drawn:
+        self._layout_generation += 1
+        self.needs_relayout = True
+        self.needs_redraw = True
+
+    def on_stylechanged(self):
+        self.font_size_refresh()
+
+    @property
+    def color(self):
+        if self._user_set_color != None:
+            return self._user_set_color
+        if self.style is None:
+            return Color.black()
+        return self.style.get_color("widget_text")
+
+    @property
+    def line_count(self):
+        return len(self._lines)
+
+    @property
+    def max_lines(self):
+        return self._max_lines
+
+    @max_lines.setter
+    def max_lines(self, v):
+        self._max_lines = max(1, int(v))
+        self._trim()
+
+    def get_text(self):
+        return "\n".join([line.text for line in self._lines])
+
+    def set_text(self, text):
+        self.clear()
+        self.append_text(text)
+
+    def clear(self):
+        self._lines.clear()
+        self._total_height = 0
+        self._max_line_width = 0
+        self.scroll_y_offset = 0
+        self.needs_relayout = True
+        self.needs_redraw = True
+
+    def append_text(self, text):
+        """ Append text, starting on a new line. It may contain more
+            line breaks.
+        """
+        if text.endswith("\r\n"):
+            text = text[:-2]
+        elif text.endswith("\n"):
+            text = text[:-1]
+        for line_text in text.replace("\r\n", "\n").split("\n"):
+            self._append_line(line_text)
+        self._trim()
+        self.needs_relayout = True
+        self.needs_redraw = True
+
+    def append_line(self, line_text):
+        self.append_text(line_text)
+
+    cdef _append_line(self, str line_text):
+        cdef _LogLine line = _LogLine(line_text)
+        if self._layouted_for_width > 0:
+            self._layout_line(line)
+        else:
+            # Estimate until there's a width to lay it out for:
+            line.height = max(1, round(self.line_height * self.dpi_scale))
+        self._total_height += line.height
+        self._lines.append(line)
+
+    cdef _trim(self):
+        cdef _LogLine line
+        while len(self._lines) > self._max_lines:
+            line = self._lines.popleft()
+            self._total_height -= line.height
+            # Keep showing the same content:
+            self.scroll_y_offset = max(0,
+                self.scroll_y_offset - line.height)
+
+    cdef _layout_line(self, _LogLine line):
+        cdef int old_height = line.height
+        if line.text_obj is None or \
+                line.text_obj.px_size != self.px_size or \
+                line.text_obj.default_font_family != self.font_family or \
+                abs(line.text_obj.draw_scale - self.dpi_scale) > 0.001:
+            # (Re-)create since font changes don't apply to existing
+            # fragments:
+            line.text_obj = RichText(
+                font_family=self.font_family,
+                px_size=self.px_size,
+                draw_scale=self.dpi_scale)
+            line.text_obj.set_text(line.text if len(line.text) > 0
+                else " ")
+        (w, h) = line.text_obj.layout(
+            max_width=max(1, self._layouted_for_width))
+        line.width = w
+        line.height = max(1, h)
+        line.layout_generation = self._layout_generation
+        if old_height >= 0:
+            self._total_height += line.height - old_height
+        self._max_line_width = max(self._max_line_width, w)
+
+    def on_relayout(self):
+        self.font_size_refresh()
+        layout_width = self.width
+        if self._max_width >= 0 and self._max_width < layout_width:
+            layout_width = self._max_width
+        if layout_width != self._layouted_for_width:
+            self._layouted_for_width = layout_width
+            self._invalidate_layout()
+        self.needs_relayout = False
+
+    def scroll_down(self):
+        if self.needs_relayout:
+            self.on_relayout()
+            self.needs_relayout = False
+            if self.parent is not None:
+                self.parent.needs_relayout = True
+        # Lines at the end may still have heights from before a resize,
+        # so lay those out first to find the actual bottom:
+        self._layout_lines_from_end(self.height)
+        self.scroll_y_offset = max(0, self._total_height - self.height)
+        self.needs_redraw = True
+
+    cdef _layout_lines_from_end(self, long min_height):
+        cdef _LogLine line
+        cdef long h = 0
+        if self._layouted_for_width <= 0:
+            return
+        for line in reversed(self._lines):
+            if h >= min_height:
+                break
+            if line.layout_generation != self._layout_generation:
+                self._layout_line(line)
+            h += line.height
+
+    def output_is_scrolled_down(self):
+        if self.needs_relayout:
+            self.on_relayout()
+            self.needs_relayout = False
+            if self.parent is not None:
+                self.parent.needs_relayout = True
+        return (self.scroll_y_offset + self.height +
+            self.line_height * self.dpi_scale >= self._total_height)
+
+    cdef list _collect_visible_lines(self, int from_end):
+        # Returns (y, line) for the lines in view, laying out those that
+        # need it. Walking from the end lays out every line below the
+        # view too, so those positions are all relative to the bottom.
+        cdef _LogLine line
+        cdef long y
+        visible = []
+        if from_end:
+            y = self._total_height
+            for line in reversed(self._lines):
+                if line.layout_generation != self._layout_generation:
+                    self._layout_line(line)
+                y -= line.height
+                if y - self.scroll_y_offset >= self.height:
+                    continue
+                visible.append((y, line))
+                if y <= self.scroll_y_offset:
+                    break
+            visible.reverse()
+        else:
+            y = 0
+            for line in self._lines:
+                if y - self.scroll_y_offset >= self.height:
+                    break
+                if y + line.height <= self.scroll_y_offset:
+                    y += line.height
+                    continue
+                if line.layout_generation != self._layout_generation:
+                    self._layout_line(line)
+                visible.append((y, line))
+                y += line.height
+        return visible
+
+    cdef _clamp_scroll(self):
+        cdef long max_scroll_down = max(0, self._total_height - self.height)
+        self.no_mouse_events = (max_scroll_down <= 0)
+        self.scroll_y_offset = max(0, min(max_scroll_down,
+            self.scroll_y_offset))
+
+    def do_redraw(self):
+        cdef long old_total, delta
+        cdef int i = 0
+        cdef int from_end
+        self._clamp_scroll()
+        cdef int at_bottom = (self.scroll_y_offset >=
+            self._total_height - self.height)
+
+        # Collect visible lines, walking from whichever end of the
+        # buffer is closer. Laying them out after a resize may change
+        # their heights, so repeat until positions are stable (which
+        # takes one more walk, since laid out lines don't change again):
+        while True:
+            old_total = self._total_height
+            from_end = (self.scroll_y_offset > self._total_height // 2)
+            visible = self._collect_visible_lines(from_end)
+            delta = self._total_height - old_total
+            i += 1
+            if delta == 0 or i >= 3:
+                break
+            if at_bottom:
+                self.scroll_y_offset = self._total_height - self.height
+            elif from_end:
+                # Keep the same content in view:
+                self.scroll_y_offset += delta
+            self._clamp_scroll()
+
+        # Draw them:
+        color = self.color
+        for (y, line) in visible:
+            for fragment in line.text_obj.fragments:
+                fragment.draw(self.renderer,
+                    fragment.x, fragment.y + y - self.scroll_y_offset,
+                    color=color, draw_scale=self.dpi_scale)
+
+        # Draw scrollbar:
+        self.draw_scrollbar(self._total_height, self.height,
+            self.scroll_y_offset)
+
+    def on_mousewheel(self, mouse_id, x, y):
+        self.scroll_y_offset = max(0,
+            self.scroll_y_offset -
+            round(y * 50.0 * self.dpi_scale))
+        self.needs_redraw = True
+
+    def get_natural_width(self):
+        return self._max_line_width
+
+    def get_natural_height(self, given_width=None):
+        return self._total_height
@@ -71,9 +71,9 @@ cdef class MenuSeparator(ListEntry):
             dpi_scale = self.style.dpi_scale
         c = Color((0, 0, 0))
         if self.style != None:
-            c = Color(self.style.get("widget_text"))
+            c = self.style.get_color("widget_text")
             if self.style.has("widget_disabled_text"):
-                c = Color(self.style.get("widget_disabled_text"))
+                c = self.style.get_color("widget_disabled_text")
         draw_w = (round(self.width) - round(self.padding_horizontal
             * dpi_scale) * 2)
         draw_h = max(1, round(self.line_thickness * dpi_scale))
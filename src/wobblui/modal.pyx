@@ -60,7 +60,7 @@ cdef class ModalBox(CenterBox):
             c = Color.white()
             if self.style is not None and \
                     self.style.has("modal_dialog_bg"):
-                c = Color(self.style.get("modal_dialog_bg"))
+                c = self.style.get_color("modal_dialog_bg")
             draw_rectangle(
                 renderer,
                 0, 0, self.width, self.height,
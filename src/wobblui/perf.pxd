@@ -20,6 +20,24 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+cdef struct PerfRecord:
+    int name_id
+    double start
+    double end
+    long thread_id
+
+cdef class _PerfHistogram:
+    """ SEE perf.pyx FOR CLASS METHODS & DOCUMENTATION """
+
+    cdef long long buckets[256]
+    cdef long long count
+    cdef double total, max
+    cdef list recent
+    cdef int recent_pos
+
+    cdef void add(self, double now, double duration)
+    cdef double percentile(self, double fraction)
+
 cdef class _PerfClass:
     """ SEE perf.pyx FOR CLASS METHODS & DOCUMENTATION """
 
@@ -27,6 +45,15 @@ cdef class _PerfClass:
     cdef object perf_measurements
     cdef long perf_id
     cdef object lock
+    cdef bint _tracing
+    cdef dict name_ids
+    cdef list names
+    cdef dict counters
+    cdef PerfRecord *ring
+    cdef long ring_size, ring_pos, ring_count
+
+    cdef int _name_id(self, str name)
+    cdef void _record(self, str name, double start_time, double end_time)
 
 cdef object CPerf
 
@@ -20,36 +20,212 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
-import copy
+from cpython.pythread cimport PyThread_get_thread_ident
+from libc.math cimport ceil, log2, pow
+from libc.stdlib cimport free, malloc
+from libc.string cimport memset
+
+import json
+import os
 import threading
 import time
 
 from wobblui.uiconf import config
-from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
+from wobblui.woblog cimport is_enabled, LOG_DEBUG, \
+    logdebug, logerror, loginfo, logwarning
+
+DEF HISTOGRAM_SUBSTEPS = 8
+DEF HISTOGRAM_BUCKETS = 256
+DEF RECENT_SAMPLES = 40
+
+cdef class _PerfHistogram:
+    """ A streaming, log-bucketed histogram of durations for one perf
+        name. Each power of two (in microseconds) is split into 8
+        buckets, so percentiles are accurate to roughly 5% no matter
+        how many samples were recorded.
+
+        MEMBERS IN perf.pxd
+    """
+
+    def __cinit__(self):
+        memset(self.buckets, 0, sizeof(self.buckets))
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = list()
+        self.recent_pos = 0
+
+    cdef void add(self, double now, double duration):
+        cdef double us = duration * 1000000.0
+        cdef int bucket = 0
+        if us >= 1.0:
+            bucket = 1 + <int>(log2(us) * HISTOGRAM_SUBSTEPS)
+            if bucket >= HISTOGRAM_BUCKETS:
+                bucket = HISTOGRAM_BUCKETS - 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += duration
+        if duration > self.max:
+            self.max = duration
+
+        # Keep the most recent raw samples around for values():
+        if len(self.recent) < RECENT_SAMPLES:
+            self.recent.append((now, duration))
+        else:
+            self.recent[self.recent_pos] = (now, duration)
+            self.recent_pos = (self.recent_pos + 1) % RECENT_SAMPLES
+
+    cdef double percentile(self, double fraction):
+        """ Returns the approximate duration in seconds below which the
+            given fraction of all samples lies.
+        """
+        if self.count == 0:
+            return 0.0
+        cdef long long rank = <long long>ceil(fraction * self.count)
+        if rank < 1:
+            rank = 1
+        cdef long long seen = 0
+        cdef int i = 0
+        cdef double result
+        while i < HISTOGRAM_BUCKETS:
+            seen += self.buckets[i]
+            if seen >= rank:
+                if i == 0:
+                    result = 0.0000005
+                else:
+                    # Geometric middle of the bucket:
+                    result = pow(2.0, (i - 0.5) / HISTOGRAM_SUBSTEPS) /\
+                        1000000.0
+                return min(result, self.max)
+            i += 1
+        return self.max
+
+    def recent_values(self):
+        return (self.recent[self.recent_pos:] +
+            self.recent[:self.recent_pos])
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": (self.total / self.count if self.count > 0 else 0.0),
+            "p50": self.percentile(0.50),
+            "p95": self.percentile(0.95),
+            "p99": self.percentile(0.99),
+            "max": self.max,
+        }
 
 cdef class _PerfClass(object):
     """ The class implementing the global singleton performance tracker.
         This is used by wobblui internally to track performance for
         advanced profiling.
 
+        By default, almost nothing is recorded: start() and stop() bail
+        out right away unless tracing was turned on with
+        set_tracing_enabled(), or the "perf_debug" config option is set.
+        With tracing on, every measurement goes into a preallocated
+        ring buffer (for export_chrome_trace()) and into a per-name
+        histogram (for percentiles()).
+
         (Meant for internal use, but you can report your own perf events
         with this if you want. However, they'll be part of the extensive
         performance output wobblui uses internally, there is no way to
         separate it nicely at this point)
     """
 
+    def __cinit__(self):
+        self.ring = NULL
+        self.ring_size = 0
+        self.ring_pos = 0
+        self.ring_count = 0
+
+    def __dealloc__(self):
+        if self.ring != NULL:
+            free(self.ring)
+            self.ring = NULL
+
     def __init__(self):
         self.perf_start_times = dict()
         self.perf_measurements = dict()
         self.perf_id = 0
         self.lock = threading.Lock()
+        self._tracing = False
+        self.name_ids = dict()
+        self.names = list()
+        self.counters = dict()
+
+    @property
+    def tracing_enabled(self):
+        return self._tracing
+
+    def set_tracing_enabled(self, enabled, buffer_size=16384):
+        """ Turn recording into the trace ring buffer and the histograms
+            on or off. The ring buffer is allocated on first use and
+            keeps the last buffer_size measurements.
+        """
+        cdef long new_size = max(1, int(buffer_size))
+        self.lock.acquire()
+        try:
+            if enabled and (self.ring == NULL or
+                    self.ring_size != new_size):
+                if self.ring != NULL:
+                    free(self.ring)
+                    self.ring = NULL
+                self.ring = <PerfRecord*>malloc(
+                    sizeof(PerfRecord) * new_size)
+                if self.ring == NULL:
+                    raise MemoryError("failed to allocate perf ring buffer")
+                self.ring_size = new_size
+                self.ring_pos = 0
+                self.ring_count = 0
+            self._tracing = bool(enabled)
+        finally:
+            self.lock.release()
+
+    def reset(self):
+        """ Drop all recorded histograms and trace records. """
+        self.lock.acquire()
+        try:
+            self.perf_measurements = dict()
+            self.ring_pos = 0
+            self.ring_count = 0
+        finally:
+            self.lock.release()
+
+    cdef int _name_id(self, str name):
+        name_id = self.name_ids.get(name)
+        if name_id is None:
+            name_id = len(self.names)
+            self.names.append(name)
+            self.name_ids[name] = name_id
+        return name_id
+
+    cdef void _record(self, str name, double start_time, double end_time):
+        # Note: this runs with the GIL held and without calling back
+        # into arbitrary python code, so it doesn't need self.lock.
+        cdef PerfRecord *record
+        histogram = self.perf_measurements.get(name)
+        if histogram is None:
+            histogram = _PerfHistogram()
+            self.perf_measurements[name] = histogram
+        (<_PerfHistogram>histogram).add(end_time, end_time - start_time)
+        if not self._tracing or self.ring == NULL:
+            return
+        record = &self.ring[self.ring_pos]
+        record.name_id = self._name_id(name)
+        record.start = start_time
+        record.end = end_time
+        record.thread_id = <long>PyThread_get_thread_ident()
+        self.ring_pos = (self.ring_pos + 1) % self.ring_size
+        if self.ring_count < self.ring_size:
+            self.ring_count += 1
 
     def start(self, str name):
+        if not self._tracing and not config.get("perf_debug"):
+            return ""
         return self._start_do(name, type="normal")
 
     def _start_do(self, str name, str type="normal", chain_step_name=None):
         now = time.monotonic()
-        self.lock.acquire()
         if type == "normal":
             self.perf_id += 1
             perf_id = str(self.perf_id)
@@ -66,41 +242,50 @@ cdef class _PerfClass(object):
                 (chain_step_name, now))
         else:
             raise RuntimeError("unknown perf type: " + str(type))
-        self.lock.release()
         return perf_id
 
     def chain(self, str chain_name, step_name=None):
+        if not self._tracing and not config.get("perf_debug"):
+            return "chain_" + chain_name
         return self._start_do(chain_name,
             type="chain", chain_step_name=step_name)
 
     def stop(self, str perf_id, debug=None, expected_max_duration=None,
             do_print=False):
         global config
+        if len(perf_id) == 0:
+            # Measurement was started while tracing was off.
+            return
         cdef double now = time.monotonic()
-        self.lock.acquire()
-        if not perf_id in self.perf_start_times:
-            if "chain_" + perf_id in self.perf_start_times:
+        perf_info = self.perf_start_times.pop(perf_id, None)
+        if perf_info is None:
+            perf_info = self.perf_start_times.get("chain_" + perf_id)
+            if perf_info is not None:
                 perf_id = "chain_" + perf_id
-            else:
+            elif perf_id.isdigit():
                 raise ValueError("invalid perf id")
+            else:
+                # Chain that was started while tracing was off.
+                return
         is_chain = False
-        if self.perf_start_times[perf_id][0] == "normal":
-            start_time = self.perf_start_times[perf_id][2]
-        elif self.perf_start_times[perf_id][0] == "chain":
+        if perf_info[0] == "normal":
+            start_time = perf_info[2]
+        elif perf_info[0] == "chain":
             is_chain = True
-            start_time = self.perf_start_times[perf_id][2][0][1]
+            start_time = perf_info[2][0][1]
         else:
             raise RuntimeError("unexpected perf type")
-        perf_name = self.perf_start_times[perf_id][1]
+        perf_name = perf_info[1]
         duration = now - start_time
-        if not perf_name in self.perf_measurements:
-            self.perf_measurements[perf_name] = list()
-        self.perf_measurements[perf_name].append((now, duration))
-        if len(self.perf_measurements[perf_name]) > 40:
-            self.perf_measurements[perf_name] = \
-                self.perf_measurements[perf_name][20:]
-        self.lock.release()
-        if config.get("perf_debug") or do_print:
+        self._record(perf_name, start_time, now)
+        if is_chain:
+            i = 1
+            while i < len(perf_info[2]):
+                self._record(perf_name + ":" + str(perf_info[2][i][0]),
+                    perf_info[2][i - 1][1], perf_info[2][i][1])
+                i += 1
+        if is_enabled(LOG_DEBUG) and \
+                (config.get("perf_debug") or do_print):
             note = "" 
             if expected_max_duration != None:
                 if (duration < expected_max_duration):
@@ -108,19 +293,17 @@ cdef class _PerfClass(object):
                 note = "[SLOW]"
             v = str(round(duration * 1000000.0) / 1000.0)
             if not is_chain:
-                logdebug("perf: " +
-                    str(perf_name) + note + " -> " +
-                    v + "ms" + ("" if (debug is None
-                    or len(str(debug)) == 0) else "  " + str(debug))
-                    )
+                logdebug("perf: %s%s -> %sms%s", (perf_name, note, v,
+                    ("" if (debug is None
+                    or len(str(debug)) == 0) else "  " + str(debug))))
             else:
                 t = "perf[CHAIN]: " +\
                     str(perf_name) + note + " -> "
                 i = 1
-                while i < len(self.perf_start_times[perf_id][2]):
-                    time_diff = (self.perf_start_times[perf_id][2][i][1] -
-                        self.perf_start_times[perf_id][2][i - 1][1])
-                    step_name = self.perf_start_times[perf_id][2][i][0]
+                while i < len(perf_info[2]):
+                    time_diff = (perf_info[2][i][1] -
+                        perf_info[2][i - 1][1])
+                    step_name = perf_info[2][i][0]
                     t += str(step_name) + ":" +\
                         str(round(time_diff * 1000000.0) / 1000.0) + "ms "
                     i += 1
@@ -128,19 +311,83 @@ cdef class _PerfClass(object):
                     or len(str(debug)) == 0) else "  " + str(debug))
                 logdebug(t)
 
+    def count(self, str name, amount=1):
+        """ Add the given amount to a named counter. Unlike start() and
+            stop(), counting is always on since it's just a dict update.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def counter(self, str name):
+        return self.counters.get(name, 0)
+
     def values(self, name, startswith=False):
-        self.lock.acquire()
+        """ Returns the most recent raw (time, duration) measurements
+            for the given perf name, or all names starting with it.
+        """
         measurements = dict()
-        for pname in self.perf_measurements:
+        for pname in list(self.perf_measurements):
             if pname == name or (startswith and
                     pname.startswith(name)):
-                measurements[pname] = copy.copy(
-                    self.perf_measurements[pname])
-        self.lock.release()
+                measurements[pname] = \
+                    self.perf_measurements[pname].recent_values()
         return measurements
 
+    def percentiles(self, name=None, startswith=False):
+        """ Returns a dict mapping each matching perf name to a dict with
+            "count", "mean", "p50", "p95", "p99" and "max" (in seconds).
+            If name is None, all recorded names are returned.
+        """
+        result = dict()
+        for pname in list(self.perf_measurements):
+            if name is None or pname == name or (startswith and
+                    pname.startswith(name)):
+                result[pname] = self.perf_measurements[pname].summary()
+        return result
+
+    def export_chrome_trace(self, path=None, last_seconds=None):
+        """ Returns the recorded trace as Chrome/Perfetto trace event
+            JSON, and writes it to the given file path if one is given.
+            Only records from the ring buffer are included, optionally
+            limited to the last given amount of seconds.
+
+            Load the result in chrome://tracing or ui.perfetto.dev
+        """
+        cdef long i, idx
+        cdef PerfRecord record
+        cdef double cutoff = -1.0
+        if last_seconds is not None:
+            cutoff = time.monotonic() - float(last_seconds)
+        pid = os.getpid()
+        events = list()
+        self.lock.acquire()
+        try:
+            i = 0
+            while i < self.ring_count:
+                idx = (self.ring_pos - self.ring_count + i +
+                    self.ring_size) % self.ring_size
+                record = self.ring[idx]
+                i += 1
+                if record.end < cutoff:
+                    continue
+                events.append({
+                    "name": self.names[record.name_id],
+                    "cat": "wobblui",
+                    "ph": "X",
+                    "ts": record.start * 1000000.0,
+                    "dur": (record.end - record.start) * 1000000.0,
+                    "pid": pid,
+                    "tid": record.thread_id,
+                })
+        finally:
+            self.lock.release()
+        result = json.dumps({"traceEvents": events,
+            "displayTimeUnit": "ms"})
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(result)
+        return result
+
 CPerf = _PerfClass()
 
 # Python non-cdef global:
 Perf = CPerf
-
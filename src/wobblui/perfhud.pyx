@@ -0,0 +1,125 @@
+#cython: language_level=3
+
+'''
+wobblui - Copyright 2018 wobblui team, see AUTHORS.md
+
+This software is provided 'as-is', without any express or implied
+warranty. In no event will the authors be held liable for any damages
+arising from the use of this software.
+
+Permission is granted to anyone to use this software for any purpose,
+including commercial applications, and to alter it and redistribute it
+freely, subject to the following restrictions:
+
+1. The origin of this software must not be misrepresented; you must not
+   claim that you wrote the original software. If you use this software
+   in a product, an acknowledgment in the product documentation would be
+   appreciated but is not required.
+2. Altered source versions must be plainly marked as such, and must not be
+   misrepresented as being the original software.
+3. This notice may not be removed or altered from any source distribution.
+'''
+
+import time
+import weakref
+
+from wobblui.color cimport Color
+from wobblui.gfx cimport draw_font, draw_rectangle, get_draw_font_size
+from wobblui.perf cimport CPerf as Perf
+import wobblui.texture
+from wobblui.timer import schedule
+from wobblui.uiconf import config
+
+cdef class PerfHUD:
+    """ The on-screen performance overlay drawn on top of a window when
+        the "perf_hud" config option is set (see toggle_perf_hud() in
+        wobblui.window).
+        It shows the stats of the previous frame, since the current one
+        is still being drawn.
+
+        MEMBERS IN perfhud.pxd
+    """
+
+    def __init__(self, window):
+        self.window_ref = weakref.ref(window)
+        self.frame_times = list()
+        self.last_frame_duration = 0.0
+        self.last_counters = dict()
+        self.frame_counters = dict()
+        self.refresh_scheduled = False
+
+    def frame_done(self, double duration):
+        """ Called by the window after each completed redraw. """
+        now = time.monotonic()
+        self.last_frame_duration = duration
+        self.frame_times.append(now)
+        while len(self.frame_times) > 0 and \
+                self.frame_times[0] < now - 1.0:
+            self.frame_times.pop(0)
+
+        # Remember what happened since the previous frame:
+        for name in ["widget_relayout", "widget_redraw",
+                "event_loop_sleep"]:
+            value = Perf.counter(name)
+            self.frame_counters[name] = value -\
+                self.last_counters.get(name, 0)
+            self.last_counters[name] = value
+
+        # Make sure the numbers keep updating when the UI is idle:
+        if not self.refresh_scheduled:
+            self.refresh_scheduled = True
+            window_ref = self.window_ref
+            hud = self
+            def refresh():
+                hud.refresh_scheduled = False
+                w = window_ref()
+                if w is not None and not w.is_closed and \
+                        config.get("perf_hud"):
+                    w.needs_redraw = True
+            schedule(refresh, 0.5)
+
+    def hit_rate_text(self, str cache_name):
+        hits = Perf.counter(cache_name + "_hit")
+        misses = Perf.counter(cache_name + "_miss")
+        if hits + misses == 0:
+            return "-"
+        return str(round(100.0 * hits / (hits + misses))) + "%"
+
+    def get_lines(self):
+        return [
+            "frame: " + str(round(
+                self.last_frame_duration * 1000.0, 1)) + "ms  fps: " +
+                str(len(self.frame_times)),
+            "loop sleep: " + str(round(
+                self.frame_counters.get("event_loop_sleep", 0) * 1000.0)) +
+                "ms",
+            "relayouts: " + str(
+                self.frame_counters.get("widget_relayout", 0)) +
+                "  redraws: " + str(
+                self.frame_counters.get("widget_redraw", 0)),
+            "textures: " + str(wobblui.texture.sdl_tex_count),
+            "fonts: " + self.hit_rate_text("font_cache") +
+                "  size: " + self.hit_rate_text("render_size_cache") +
+                "  words: " + self.hit_rate_text("rendered_words_cache"),
+        ]
+
+    def draw(self):
+        w = self.window_ref()
+        if w is None or w.renderer is None:
+            return
+        cdef int px_size = max(8, round(11 * w.dpi_scale))
+        cdef int padding = max(1, round(4 * w.dpi_scale))
+        lines = self.get_lines()
+        sizes = [get_draw_font_size(line, px_size=px_size)
+            for line in lines]
+        cdef int width = max([size[0] for size in sizes]) + padding * 2
+        cdef int height = sum([size[1] for size in sizes]) + padding * 2
+        draw_rectangle(w.renderer, 0, 0, width, height,
+            color=Color.black(), alpha=0.7)
+        cdef int y = padding
+        cdef int i = 0
+        while i < len(lines):
+            draw_font(w.renderer, lines[i], padding, y,
+                px_size=px_size, color=Color.white())
+            y += sizes[i][1]
+            i += 1
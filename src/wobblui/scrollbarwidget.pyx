@@ -40,16 +40,16 @@ cdef class ScrollbarDrawingWidget(Widget):
         self.scrollbar_x = self.width - self.scrollbar_width
         c = Color.white()
         if self.style != None:
-            c = Color(self.style.get("border"))
+            c = self.style.get_color("border")
         draw_rectangle(self.renderer,
             self.scrollbar_x, self.scrollbar_y,
             self.scrollbar_width, self.scrollbar_height,
             color=c)
         c = Color.black()
         if self.style != None:
-            c = Color(self.style.get("selected_bg"))
+            c = self.style.get_color("selected_bg")
             if self.style.has("scrollbar_knob_fg"):
-                c = Color(self.style.get("scrollbar_knob_fg"))
+                c = self.style.get_color("scrollbar_knob_fg")
         border_width = max(1, round(1 * self.dpi_scale))
         draw_rectangle(self.renderer,
             self.scrollbar_x + 1 * border_width,
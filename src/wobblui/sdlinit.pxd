@@ -23,5 +23,9 @@ freely, subject to the following restrictions:
 
 cpdef void initialize_sdl()
 
+cpdef void wake_up_event_loop()
+
+cpdef int is_wakeup_event(event)
+
 cpdef tuple sdl_version()
 
@@ -37,9 +37,12 @@ def android_fix_softinput_mode():
     do_it()
 
 
+cdef unsigned int wakeup_event_type = 0
+cdef int wakeup_pending = False
+
 sdl_init_done = False
 cpdef void initialize_sdl():
-    global sdl_init_done
+    global sdl_init_done, wakeup_event_type
     if sdl_init_done:
         return
     sdl_init_done = True
@@ -96,12 +99,43 @@ cpdef void initialize_sdl():
     else:
         loginfo("NOT calling SDL_Init, already initialized")
 
+    # Reserve an event type to wake up the event loop from other threads:
+    result = sdl.SDL_RegisterEvents(1)
+    if result != 0xFFFFFFFF:
+        wakeup_event_type = result
+    else:
+        logwarning("SDL_RegisterEvents failed, event loop wakeups " +
+            "will be delayed")
+
     # On android, get the native Java activity and fix the soft input mode:
     if sdl.SDL_GetPlatform().lower() == b"android":
         logdebug("Setting initial SOFT_INPUT_ADJUST_RESIZE")
         android_fix_softinput_mode()
 
 
+cpdef void wake_up_event_loop():
+    """ Make the event loop stop waiting for SDL events and run another
+        iteration right away. This may be called from any thread.
+    """
+    global wakeup_pending
+    if not sdl_init_done or wakeup_event_type == 0 or wakeup_pending:
+        return
+    import sdl2 as sdl
+    wakeup_pending = True
+    ev = sdl.SDL_Event()
+    ev.type = wakeup_event_type
+    if sdl.SDL_PushEvent(ctypes.byref(ev)) != 1:
+        wakeup_pending = False
+
+
+cpdef int is_wakeup_event(event):
+    global wakeup_pending
+    if wakeup_event_type == 0 or event.type != wakeup_event_type:
+        return False
+    wakeup_pending = False
+    return True
+
+
 cpdef tuple sdl_version():
     import sdl2 as sdl
     v = sdl.SDL_version()
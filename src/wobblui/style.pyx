@@ -20,12 +20,29 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+from wobblui.color cimport Color
+
 cdef int is_android = -1
 
+# Shared by all styles, so a widget comparing versions also notices
+# when it was given a different style object:
+cdef long style_version_counter = 0
+
+cdef long next_style_version():
+    global style_version_counter
+    style_version_counter += 1
+    return style_version_counter
+
 cdef class AppStyle:
+    """ The set of colors, fonts and sizes used by widgets. Lookups
+        with all their fallbacks are resolved once per name and then
+        served from a flat table, and get_color() also caches the
+        parsed Color. The version changes whenever anything does.
+    """
     cdef public double _dpi_scale_base, _dpi_scale
     cdef int is_android
-    cdef public dict values
+    cdef dict _values, _resolved, _resolved_colors
+    cdef readonly long version
     cdef object _widget
 
     @property
@@ -45,10 +62,13 @@ cdef class AppStyle:
         self._dpi_scale_base = 1.0
         self._dpi_scale = 1.0
         self.is_android = is_android
-        self.values = dict()
+        self._values = dict()
+        self._resolved = dict()
+        self._resolved_colors = dict()
+        self.version = next_style_version()
 
     def __repr__(self):
-        return "AppStyle<" + str(self.values) + ">"
+        return "AppStyle<" + str(self._values) + ">"
 
     def copy(self):
         return self._do_copy()
@@ -64,56 +84,92 @@ cdef class AppStyle:
         copied_style._dpi_scale = self._dpi_scale
         copied_style._dpi_scale_base = self._dpi_scale_base
         copied_style.is_android = self.is_android
-        for k in self.values:
-            copied_style.values[k] = self.values[k]
+        copied_style._values = dict(self._values)
         return copied_style
 
+    @property
+    def values(self):
+        """ The raw style values, which must only be changed through
+            set() or by assigning a new dict.
+        """
+        return self._values
+
+    @values.setter
+    def values(self, v):
+        self._values = dict(v)
+        self._invalidate()
+
+    cdef _invalidate(self):
+        self._resolved = dict()
+        self._resolved_colors = dict()
+        self.version = next_style_version()
+
     @property
     def dpi_scale(self):
         return self._dpi_scale * self._dpi_scale_base
 
     @dpi_scale.setter
     def dpi_scale(self, v):
+        if self._dpi_scale != float(v):
+            self.version = next_style_version()
         self._dpi_scale = float(v)
 
     def has(self, name):
-        return (name.upper() in self.values)
+        return (name.upper() in self._values)
 
     def set(self, name, value):
         name = name.upper()
         if type(value) == int or type(value) == float:
-            self.values[name] = value
+            self._values[name] = value
+            self._invalidate()
             return
         if len(value) == 4 and value[0] == "#":
             value = "#" + value[1] + value[1] +\
                 value[2] + value[2] +\
                 value[3] + value[3]
-        self.values[name] = value
-
-    def get(self, name):
-        name = name.upper()
-        if name in self.values:
-            return self.values[name]
+        self._values[name] = value
+        self._invalidate()
+
+    def get(self, str name):
+        value = self._resolved.get(name)
+        if value is None:
+            value = self._resolve(name.upper())
+            self._resolved[name] = value
+        return value
+
+    def get_color(self, str name):
+        """ Like Color(style.get(name)), but parsed only once. The
+            returned Color is shared, so don't modify it.
+        """
+        color = self._resolved_colors.get(name)
+        if color is None:
+            color = Color(self.get(name))
+            self._resolved_colors[name] = color
+        return color
+
+    def _resolve(self, str name):
+        if name in self._values:
+            return self._values[name]
         if name.endswith("_BG"):
             if (name.find("SELECTED") >= 0 or \
                         name.find("HOVER") >= 0) and \
-                    "SELECTED_BG" in self.values:
-                return self.values["SELECTED_BG"]
-            if "WIDGET_BG" in self.values:
-                return self.values["WIDGET_BG"]
+                    "SELECTED_BG" in self._values:
+                return self._values["SELECTED_BG"]
+            if "WIDGET_BG" in self._values:
+                return self._values["WIDGET_BG"]
             return "#000000"
         if (name.endswith("_FRONT") or name.endswith("_FONT") or \
                 name.endswith("BORDER") or name.endswith("_TEXT")):
-            if "WIDGET_TEXT" in self.values:
-                return self.values["WIDGET_TEXT"]
+            if "WIDGET_TEXT" in self._values:
+                return self._values["WIDGET_TEXT"]
             return "#ffffff"
         if name.endswith("_FONT_FAMILY"):
-            if "WIDGET_FONT_FAMILY" in self.values:
-                return self.values["WIDGET_FONT_FAMILY"]
+            if "WIDGET_FONT_FAMILY" in self._values:
+                return self._values["WIDGET_FONT_FAMILY"]
             return "Tex Gyre Heros"
         if name.endswith("_TEXT_SIZE"):
-            if "WIDGET_TEXT_SIZE" in self.values:
-                return self.values["WIDGET_TEXT_SIZE"]
+            if "WIDGET_TEXT_SIZE" in self._values:
+                return self._values["WIDGET_TEXT_SIZE"]
             return 13
         return "#aaaaaa"
 
@@ -0,0 +1,68 @@
+import ctypes
+import os
+
+import pytest
+
+from wobblui.color import Color
+from wobblui.drawbatch import begin_draw_batch, end_draw_batch
+from wobblui.gfx import draw_rectangle
+from wobblui.perf import Perf
+from wobblui.uiconf import config
+
+@pytest.fixture
+def renderer():
+    import sdl2 as sdl
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sdl.SDL_InitSubSystem(sdl.SDL_INIT_VIDEO)
+    window = sdl.SDL_CreateWindow(b"test", 0, 0, 16, 16,
+        sdl.SDL_WINDOW_HIDDEN)
+    renderer = sdl.SDL_CreateRenderer(window, -1,
+        sdl.SDL_RENDERER_SOFTWARE)
+    old_value = config.get("batch_draw_calls")
+    config.set("batch_draw_calls", True)
+    yield renderer
+    config.set("batch_draw_calls", old_value)
+    sdl.SDL_DestroyRenderer(renderer)
+    sdl.SDL_DestroyWindow(window)
+
+def _pixel(renderer, x, y):
+    import sdl2 as sdl
+    pixel = ctypes.create_string_buffer(4)
+    assert sdl.SDL_RenderReadPixels(renderer, sdl.SDL_Rect(x, y, 1, 1),
+        sdl.SDL_PIXELFORMAT_ABGR8888, pixel, 4) == 0
+    return tuple(pixel.raw[:3])
+
+def test_flush_merges_fills_in_painter_order(renderer):
+    red = Color((255, 0, 0))
+    green = Color((0, 255, 0))
+    commands_before = Perf.counter("draw_batch_commands")
+    calls_before = Perf.counter("draw_batch_sdl_calls")
+    begin_draw_batch(renderer)
+    begin_draw_batch(renderer)
+    # These two are merged into one SDL_RenderFillRects() call:
+    draw_rectangle(renderer, 0, 0, 4, 4, color=red)
+    draw_rectangle(renderer, 4, 0, 4, 4, color=red)
+    draw_rectangle(renderer, 2, 0, 4, 4, color=green)
+    # Same color as the first run, but must still end up on top:
+    draw_rectangle(renderer, 5, 0, 3, 4, color=red)
+    end_draw_batch(renderer)
+    # Nested, so nothing is drawn before the outermost end:
+    assert Perf.counter("draw_batch_commands") == commands_before
+    end_draw_batch(renderer)
+    assert Perf.counter("draw_batch_commands") == commands_before + 4
+    # Three runs of color, blend mode and fill calls each:
+    assert Perf.counter("draw_batch_sdl_calls") == calls_before + 9
+    assert _pixel(renderer, 1, 1) == (255, 0, 0)
+    assert _pixel(renderer, 3, 1) == (0, 255, 0)
+    assert _pixel(renderer, 5, 1) == (255, 0, 0)
+    assert _pixel(renderer, 7, 1) == (255, 0, 0)
+
+def test_no_batch_when_disabled(renderer):
+    config.set("batch_draw_calls", False)
+    commands_before = Perf.counter("draw_batch_commands")
+    begin_draw_batch(renderer)
+    draw_rectangle(renderer, 0, 0, 4, 4, color=Color((0, 0, 255)))
+    # Drawn right away:
+    assert _pixel(renderer, 1, 1) == (0, 0, 255)
+    end_draw_batch(renderer)
+    assert Perf.counter("draw_batch_commands") == commands_before
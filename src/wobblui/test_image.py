@@ -0,0 +1,132 @@
+import concurrent.futures
+import ctypes
+import os
+
+import PIL.Image
+import pytest
+
+from wobblui.image import clear_image_cache, get_shared_render_image, \
+    image_cache, ImageWidget, load_render_image_async, RenderImage, \
+    SharedImage, stock_image
+from wobblui.timer import internal_process_ui_thread_queue
+
+def _wait_for(job):
+    concurrent.futures.wait([job._future])
+    internal_process_ui_thread_queue()
+
+def test_cancel_before_finish():
+    results = []
+    job = load_render_image_async(PIL.Image.new("RGBA", (8, 8)),
+        results.append)
+    # The worker is done, but the result hasn't reached the UI thread:
+    concurrent.futures.wait([job._future])
+    job.cancel()
+    internal_process_ui_thread_queue()
+    assert results == []
+    assert not job.done
+
+def test_source_copied_on_calling_thread():
+    results = []
+    source = PIL.Image.new("RGBA", (8, 8), (255, 0, 0, 255))
+    job = load_render_image_async(source, results.append)
+    source.putpixel((0, 0), (0, 0, 255, 255))
+    _wait_for(job)
+    assert len(results) == 1
+    assert results[0].pil_image.getpixel((0, 0)) == (255, 0, 0, 255)
+
+def test_failure_placeholder(tmpdir):
+    missing = os.path.join(str(tmpdir), "missing.png")
+    results = []
+    job = load_render_image_async(missing, results.append)
+    _wait_for(job)
+    assert results == [None]
+    assert job.done and job.error is not None
+
+    widget = ImageWidget(missing, load_async=True)
+    assert widget.loading
+    _wait_for(widget._load_job)
+    assert widget.loading
+    assert widget.render_image is None
+    assert widget._placeholder is get_shared_render_image(
+        stock_image("broken_document"))
+
+def test_shared_image_decodes_lazily(tmpdir):
+    path = os.path.join(str(tmpdir), "image.png")
+    PIL.Image.new("RGBA", (200, 100)).save(path)
+    clear_image_cache()
+    image = SharedImage(path)
+    assert image.render_size == (200, 100)
+    assert not any(key[0] == "decoded" for key in image_cache)
+    image.prepare(40, 20)
+    # Once the variant exists, the decoded original isn't kept:
+    variants = [key for key in image_cache if key[0] == "variant"]
+    assert len(variants) == 1
+    assert not any(key[0] == "decoded" for key in image_cache)
+    assert get_shared_render_image(path, max_size=40) is \
+        image_cache[variants[0]][0]
+
+@pytest.fixture
+def renderer():
+    import sdl2 as sdl
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    sdl.SDL_InitSubSystem(sdl.SDL_INIT_VIDEO)
+    window = sdl.SDL_CreateWindow(b"test", 0, 0, 16, 16,
+        sdl.SDL_WINDOW_HIDDEN)
+    renderer = sdl.SDL_CreateRenderer(window, -1,
+        sdl.SDL_RENDERER_SOFTWARE)
+    yield renderer
+    sdl.SDL_DestroyRenderer(renderer)
+    sdl.SDL_DestroyWindow(window)
+
+def _drawn_pixel(renderer, image, x, y):
+    import sdl2 as sdl
+    sdl.SDL_SetRenderDrawColor(renderer, 0, 0, 0, 255)
+    sdl.SDL_RenderClear(renderer)
+    image.draw(renderer, 0, 0)
+    pixel = ctypes.create_string_buffer(4)
+    assert sdl.SDL_RenderReadPixels(renderer, sdl.SDL_Rect(x, y, 1, 1),
+        sdl.SDL_PIXELFORMAT_ABGR8888, pixel, 4) == 0
+    return tuple(pixel.raw)
+
+def _set_pixel(view, x, y, rgba):
+    for i, value in enumerate(rgba):
+        view[y, x, i] = value
+
+def test_mark_dirty_uploads_changed_region(renderer):
+    image = RenderImage(PIL.Image.new("RGBA", (8, 8), (255, 0, 0, 255)))
+    texture = image.to_texture(renderer)
+    assert not texture.streaming
+    assert _drawn_pixel(renderer, image, 2, 3) == (255, 0, 0, 255)
+
+    # The first edit switches to a streaming texture:
+    view = memoryview(image)
+    _set_pixel(view, 2, 3, (0, 255, 0, 255))
+    image.mark_dirty(2, 3, 1, 1)
+    texture = image.to_texture(renderer)
+    assert texture.streaming
+    assert _drawn_pixel(renderer, image, 2, 3) == (0, 255, 0, 255)
+
+    # Later edits are uploaded into the same texture:
+    _set_pixel(view, 2, 3, (0, 0, 255, 255))
+    image.mark_dirty(2, 3, 1, 1)
+    assert image.to_texture(renderer) is texture
+    assert _drawn_pixel(renderer, image, 2, 3) == (0, 0, 255, 255)
+    assert _drawn_pixel(renderer, image, 0, 0) == (255, 0, 0, 255)
+
+    # Without marking it dirty, a change isn't uploaded:
+    _set_pixel(view, 0, 0, (0, 0, 255, 255))
+    assert _drawn_pixel(renderer, image, 0, 0) == (255, 0, 0, 255)
+    image.mark_dirty()
+    assert _drawn_pixel(renderer, image, 0, 0) == (0, 0, 255, 255)
+    view.release()
+
+def test_no_reinit_while_buffer_exported():
+    image = RenderImage(PIL.Image.new("RGBA", (4, 4)))
+    view = memoryview(image)
+    with pytest.raises(AttributeError):
+        image.surface = None
+    with pytest.raises(RuntimeError):
+        image.__init__(PIL.Image.new("RGBA", (8, 8)))
+    view.release()
+    image.__init__(PIL.Image.new("RGBA", (8, 8)))
+    assert image.render_size == (8, 8)
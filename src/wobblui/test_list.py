@@ -0,0 +1,95 @@
+import random
+
+from wobblui.list import _HeightIndex
+
+def test_height_index():
+    rng = random.Random(1)
+    heights = [rng.randint(1, 50) for i in range(100)]
+    index = _HeightIndex()
+    for height in heights[:60]:
+        index.append(height)
+    index.rebuild(heights[:60])
+    for height in heights[60:]:
+        index.append(height)
+    assert len(index) == len(heights)
+    assert index.total == sum(heights)
+    for count in range(len(heights) + 1):
+        assert index.prefix(count) == sum(heights[:count])
+
+    # Changing and inserting heights:
+    index.set(10, 7)
+    heights[10] = 7
+    index.insert(20, 13)
+    heights.insert(20, 13)
+    assert index.total == sum(heights)
+    for count in range(len(heights) + 1):
+        assert index.prefix(count) == sum(heights[:count])
+
+    # Finding the entry at an offset:
+    offset = 0
+    for i, height in enumerate(heights):
+        assert index.find(offset) == i
+        assert index.find(offset + height - 1) == i
+        offset += height
+    assert index.find(offset + 100) == len(heights) - 1
+    assert _HeightIndex().find(0) == -1
+
+def test_height_index_fill():
+    index = _HeightIndex()
+    index.fill(1000, 20)
+    assert index.total == 20000
+    assert index.prefix(10) == 200
+    assert index.find(199) == 9
+    assert index.find(200) == 10
+    heights = [20] * 1000
+    for i, height in [(3, 50), (500, 1), (999, 35)]:
+        index.set(i, height)
+        heights[i] = height
+    index.append(7)
+    heights.append(7)
+    index.insert(0, 12)
+    heights.insert(0, 12)
+    assert index.total == sum(heights)
+    offset = 0
+    for i, height in enumerate(heights):
+        assert index.prefix(i) == offset
+        assert index.find(offset) == i
+        assert index.find(offset + height - 1) == i
+        offset += height
+
+def test_search_index():
+    from wobblui.list import _SearchIndex
+    rng = random.Random(2)
+    words = ["apple", "Apricot", "banana", "blueberry", "cherry",
+        "<b>apple</b> pie", "avocado", "bean"]
+    index = _SearchIndex()
+    texts = []
+    for i in range(3000):
+        # Mix appends with inserts and removals in the middle:
+        if len(texts) > 0 and rng.random() < 0.2:
+            pos = rng.randrange(len(texts))
+            index.remove(pos)
+            del texts[pos]
+            continue
+        word = rng.choice(words) + " " + str(i)
+        pos = (len(texts) if rng.random() < 0.5 else
+            rng.randint(0, len(texts)))
+        index.insert(pos, word)
+        texts.insert(pos, word.replace("<b>", "").
+            replace("</b>", "").lower())
+    for prefix in ["a", "ap", "apple", "b", "bl", "cherry 1", "x"]:
+        for start in [0, 1, len(texts) // 2, len(texts) - 1,
+                len(texts)]:
+            expected = [i for i in range(len(texts))
+                if texts[i].startswith(prefix)]
+            after = [i for i in expected if i >= start]
+            result = index.find_prefix(prefix.upper(), start)
+            if len(after) > 0:
+                assert result == after[0]
+            elif len(expected) > 0:
+                assert result == expected[0]
+            else:
+                assert result == -1
+    for query in ["ap", "berry", "pie 1", "nothing"]:
+        assert index.filter(query) == [i for i in range(len(texts))
+            if query in texts[i]]
@@ -0,0 +1,41 @@
+from wobblui.logview import LogView
+from wobblui.style import AppStyleBright
+
+class _ScaledLogView(LogView):
+    def __init__(self, dpi_scale, *args, **kwargs):
+        self._test_style = AppStyleBright()
+        self._test_style.dpi_scale = dpi_scale
+        super().__init__(*args, **kwargs)
+
+    def get_style(self):
+        return self._test_style
+
+def test_append_trim_and_scroll_down():
+    view = LogView(max_lines=10)
+    view.size_change(300, 40)
+    for i in range(25):
+        view.append_line("line " + str(i))
+    assert view.line_count == 10
+    assert view.get_text() == "\n".join(
+        ["line " + str(i) for i in range(15, 25)])
+    view.scroll_down()
+    assert view.scroll_y_offset > 0
+    assert view.output_is_scrolled_down()
+    view.append_text("one more\nand another")
+    assert view.line_count == 10
+    assert view.get_text().endswith("line 24\none more\nand another")
+    view.scroll_down()
+    assert view.output_is_scrolled_down()
+    view.scroll_y_offset = 0
+    assert not view.output_is_scrolled_down()
+
+def test_height_estimate_uses_dpi_scale():
+    view = _ScaledLogView(2.0)
+    for i in range(20):
+        view.append_line("line " + str(i))
+    estimated = view.get_natural_height()
+    # Laying out all lines at their actual width replaces the estimate:
+    view.size_change(300, 100000)
+    view.scroll_down()
+    laid_out = view.get_natural_height()
+    assert abs(estimated - laid_out) <= laid_out * 0.25
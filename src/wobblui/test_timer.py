@@ -0,0 +1,69 @@
+import time
+
+import pytest
+
+from wobblui.timer import internal_trigger_check, maximum_sleep_time, \
+    schedule, schedule_repeating
+
+def _wait_until_due(delay=0.01):
+    time.sleep(delay * 2)
+
+def test_cancel_from_earlier_callback():
+    fired = []
+    later = None
+    cancel_result = None
+    def first():
+        nonlocal cancel_result
+        fired.append("a")
+        cancel_result = later.cancel()
+    schedule(first, 0.0)
+    later = schedule(lambda: fired.append("b"), 0.001)
+    _wait_until_due()
+    internal_trigger_check()
+    assert fired == ["a"]
+    assert cancel_result is True
+    assert not later.pending
+
+def test_cancel_pending_and_fired():
+    fired = []
+    event = schedule(lambda: fired.append(1), 0.0)
+    _wait_until_due()
+    internal_trigger_check()
+    assert fired == [1]
+    assert event.cancel() is False
+    event = schedule(lambda: fired.append(2), 0.0)
+    assert event.cancel() is True
+    assert event.cancel() is False
+    _wait_until_due()
+    internal_trigger_check()
+    assert fired == [1]
+
+def test_order_and_idle():
+    fired = []
+    schedule(lambda: fired.append("late"), 0.002)
+    schedule(lambda: fired.append("early"), 0.001)
+    idle_event = schedule(lambda: fired.append("idle"), 60.0,
+        earlier_if_idle=True)
+    assert maximum_sleep_time() == 0.0
+    internal_trigger_check(idle=True)
+    assert fired == ["idle"]
+    assert not idle_event.pending
+    _wait_until_due()
+    internal_trigger_check()
+    assert fired == ["idle", "early", "late"]
+
+def test_repeating():
+    fired = []
+    event = schedule_repeating(lambda: fired.append(1), 0.001)
+    for i in range(3):
+        _wait_until_due()
+        internal_trigger_check()
+    assert len(fired) == 3
+    assert event.pending
+    assert event.cancel() is True
+    _wait_until_due()
+    internal_trigger_check()
+    assert len(fired) == 3
+    assert maximum_sleep_time() is None
+    with pytest.raises(ValueError):
+        schedule_repeating(lambda: None, 1.0, earlier_if_idle=True)
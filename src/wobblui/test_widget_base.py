@@ -0,0 +1,48 @@
+from wobblui.widget_base import WidgetBase
+
+def _make_tree():
+    root = WidgetBase(is_container=True)
+    parent = WidgetBase(is_container=True)
+    other = WidgetBase(is_container=True)
+    child = WidgetBase(is_container=True)
+    grandchild = WidgetBase()
+    root.add(parent)
+    root.add(other)
+    parent.add(child)
+    child.add(grandchild)
+    widgets = [root, parent, other, child, grandchild]
+
+    # Settle everything, so the tree starts out clean:
+    root.relayout_if_necessary()
+    for widget in widgets:
+        widget.needs_relayout = False
+        widget.needs_redraw = False
+    root.internal_update_subtree_dirty()
+    for widget in widgets:
+        assert widget._subtree_dirty == 0
+    return widgets
+
+def test_dirty_grandchild_marks_ancestors():
+    (root, parent, other, child, grandchild) = _make_tree()
+    grandchild.needs_redraw = True
+    for widget in [root, parent, child, grandchild]:
+        assert widget._subtree_dirty != 0
+    assert other._subtree_dirty == 0
+    grandchild.needs_redraw = False
+    root.internal_update_subtree_dirty()
+    for widget in [root, parent, other, child, grandchild]:
+        assert widget._subtree_dirty == 0
+
+def test_clean_subtrees_are_skipped():
+    (root, parent, other, child, grandchild) = _make_tree()
+    relayouted = []
+    for widget in [root, parent, other, child, grandchild]:
+        widget.relayout.register(
+            lambda widget=widget: relayouted.append(widget))
+    grandchild.needs_relayout = True
+    root.relayout_if_necessary()
+    assert grandchild in relayouted
+    assert other not in relayouted
+    # The clean sibling's bits stay unset after the pass:
+    root.internal_update_subtree_dirty()
+    assert other._subtree_dirty == 0
@@ -178,7 +178,7 @@ cdef class TextEditBase(Widget):
             return self._user_set_color
         if self.style is None:
             return Color.black()
-        return Color(self.style.get("widget_text"))
+        return self.style.get_color("widget_text")
 
     def update_window(self):
         super().update_window()
@@ -551,7 +551,7 @@ cdef class TextEditBase(Widget):
         # Draw basic bg:
         c = Color.white()
         if self.style != None:
-            c = Color(self.style.get("inner_widget_bg"))
+            c = self.style.get_color("inner_widget_bg")
         draw_rectangle(self.renderer,
             0, 0, self.width, self.height, color=c)
 
@@ -579,7 +579,7 @@ cdef class TextEditBase(Widget):
                     max(0, self.cursor_offset or 0))
             c = Color("#aaf")
             if self.style != None and self.style.has("selected_bg"):
-                c = Color(self.style.get("selected_bg"))
+                c = self.style.get_color("selected_bg")
             draw_rectangle(self.renderer,
                 x1 + self.padding - self.scroll_x_offset,
                 y1 + self.padding - self.scroll_y_offset,
@@ -598,7 +598,7 @@ cdef class TextEditBase(Widget):
         # outside of the widget size)
         c = Color.white()
         if self.style != None:
-            c = Color(self.style.get("inner_widget_bg"))
+            c = self.style.get_color("inner_widget_bg")
         draw_rectangle(self.renderer,
             border_size, border_size,
             self.width, self.height, color=c,
@@ -616,7 +616,7 @@ cdef class TextEditBase(Widget):
         # Draw border:
         c = Color.black()
         if self.style != None:
-            c = Color(self.style.get("border"))
+            c = self.style.get_color("border")
         draw_rectangle(self.renderer,
             0, 0, self.width, self.height, color=c,
             filled=False, unfilled_border_thickness=border_size)
@@ -49,6 +49,8 @@ cdef class Texture:
     cdef public object renderer
     cdef uintptr_t renderer_address
     cdef int width, height
+    cdef readonly int streaming
+    cdef unsigned int color_mod
     cdef object __weakref__
     cdef _sdl_SetRenderDrawColorType sdl_func_set_render_draw_color
     cdef _sdl_RenderCopyType sdl_func_render_copy
@@ -58,3 +60,7 @@ cdef class RenderTarget(Texture):
     cdef object previous_target
 
 cdef void do_actual_texture_unload(uintptr_t renderer_address)
+
+cpdef begin_texture_restore_frame()
+
+cpdef int texture_restore_budget_left()
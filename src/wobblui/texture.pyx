@@ -25,27 +25,45 @@ import cython
 from libc.stdint cimport uintptr_t
 import math
 import sys
+import time
 import weakref
 
 from wobblui.color import Color
+from wobblui.drawbatch cimport DrawBatch, get_draw_batch, \
+    flush_draw_batch_by_address
 from wobblui.perf cimport CPerf as Perf
 from wobblui.render_lock cimport can_renderer_safely_be_used
 from wobblui.uiconf import config
-from wobblui.woblog import logdebug, logerror, loginfo, logwarning
+from wobblui.woblog cimport is_enabled, LOG_DEBUG, \
+    logdebug, logerror, loginfo, logwarning
 
-all_textures = []
+# Live textures per renderer address. WeakSets drop collected textures
+# on their own, so nothing needs to be rebuilt on renderer loss:
+textures_by_renderer = dict()
 sdl_tex_count = 0
 
 def mark_textures_invalid(sdl_renderer):
-    global all_textures
-    new_refs = []
-    for tex_ref in all_textures:
-        tex = tex_ref()
-        if tex is None:
-            continue
-        new_refs.append(tex_ref)
+    renderer_textures = textures_by_renderer.pop(
+        int(ctypes.addressof(sdl_renderer.contents)), None)
+    if renderer_textures is None:
+        return
+    for tex in list(renderer_textures):
         tex.internal_clean_if_renderer(sdl_renderer)
-    all_textures[:] = new_refs
+
+cdef double texture_restore_deadline = 0.0
+
+cpdef begin_texture_restore_frame():
+    """ Start the time budget for restoring widget render targets lost
+        with a renderer in the current frame. Widgets beyond the budget
+        restore themselves in the following frames, so coming back
+        from the background doesn't re-render everything at once.
+    """
+    global texture_restore_deadline
+    texture_restore_deadline = (time.monotonic() +
+        config.get("texture_restore_frame_budget"))
+
+cpdef int texture_restore_budget_left():
+    return (time.monotonic() < texture_restore_deadline)
 
 
 cdef _sdl_RenderCopyType _sdl_RenderCopy = NULL
@@ -125,7 +143,7 @@ cdef class Texture:
                 ):
             raise RuntimeError("cannot create texture now, "
                                "hardware context unavailable")
-        global all_textures, sdl_tex_count
+        global sdl_tex_count
 
         # Make sure global functions are available:
         global _sdl_SetRenderDrawColor, _sdl_RenderCopy, _sdl_RenderClear
@@ -201,7 +219,14 @@ cdef class Texture:
                 sdl.SDL_BLENDMODE_BLEND)
         self.width = width
         self.height = height
-        all_textures.append(weakref.ref(self))
+        self.color_mod = 0xffffff
+        renderer_textures = textures_by_renderer.get(
+            int(self.renderer_address))
+        if renderer_textures is None:
+            renderer_textures = weakref.WeakSet()
+            textures_by_renderer[int(self.renderer_address)] = \
+                renderer_textures
+        renderer_textures.add(self)
 
     def is_for_renderer(self, renderer):
         cdef uintptr_t other_renderer_addr = <uintptr_t>(
@@ -217,14 +242,23 @@ cdef class Texture:
     def set_color(self, o):
         import sdl2 as sdl
         if isinstance(o, Color):
-            sdl.SDL_SetTextureColorMod(
-                self._texture, o.value_red, o.value_green, o.value_blue)
-        elif len(o) == 3:
-            sdl.SDL_SetTextureColorMod(
-                self._texture, round(o[0]), round(o[1]), round(o[2]))
-        else:
+            o = (o.value_red, o.value_green, o.value_blue)
+        elif len(o) != 3:
             raise ValueError("color value must be wobblui.color.Color " +
                 "or tuple")
+        # Remembered for batched drawing, which applies it at flush:
+        self.color_mod = ((round(o[0]) << 16) | (round(o[1]) << 8) |
+            round(o[2]))
+        sdl.SDL_SetTextureColorMod(
+            self._texture, round(o[0]), round(o[1]), round(o[2]))
+
+    def _restore_color_mod(self):
+        import sdl2 as sdl
+        if self._texture is None:
+            return
+        sdl.SDL_SetTextureColorMod(self._texture,
+            (self.color_mod >> 16) & 0xff, (self.color_mod >> 8) & 0xff,
+            self.color_mod & 0xff)
 
     def __repr__(self):
         return ("<Texture " + str((str(id(self)), self.width,
@@ -235,6 +269,7 @@ cdef class Texture:
     def draw(self, int x, int y, w=None, h=None):
         global texture_render_rect_1, texture_render_rect_2, \
             texture_render_rect_1_addr, texture_render_rect_2_addr
+        cdef DrawBatch batch
         if (w != None and w <= 0) or (
                 h != None and h <= 0):
             return
@@ -246,6 +281,14 @@ cdef class Texture:
                 ):
             raise RuntimeError("cannot draw now, "
                                "hardware context unavailable")
+        batch = get_draw_batch(self.renderer_address)
+        if batch is not None:
+            batch.record_copy(self, self.texture_address, self.color_mod,
+                0, 0, self.width, self.height,
+                round(x), round(y),
+                max(1, round(w or self.width)),
+                max(1, round(h or self.height)))
+            return
         if texture_render_rect_1_addr == 0:
             import sdl2 as sdl
             texture_render_rect_1 = sdl.SDL_Rect()
@@ -288,10 +331,12 @@ cdef class Texture:
         global sdl_tex_count, to_be_destroyed_texture_addresses
         if self._texture is not None:
             try:
-                if config.get("debug_texture_references"):
+                if is_enabled(LOG_DEBUG) and \
+                        config.get("debug_texture_references"):
                     logdebug("Texture._force_unload: " +
-                        "definite dump of texture " + str(self) +
-                        ", total still loaded: " + str(sdl_tex_count))
+                        "definite dump of texture %s" +
+                        ", total still loaded: %s",
+                        (self, sdl_tex_count))
             finally:
                 if sdl_tex_count is not None:
                     sdl_tex_count -= 1
@@ -351,6 +396,70 @@ cdef class Texture:
         )
         return tex
 
+    @staticmethod
+    def new_streaming_from_sdl_surface(renderer, srf):
+        """ Like new_from_sdl_surface(), but creates a streaming
+            texture in the surface's pixel format so that changed
+            regions can later be pushed with update_from_sdl_surface().
+        """
+        import sdl2 as sdl
+        global sdl_tex_count
+        if not renderer:
+            raise ValueError("need a valid renderer! not NULL / None, " +
+                "got: " + str(renderer))
+        if not srf:
+            raise ValueError("need valid surface! not NULL / None")
+        tex = Texture(
+            renderer, srf.contents.w, srf.contents.h,
+            _dontcreate=True
+        )
+        sdl_tex_count += 1
+        assert(tex._texture is None)
+        tex._texture = sdl.SDL_CreateTexture(
+            renderer,
+            srf.contents.format.contents.format,
+            sdl.SDL_TEXTUREACCESS_STREAMING,
+            srf.contents.w, srf.contents.h)
+        if not tex._texture:
+            tex._texture = None
+            sdl_tex_count -= 1
+            raise RuntimeError("streaming texture creation " +
+                "unexpectedly failed!")
+        tex.texture_address = <uintptr_t>(
+            ctypes.addressof(tex._texture.contents)
+        )
+        tex.streaming = True
+        sdl.SDL_SetTextureBlendMode(tex._texture,
+            sdl.SDL_BLENDMODE_BLEND)
+        tex.update_from_sdl_surface(srf)
+        return tex
+
+    def update_from_sdl_surface(self, srf, x=0, y=0, w=None, h=None):
+        """ Upload the given region of the surface, which must have
+            the texture's size and pixel format, to a streaming texture.
+        """
+        import sdl2 as sdl
+        if not self.streaming:
+            raise TypeError("this is not a streaming texture")
+        if self._texture is None:
+            raise ValueError("texture was unloaded")
+        if w is None:
+            w = self.width - x
+        if h is None:
+            h = self.height - y
+        if w <= 0 or h <= 0:
+            return
+        rect = sdl.SDL_Rect(x, y, w, h)
+        pitch = srf.contents.pitch
+        pixels_addr = (ctypes.cast(srf.contents.pixels,
+            ctypes.c_void_p).value + y * pitch +
+            x * srf.contents.format.contents.BytesPerPixel)
+        Perf.count("texture_partial_upload_bytes", w * h *
+            srf.contents.format.contents.BytesPerPixel)
+        if sdl.SDL_UpdateTexture(self._texture, rect,
+                ctypes.c_void_p(pixels_addr), pitch) != 0:
+            raise RuntimeError("SDL_UpdateTexture failed")
+
 cdef class RenderTarget(Texture):
     def __init__(self, renderer, width, height):
         import sdl2 as sdl
@@ -419,6 +528,7 @@ cdef class RenderTarget(Texture):
         cdef _sdl_SetRenderDrawColorType set_render_draw_color = NULL
         cdef _sdl_RenderClearType render_clear = NULL
 
+        flush_draw_batch_by_address(renderer_address)
         self.set_as_target = True
         self.previous_target = (<uintptr_t>_sdl_GetRenderTarget(
             <void*>renderer_address
@@ -449,10 +559,11 @@ cdef class RenderTarget(Texture):
                 ):
             raise RuntimeError("cannot enable render target now, "
                                "hardware context unavailable")
-        self.set_as_target = False
         cdef uintptr_t renderer_address = (<uintptr_t>(
             self.renderer_address
         ))
+        flush_draw_batch_by_address(renderer_address)
+        self.set_as_target = False
         cdef uintptr_t prevtarget_address = (<uintptr_t>(self.previous_target))
         _sdl_SetRenderTarget(<void*>renderer_address,
                              <void*>prevtarget_address)
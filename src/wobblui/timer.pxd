@@ -28,3 +28,12 @@ cpdef internal_trigger_check(idle=*)
 
 
 cpdef schedule(func, delay, earlier_if_idle=*)
+
+
+cpdef schedule_repeating(func, interval, earlier_if_idle=*)
+
+
+cpdef int internal_ui_thread_work_pending()
+
+
+cpdef int internal_process_ui_thread_queue()
@@ -20,45 +20,82 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+import collections
+import concurrent.futures
+import heapq
 import sys
+import threading
 import time
 import traceback
-import uuid
 
 from wobblui.perf cimport CPerf as Perf
+from wobblui.sdlinit cimport wake_up_event_loop
+from wobblui.uiconf import config
 from wobblui.woblog cimport logdebug, logerror, loginfo, logwarning
 
+# Min-heap of (time, seq, generation, event) entries. Entries whose
+# generation no longer matches their event's are stale (the event was
+# cancelled, fired early when idle, or got requeued) and are skipped
+# when they reach the top:
+cdef list timer_heap = []
+cdef long stale_entries = 0
+cdef dict idle_events = dict()
+cdef long long next_seq = 0
+cdef object timer_lock = threading.Lock()
+
 cdef class ScheduledEvent(object):
-    cdef str identifier
+    """ A timer as returned by schedule() and schedule_repeating().
+        Call cancel() on it to make sure it won't fire (again).
+    """
+    cdef long long seq
+    cdef long long generation
     cdef object func
-    cdef public object time
+    cdef public double time
+    cdef public double interval
     cdef public int earlier_if_idle
+    cdef readonly int cancelled, pending
+    cdef int due
 
-    def __init__(self, func, time, earlier_if_idle=False):
-        self.identifier = str(uuid.uuid4())
+    def __init__(self, func, time, earlier_if_idle=False, interval=0.0):
+        global next_seq
+        next_seq += 1
+        self.seq = next_seq
+        self.generation = 0
         self.func = func
         self.time = float(time)
+        self.interval = float(interval)
         self.earlier_if_idle = earlier_if_idle
+        self.cancelled = False
+        self.pending = False
+        self.due = False
 
-    def check(self, idle=False):
-        if idle and self.earlier_if_idle:
-            return True
-        if self.time < time.monotonic():
-            return True
-        return False
-
-    def __hash__(self):
-        return hash(self.identifier)
-
-    def __eq__(self, obj):
-        if not hasattr(obj, "func") or \
-                not hasattr(obj, "time"):
-            return False
-        if obj.func == self.func and \
-                obj.id == self.id and \
-                abs(obj.time - self.time) < 0.0001:
+    def cancel(self):
+        """ Stop this timer from firing. Returns True if it was still
+            pending (including if it is due and just hasn't run yet),
+            False if it already fired or was cancelled before.
+        """
+        global stale_entries
+        timer_lock.acquire()
+        try:
+            if self.cancelled:
+                return False
+            self.cancelled = True
+            if not self.pending:
+                return False
+            self.pending = False
+            idle_events.pop(self.seq, None)
+            if not self.due or self.interval > 0:
+                # (A due one-shot timer has no heap entry left.)
+                stale_entries += 1
+            _compact_if_mostly_stale()
             return True
-        return False
+        finally:
+            timer_lock.release()
+
+    def __repr__(self):
+        return "<ScheduledEvent time=" + str(self.time) +\
+            " interval=" + str(self.interval) +\
+            " pending=" + str(bool(self.pending)) + ">"
 
     def __call__(self):
         try:
@@ -67,44 +104,192 @@ cdef class ScheduledEvent(object):
             logerror("*** ERROR IN SCHEDULED TIMER FUNCTION ***")
             logerror(str(traceback.format_exc()))
 
-scheduled_events = set()
+cdef _push(ScheduledEvent event):
+    # Needs timer_lock to be held.
+    event.pending = True
+    heapq.heappush(timer_heap,
+        (event.time, event.seq, event.generation, event))
+    if event.earlier_if_idle:
+        idle_events[event.seq] = event
+
+cdef _retire(ScheduledEvent event):
+    # Needs timer_lock to be held. Marks the event's heap entry as stale
+    # and the event as due to run.
+    global stale_entries
+    event.generation += 1
+    event.due = True
+    stale_entries += 1
+
+cdef _compact_if_mostly_stale():
+    # Needs timer_lock to be held.
+    global timer_heap, stale_entries
+    if stale_entries < 32 or stale_entries * 2 < len(timer_heap):
+        return
+    timer_heap = [entry for entry in timer_heap
+        if entry[2] == (<ScheduledEvent>entry[3]).generation and
+        not (<ScheduledEvent>entry[3]).cancelled]
+    heapq.heapify(timer_heap)
+    stale_entries = 0
+
+cdef _drop_stale_top():
+    # Needs timer_lock to be held.
+    global stale_entries
+    cdef ScheduledEvent event
+    while len(timer_heap) > 0:
+        event = timer_heap[0][3]
+        if timer_heap[0][2] == event.generation and not event.cancelled:
+            return
+        heapq.heappop(timer_heap)
+        stale_entries -= 1
 
 cpdef maximum_sleep_time():
-    global scheduled_events
-    sleep_time = None
-    trigger_events = set()
-    for event in scheduled_events:
-        if event.earlier_if_idle:
+    """ Returns how long the event loop may wait until the next timer
+        is due, or None if no timer is scheduled.
+    """
+    timer_lock.acquire()
+    try:
+        if len(idle_events) > 0:
             return 0.0
-        until = (event.time - time.monotonic())
-        if sleep_time == None:
-            sleep_time = until
-        sleep_time = min(sleep_time, max(0.1, until))
-    return sleep_time
+        _drop_stale_top()
+        if len(timer_heap) == 0:
+            return None
+        return max(0.0, timer_heap[0][0] - time.monotonic())
+    finally:
+        timer_lock.release()
 
 cpdef internal_trigger_check(idle=False):
-    global scheduled_events
+    global stale_entries
+    cdef ScheduledEvent event
     trigger_perf_id = Perf.start("timer_trigger")
-    trigger_events = set()
-    for event in scheduled_events:
-        if event.check(idle=idle):
-            trigger_events.add(event)
-    for event in trigger_events:
-        scheduled_events.discard(event)
+    trigger_events = list()
+    now = time.monotonic()
+    timer_lock.acquire()
+    try:
+        if idle and len(idle_events) > 0:
+            for seq in sorted(idle_events):
+                event = idle_events[seq]
+                _retire(event)
+                trigger_events.append(event)
+            idle_events.clear()
+        while len(timer_heap) > 0 and timer_heap[0][0] < now:
+            entry = heapq.heappop(timer_heap)
+            event = entry[3]
+            if entry[2] != event.generation or event.cancelled:
+                stale_entries -= 1
+                continue
+            event.due = True
+            idle_events.pop(event.seq, None)
+            trigger_events.append(event)
+
+        # Requeue repeating timers before running anything, so that
+        # callbacks can still cancel them:
+        for event in trigger_events:
+            if event.interval > 0 and not event.cancelled:
+                event.generation += 1
+                event.time = max(event.time + event.interval, now)
+                _push(event)
+    finally:
+        timer_lock.release()
     for event in trigger_events:
+        # Earlier callbacks may have cancelled this one:
+        timer_lock.acquire()
+        try:
+            event.due = False
+            if event.cancelled:
+                continue
+            if event.interval <= 0:
+                event.pending = False
+        finally:
+            timer_lock.release()
         event()
     Perf.stop(trigger_perf_id, debug="events triggered: " +
         str(len(trigger_events)),
         expected_max_duration=0.005)
 
+cdef _wake_up_if_other_thread():
+    # The event loop recomputes its wait time after each iteration,
+    # so it only needs waking if this came from some other thread:
+    if threading.current_thread() is not threading.main_thread():
+        wake_up_event_loop()
+
+cdef ScheduledEvent _add(ScheduledEvent event):
+    timer_lock.acquire()
+    try:
+        _push(event)
+    finally:
+        timer_lock.release()
+    _wake_up_if_other_thread()
+    return event
+
 cpdef schedule(func, delay, earlier_if_idle=False):
-    global scheduled_events
-    scheduled_events.add(ScheduledEvent(
+    """ Run func once after the given delay in seconds. If
+        earlier_if_idle is set, it may also run earlier as soon as the
+        event loop is idle. Returns a ScheduledEvent which can be used
+        to cancel() it.
+    """
+    return _add(ScheduledEvent(
         func, time.monotonic() + delay,
         earlier_if_idle=earlier_if_idle))
 
+cpdef schedule_repeating(func, interval, earlier_if_idle=False):
+    """ Run func every interval seconds until the returned
+        ScheduledEvent is cancelled. Runs that were missed because the
+        event loop was busy are skipped rather than run in a burst.
+        earlier_if_idle isn't supported, since a repeating timer would
+        then run on every idle iteration.
+    """
+    if interval <= 0:
+        raise ValueError("interval must be positive")
+    if earlier_if_idle:
+        raise ValueError("earlier_if_idle is not supported for " +
+            "repeating timers")
+    return _add(ScheduledEvent(
+        func, time.monotonic() + interval,
+        earlier_if_idle=earlier_if_idle, interval=interval))
+
 def schedule_at_absolute_time(func, ts, earlier_if_idle=False):
-    global scheduled_events
-    scheduled_events.add(ScheduledEvent(
+    return _add(ScheduledEvent(
         func, ts, earlier_if_idle=earlier_if_idle))
- 
+
+# Work posted by run_on_ui_thread(), as (future, func, args, kwargs):
+cdef object ui_thread_queue = collections.deque()
+
+def run_on_ui_thread(func, *args, **kwargs):
+    """ Run func(*args, **kwargs) on the UI (main) thread as soon as the
+        event loop gets to it, and return a concurrent.futures.Future
+        for its result. Safe to call from any thread, so worker threads
+        can use this to update widgets.
+
+        Per event loop iteration, queued functions run for at most the
+        time set by the "ui_thread_queue_budget" config option (at least
+        one always runs), the rest is left for the next iteration.
+    """
+    future = concurrent.futures.Future()
+    ui_thread_queue.append((future, func, args, kwargs))
+    wake_up_event_loop()
+    return future
+
+cpdef int internal_ui_thread_work_pending():
+    return (len(ui_thread_queue) > 0)
+
+cpdef int internal_process_ui_thread_queue():
+    cdef double budget = config.get("ui_thread_queue_budget")
+    cdef double start_time = time.monotonic()
+    cdef int processed = False
+    while len(ui_thread_queue) > 0:
+        if processed and time.monotonic() - start_time > budget:
+            break
+        try:
+            (future, func, args, kwargs) = ui_thread_queue.popleft()
+        except IndexError:
+            break
+        if not future.set_running_or_notify_cancel():
+            continue
+        processed = True
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+    return processed
@@ -23,6 +23,7 @@ import math
 
 from wobblui.box import HBox
 from wobblui.color import Color
+from wobblui.drawbatch import flush_draw_batch
 from wobblui.gfx import draw_rectangle
 from wobblui.label import Label
 from wobblui.widget import Widget
@@ -122,7 +123,8 @@ class Topbar(Widget):
         import sdl2 as sdl
         c = Color((100, 100, 100))
         if self.style != None:
-            c = Color(self.style.get("topbar_bg"))
+            c = self.style.get_color("topbar_bg")
+        flush_draw_batch(self.renderer)
         sdl.SDL_SetRenderDrawColor(self.renderer,
             0, 0, 0, 0)
         sdl.SDL_RenderClear(self.renderer)
@@ -144,9 +146,9 @@ class Topbar(Widget):
         # Draw border:
         c = Color((100, 100, 100))
         if self.style != None:
-            c = Color(self.style.get("border"))
+            c = self.style.get_color("border")
             if self.style.has("topbar_border"):
-                c = Color(self.style.get("topbar_border"))
+                c = self.style.get_color("topbar_border")
         draw_rectangle(self.renderer, 0, topbar_actual_height,
             self._width, self.border_size,
             color=c)
@@ -154,7 +156,7 @@ class Topbar(Widget):
         # Draw background of below-topbar area:
         c = Color((255, 255, 255))
         if self.style != None:
-            c = Color(self.style.get("window_bg"))
+            c = self.style.get_color("window_bg")
         draw_rectangle(self.renderer,
             0, self.topbar_height + self.border_size,
             self._width,
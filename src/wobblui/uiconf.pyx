@@ -42,6 +42,10 @@ cdef class Conf:
             return False
         if value == "perf_debug":
             return False
+        if value == "perf_hud_hotkey":
+            return False
+        if value == "perf_hud":
+            return False
         if value == "debug_core_event_loop":
             return False
         if value == "debug_events":
@@ -50,6 +54,26 @@ cdef class Conf:
             return False
         if value == "debug_file_dialog":
             return False
+        if value == "ui_thread_queue_budget":
+            return 0.008
+        if value == "frame_rate":
+            return None  # use display refresh rate
+        if value == "max_fps":
+            return None
+        if value == "idle_frame_budget":
+            return 0.012
+        if value == "batch_draw_calls":
+            # Off by default: widgets issuing SDL calls directly in
+            # their do_redraw() would get drawn out of order.
+            return False
+        if value == "texture_restore_frame_budget":
+            return 0.008
+        if value == "log_view_max_lines":
+            return 5000
+        if value == "image_loader_threads":
+            return 2
+        if value == "image_cache_max_bytes":
+            return 64 * 1024 * 1024
         if value == "doubleclick_time":
             return 0.4
         if value == "mouse_wheel_speed_modifier":
@@ -20,12 +20,16 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+cdef enum:
+    DIRTY_RELAYOUT = 1
+    DIRTY_REDRAW = 2
+
 cdef class WidgetBase:
     # Base settings:
     cdef public str type
     cdef public int _focusable
     cdef public object focus_index  # integer or None
-    cdef public int needs_redraw
+    cdef int _needs_redraw
     cdef public int id
     cdef public int added_order
     cdef public int no_mouse_events  # disables callbacks AND propagation
@@ -33,7 +37,10 @@ cdef class WidgetBase:
     cdef public int fake_mouse_even_with_native_touch_support
     cdef public int has_native_touch_support, takes_text_input
     cdef public int _prevent_mouse_event_propagate
-    cdef public int needs_relayout
+    cdef int _needs_relayout
+    # DIRTY_* bits of this widget and anything below it that may need a
+    # relayout or redraw, kept up to date up to the window:
+    cdef public int _subtree_dirty
     cdef public int generate_double_click_for_touches 
     cdef public int _x, _y, _width, _height, _max_width, _max_height
     cdef public int _child_mouse_event_shift_x, _child_mouse_event_shift_y
@@ -66,6 +73,7 @@ cdef class WidgetBase:
     cdef public int last_touch_x, last_touch_y, touch_scrolling
     cdef public int had_touchstart_and_no_touchend_yet
     cdef public int long_click_callback_id, have_long_click_callback
+    cdef public object long_click_timer
     cdef public int prevent_touch_long_click_due_to_gesture
     cdef public int multitouch_gesture_reported_in_progress
     cdef public double multitouch_two_finger_distance
@@ -77,6 +85,7 @@ cdef class WidgetBase:
     cdef public object internal_render_target
     cdef public int internal_render_target_width, \
                     internal_render_target_height
+    cdef public int _render_target_lost
 
     # Event objects:
     cdef public object textinput, parentchanged, multitouchstart,\
@@ -88,3 +97,5 @@ cdef class WidgetBase:
 
     # Allow weakrefs to this type:
     cdef object __weakref__
+
+    cdef _mark_dirty(self, int bits)
@@ -38,7 +38,7 @@ from wobblui.mouse import cursor_seen_during_mousemove
 from wobblui.keyboard import enable_text_events
 from wobblui.perf cimport CPerf as Perf
 from wobblui.render_lock cimport can_window_safely_use_its_renderer
-from wobblui.texture cimport RenderTarget
+from wobblui.texture cimport RenderTarget, texture_restore_budget_left
 from wobblui.timer import schedule
 from wobblui.uiconf import config
 from wobblui.widgetman cimport add_widget, get_all_widgets, \
@@ -111,6 +111,7 @@ cdef class WidgetBase:
         self.internal_render_target = None
         self.internal_render_target_width = -1
         self.internal_render_target_height = -1
+        self._render_target_lost = False
 
         def start_redraw(internal_data=None):
             if self.renderer is None:
@@ -174,6 +175,7 @@ cdef class WidgetBase:
                 self.do_redraw()
             self.internal_render_target.unset_as_rendertarget()
             self.needs_redraw = False
+            self._render_target_lost = False
             self.post_redraw()
         self.redraw = Event("redraw", owner=self,
             special_post_event_func=end_redraw,
@@ -561,8 +563,7 @@ cdef class WidgetBase:
                 finger_coordinates[0][1] - finger_coordinates[1][1], 2))
             self.multitouch_two_finger_distance = max(0.05,
                 dist)
-        self.have_long_click_callback = False
-        self.long_click_callback_id += 1
+        self.cancel_long_click_test()
 
     def _internal_on_multitouchmove(self, object finger_coordinates,
             internal_data=None):
@@ -899,9 +900,9 @@ cdef class WidgetBase:
         c = Color.black()
         if self.style != None and self.style.has(
                 "touch_selection_drag_handles"):
-            c = Color(self.style.get("touch_selection_drag_handles"))
+            c = self.style.get_color("touch_selection_drag_handles")
         elif self.style != None and self.style.has("scrollbar_knob_fg"):
-            c = Color(self.style.get("scrollbar_knob_fg"))
+            c = self.style.get_color("scrollbar_knob_fg")
 
         line_thickness = max(1, round(2.0 * self.dpi_scale))
         line_offset_x = -round(line_thickness * 0.5)
@@ -921,6 +922,13 @@ cdef class WidgetBase:
             round(square_pos_y + square_shift_y),
             square_size, square_size, color=c)
 
+    def cancel_long_click_test(self):
+        self.long_click_callback_id += 1
+        self.have_long_click_callback = False
+        if self.long_click_timer is not None:
+            self.long_click_timer.cancel()
+            self.long_click_timer = None
+
     def return_long_click_test_closure(self, callback_id):
         self_ref = weakref.ref(self)
         def test_long_click():
@@ -931,6 +939,7 @@ cdef class WidgetBase:
                 # A newer callback was already started.
                 return
             self_value.have_long_click_callback = False
+            self_value.long_click_timer = None
             fake_clicks_for_event = \
                 ((not self_value.has_native_touch_support or
                 self_value.fake_mouse_even_with_native_touch_support) and \
@@ -1129,11 +1138,10 @@ cdef class WidgetBase:
                 # Schedule test for long-press click:
                 if not self.prevent_touch_long_click_due_to_gesture and \
                         event_name == "touchstart":
-                    self.long_click_callback_id += 1
+                    self.cancel_long_click_test()
                     curr_id = self.long_click_callback_id
-                    self_ref = weakref.ref(self)
                     self.have_long_click_callback = True
-                    schedule(
+                    self.long_click_timer = schedule(
                         self.return_long_click_test_closure(curr_id),
                         config.get("touch_longclick_time")
                     )
@@ -1152,13 +1160,11 @@ cdef class WidgetBase:
                 if self.touch_max_ever_distance > 7 * self.dpi_scale \
                         and self.have_long_click_callback:
                     # Finger moved too far, no longer long press click:
-                    self.have_long_click_callback = False
-                    self.long_click_callback_id += 1
+                    self.cancel_long_click_test()
                 if event_name == "touchend":
                     # Stop long click detection:
                     if self.have_long_click_callback:
-                        self.long_click_callback_id += 1
-                        self.have_long_click_callback = False
+                        self.cancel_long_click_test()
                     # Reset touch start:
                     self.touch_start_x = None
                     self.touch_start_y = None
@@ -1523,6 +1529,8 @@ cdef class WidgetBase:
                 logdebug("WidgetBase.renderer_update: " +
                     "DUMPED self.internal_render_target")
             self.internal_render_target = None
+            # Restored on the next draw, but within the frame budget:
+            self._render_target_lost = True
         for child in self.children:
             child.renderer_update()
 
@@ -1578,28 +1586,102 @@ cdef class WidgetBase:
             if self._width < 0 or self._height < 0 or \
                     self.renderer is None:
                 return
+            if self._restore_postponed():
+                return
             self.redraw()
             if self.internal_render_target is None:
                 return
         assert(x != None and y != None)
         self.internal_render_target.draw(x, y)
 
+    @property
+    def needs_redraw(self):
+        return self._needs_redraw
+
+    @needs_redraw.setter
+    def needs_redraw(self, v):
+        self._needs_redraw = v
+        if v:
+            self._mark_dirty(DIRTY_REDRAW)
+
+    @property
+    def needs_relayout(self):
+        return self._needs_relayout
+
+    @needs_relayout.setter
+    def needs_relayout(self, v):
+        self._needs_relayout = v
+        if v:
+            self._mark_dirty(DIRTY_RELAYOUT)
+
+    cdef _mark_dirty(self, int bits):
+        # Flag this widget and all parents up to the window, so the event
+        # loop can tell a window is dirty without walking all widgets:
+        cdef WidgetBase w = self
+        while True:
+            w._subtree_dirty |= bits
+            if not isinstance(w._parent, WidgetBase):
+                return
+            w = w._parent
+
+    def internal_update_subtree_dirty(self):
+        """ Recompute the dirty bits of this widget from the ones of its
+            children, clearing those left over from work that is done.
+            Children without any bits set are known to be clean and
+            aren't visited.
+        """
+        cdef int bits = 0
+        if self._subtree_dirty == 0:
+            return 0
+        if self._needs_relayout:
+            bits |= DIRTY_RELAYOUT
+        if self._needs_redraw:
+            bits |= DIRTY_REDRAW
+        for child in self.children:
+            if child._subtree_dirty != 0:
+                bits |= child.internal_update_subtree_dirty()
+        self._subtree_dirty = bits
+        return bits
+
     def relayout_if_necessary(self):
         cdef int changed = False
         if self.needs_relayout:
             changed = True
-            self.relayout()
+            Perf.count("widget_relayout")
+            if Perf.tracing_enabled:
+                perf_id = Perf.start("relayout_" +
+                    self.__class__.__name__)
+                self.relayout()
+                Perf.stop(perf_id)
+            else:
+                self.relayout()
         for child in self.children:
+            if (child._subtree_dirty & DIRTY_RELAYOUT) == 0:
+                continue
             if child.relayout_if_necessary():
                 changed = True
         return changed
 
+    def _restore_postponed(self):
+        if self._render_target_lost and \
+                self.internal_render_target is None and \
+                not texture_restore_budget_left():
+            Perf.count("widget_restore_postponed")
+            self.needs_redraw = True
+            return True
+        return False
+
     def redraw_if_necessary(self):
         for child in self.children:
+            if (child._subtree_dirty & DIRTY_REDRAW) == 0:
+                continue
             if child.redraw_if_necessary():
                 self.needs_redraw = True
         if self.needs_redraw:
+            if self._restore_postponed():
+                return False
             self.needs_redraw = False
+            Perf.count("widget_redraw")
             self.redraw()
             return True
         return (self.needs_redraw is True)
@@ -1874,7 +1956,7 @@ cdef class WidgetBase:
         focus_border_thickness = 1.0
         c = Color.red()
         if c != None:
-            c = Color(self.style.get("focus_border"))
+            c = self.style.get_color("focus_border")
         draw_dashed_line(self.renderer,
             x + 0.5 * focus_border_thickness * self.dpi_scale,
             y,
@@ -1973,6 +2055,9 @@ cdef class WidgetBase:
         prev_dpi = self.dpi_scale
         old_parent = self._parent
         self._parent = parent
+        if self._subtree_dirty != 0:
+            # Let the new parents know about pending work in here:
+            self._mark_dirty(self._subtree_dirty)
         parent_window_changed = False
         parent_window_resized = False
         if hasattr(self, "parent_window") and \
@@ -24,7 +24,7 @@ from wobblui.widget_base cimport WidgetBase
 from wobblui.style import AppStyle
 
 cdef class Window(WidgetBase):
-    cdef object mouse_position_cache, _renderer, _style
+    cdef object mouse_position_cache, _renderer, _style, _perf_hud
     cdef public object _sdl_window  # accessed by multitouch code
     cdef int _hidden, _fullscreen
     cdef public int keep_application_running
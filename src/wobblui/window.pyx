@@ -26,14 +26,17 @@ from libc.stdint cimport uintptr_t
 import math
 import os
 import platform
+import time
 import weakref
 
 from wobblui.color cimport Color
 from wobblui.dragselection import draw_drag_selection_handles
+from wobblui.drawbatch cimport flush_draw_batch
 from wobblui.event cimport Event
 import wobblui.font.manager
 from wobblui.gfx cimport clear_renderer_gfx, draw_rectangle
 from wobblui.osinfo import is_android
+from wobblui.perfhud cimport PerfHUD
 from wobblui.sdlinit cimport initialize_sdl
 from wobblui.style import AppStyle, AppStyleBright, AppStyleDark
 cimport wobblui.texture
@@ -139,6 +142,18 @@ cdef _sdl_DestroyRendererType _sdl_DestroyRenderer = NULL
 cdef _sdl_DestroyWindowType _sdl_DestroyWindow = NULL
 
 
+def toggle_perf_hud():
+    """ Show or hide the performance overlay in all windows. Apps can
+        bind this to a key of their choice, or set the "perf_hud_hotkey"
+        config option to have Ctrl+Shift+P do it.
+    """
+    config.set("perf_hud", not config.get("perf_hud"))
+    for w_ref in get_all_windows():
+        w = w_ref()
+        if w is not None:
+            w.needs_redraw = True
+
+
 cdef class Window(WidgetBase):
     def __init__(self,
             title="Untitled",
@@ -157,6 +172,7 @@ cdef class Window(WidgetBase):
         if style is None:
             style = AppStyleBright(self)
         self.mouse_position_cache = dict()
+        self._perf_hud = PerfHUD(self)
         self._sdl_window = None
         self._style = style
         super().__init__(is_container=True, can_get_focus=True)
@@ -546,6 +562,10 @@ cdef class Window(WidgetBase):
 
     def _internal_on_keydown(self, key, physical_key, modifiers,
             internal_data=None):
+        if key == "p" and "ctrl" in modifiers and \
+                "shift" in modifiers and config.get("perf_hud_hotkey"):
+            toggle_perf_hud()
+            return
         focused_widget = WidgetBase.get_focused_widget_by_window(self)
         if focused_widget is None or \
                 focused_widget.keydown(key, physical_key, modifiers):
@@ -750,12 +770,23 @@ cdef class Window(WidgetBase):
         # (flickering window background)
         c = Color.white
         if self.style != None:
-            c = Color(self.style.get("window_bg"))
+            c = self.style.get_color("window_bg")
         draw_rectangle(self.renderer, 0, 0,
             self.width, self.height, color=c)
 
         self.draw_children()
         draw_drag_selection_handles(self)
+        if config.get("perf_hud"):
+            self._perf_hud.draw()
+
+    def redraw_if_necessary(self):
+        if not config.get("perf_hud"):
+            return super().redraw_if_necessary()
+        start_time = time.monotonic()
+        result = super().redraw_if_necessary()
+        if result:
+            self._perf_hud.frame_done(time.monotonic() - start_time)
+        return result
 
     def _internal_on_resized(self, internal_data=None):
         self.needs_relayout = True
@@ -841,10 +872,11 @@ cdef class Window(WidgetBase):
         # Work around double/triple buffering issues by drawing repeatedly:
         i = 0
         while i < 3:
+            flush_draw_batch(self.renderer)
             sdl.SDL_SetRenderTarget(self.renderer, None)
             c = Color.white
             if self.style != None:
-                c = Color(self.style.get("window_bg"))
+                c = self.style.get_color("window_bg")
             sdl.SDL_SetRenderDrawColor(self.renderer,
                 c.value_red,
                 c.value_blue, c.value_green, 255)
@@ -856,6 +888,7 @@ cdef class Window(WidgetBase):
                 self.width, self.height, color=c)
             if self.internal_render_target != None:
                 self.draw(0, 0)
+            flush_draw_batch(self.renderer)
             sdl.SDL_RenderPresent(self.renderer)
             i += 1
 
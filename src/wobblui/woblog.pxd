@@ -20,14 +20,28 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+cdef enum:
+    LOG_DEBUG = 10
+    LOG_INFO = 20
+    LOG_WARNING = 30
+    LOG_ERROR = 40
+
 cpdef set_log_callback(callback)
 
 cpdef set_log_print(int do_print)
 
-cpdef logdebug(str arg)
+cpdef set_log_level(level)
+
+cpdef int is_enabled(int level)
+
+cpdef long get_dropped_log_count()
+
+cpdef flush_log(timeout=*)
+
+cpdef logdebug(str arg, tuple args=*)
 
-cpdef logwarning(str arg)
+cpdef logwarning(str arg, tuple args=*)
 
-cpdef loginfo(str arg)
+cpdef loginfo(str arg, tuple args=*)
 
-cpdef logerror(str arg)
+cpdef logerror(str arg, tuple args=*)
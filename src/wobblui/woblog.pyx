@@ -20,10 +20,28 @@ freely, subject to the following restrictions:
 3. This notice may not be removed or altered from any source distribution.
 '''
 
+import atexit
+import queue
 import sys
 import threading
 import time
 
+DEBUG = LOG_DEBUG
+INFO = LOG_INFO
+WARNING = LOG_WARNING
+ERROR = LOG_ERROR
+
+cdef dict level_by_name = {
+    "debug": LOG_DEBUG,
+    "info": LOG_INFO,
+    "warning": LOG_WARNING,
+    "error": LOG_ERROR,
+}
+
+# Maximum amount of messages waiting for the writer thread. Anything
+# beyond that is dropped rather than blocking the caller:
+LOG_QUEUE_MAX = 2000
+
 logmutex = threading.Lock()
 
 cdef object log_callback = None
@@ -36,17 +54,119 @@ cpdef set_log_print(int do_print):
     global log_do_print
     log_do_print = (do_print == True)
 
-cdef _dolog(label, msg):
-    if log_do_print:
+cdef int log_level = LOG_DEBUG
+cpdef set_log_level(level):
+    """ Set the minimum level of messages that get logged. Accepts one
+        of the DEBUG, INFO, WARNING, ERROR constants or their names.
+    """
+    global log_level
+    if isinstance(level, str):
+        if level.lower() not in level_by_name:
+            raise ValueError("unknown log level: '" + str(level) + "'")
+        level = level_by_name[level.lower()]
+    log_level = int(level)
+
+cpdef int is_enabled(int level):
+    """ Check whether a message of the given level would be logged
+        anywhere. Use this to guard building expensive debug output.
+    """
+    return (level >= log_level and
+        (log_do_print or log_callback is not None))
+
+cdef object log_queue = None
+cdef object log_writer_thread = None
+cdef long log_dropped_count = 0
+
+cpdef long get_dropped_log_count():
+    """ Amount of messages not printed so far because the writer
+        thread couldn't keep up.
+    """
+    return log_dropped_count
+
+cdef _write_entry(entry):
+    (label, msg) = entry
+    if label != "error" and label != "warning":
+        print("wobblog-" + str(label) + ": " + str(msg))
+    else:
+        print("wobblog-" + str(label) + ": " + str(msg),
+            file=sys.stderr, flush=True)
+
+def _log_writer_loop():
+    cdef long reported_dropped = 0
+    while True:
+        entry = log_queue.get()
+        try:
+            _write_entry(entry)
+            dropped = log_dropped_count
+            if dropped != reported_dropped:
+                _write_entry(("warning", "woblog: dropped " +
+                    str(dropped - reported_dropped) + " message(s), " +
+                    "output can't keep up"))
+                reported_dropped = dropped
+            if log_queue.empty():
+                sys.stdout.flush()
+        except Exception:
+            pass
+        finally:
+            log_queue.task_done()
+
+cdef _ensure_log_writer():
+    global log_queue, log_writer_thread
+    if log_writer_thread is not None:
+        return
+    logmutex.acquire()
+    try:
+        if log_writer_thread is not None:
+            return
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        log_writer_thread = threading.Thread(
+            target=_log_writer_loop, daemon=True)
+        log_writer_thread.start()
+        atexit.register(flush_log)
+    finally:
+        logmutex.release()
+
+cpdef flush_log(timeout=2.0):
+    """ Wait until the writer thread printed all queued messages, or
+        the timeout expired.
+    """
+    if log_queue is None or \
+            log_writer_thread is threading.current_thread():
+        return
+    cdef double until = time.monotonic() + timeout
+    while log_queue.unfinished_tasks > 0 and time.monotonic() < until:
+        time.sleep(0.005)
+    sys.stdout.flush()
+
+cdef _dolog(str label, int level, str msg, tuple args):
+    global log_dropped_count
+    if level < log_level:
+        return
+    if not log_do_print and log_callback is None:
+        return
+    if args is not None and len(args) > 0:
+        try:
+            msg = msg % args
+        except (TypeError, ValueError):
+            msg = msg + " " + str(args)
+    if log_do_print and level >= LOG_WARNING:
+        # Warnings and errors must never get lost, so they are written
+        # right away even if this blocks:
         logmutex.acquire()
         try:
-            if label != "error" and label != "warning":
-                print("wobblog-" + str(label) + ": " + str(msg))
-            else:
-                print("wobblog-" + str(label) + ": " + str(msg),
-                    file=sys.stderr, flush=True)
+            _write_entry((label, msg))
+        except Exception:
+            pass
         finally:
             logmutex.release()
+    elif log_do_print:
+        # Printing happens on a writer thread, so that slow terminals
+        # and pipes don't stall the UI:
+        _ensure_log_writer()
+        try:
+            log_queue.put_nowait((label, msg))
+        except queue.Full:
+            log_dropped_count += 1
     if log_callback != None:
         try:
             log_callback(label, msg)
@@ -55,18 +175,20 @@ cdef _dolog(label, msg):
                 file=sys.stderr, flush=True)
             pass
 
-cpdef logdebug(str arg):
+cpdef logdebug(str arg, tuple args=None):
+    if log_level > LOG_DEBUG:
+        return
     try:
         if _dolog != None:
-            _dolog("debug", arg)
+            _dolog("debug", LOG_DEBUG, arg, args)
     except NameError:
         pass
 
-cpdef logwarning(str arg):
-    _dolog("warning", arg)
+cpdef logwarning(str arg, tuple args=None):
+    _dolog("warning", LOG_WARNING, arg, args)
 
-cpdef loginfo(str arg):
-    _dolog("info", arg)
+cpdef loginfo(str arg, tuple args=None):
+    _dolog("info", LOG_INFO, arg, args)
 
-cpdef logerror(str arg):
-    _dolog("error", arg)
+cpdef logerror(str arg, tuple args=None):
+    _dolog("error", LOG_ERROR, arg, args)